@@ -0,0 +1,46 @@
+"""add_session_code
+
+Revision ID: 3f8a2c7d9e14
+Revises: 6134c4b0bc33
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f8a2c7d9e14"
+down_revision: str | Sequence[str] | None = "6134c4b0bc33"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add the live code saved per session and problem."""
+    op.create_table(
+        "session_code",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("problem_id", sa.Integer(), nullable=False),
+        sa.Column("code", sa.Text(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("session_id", "problem_id"),
+    )
+    op.create_index(op.f("ix_session_code_id"), "session_code", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the saved live code."""
+    op.drop_index(op.f("ix_session_code_id"), table_name="session_code")
+    op.drop_table("session_code")
@@ -0,0 +1,50 @@
+"""add_session_event_blocks
+
+Revision ID: 9b1e4d6a2c57
+Revises: 3f8a2c7d9e14
+Create Date: 2026-10-18 14:03:52.771904
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b1e4d6a2c57"
+down_revision: str | Sequence[str] | None = "3f8a2c7d9e14"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add the compressed event journal of sessions."""
+    op.create_table(
+        "session_event_blocks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ended_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_session_event_blocks_id"), "session_event_blocks", ["id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_session_event_blocks_session_id"),
+        "session_event_blocks",
+        ["session_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Drop the event journal."""
+    op.drop_index(op.f("ix_session_event_blocks_session_id"), table_name="session_event_blocks")
+    op.drop_index(op.f("ix_session_event_blocks_id"), table_name="session_event_blocks")
+    op.drop_table("session_event_blocks")
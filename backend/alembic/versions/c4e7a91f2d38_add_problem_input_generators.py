@@ -0,0 +1,115 @@
+"""add_problem_input_generators
+
+Revision ID: c4e7a91f2d38
+Revises: 9b1e4d6a2c57
+Create Date: 2026-10-18 16:41:09.518223
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e7a91f2d38"
+down_revision: str | Sequence[str] | None = "9b1e4d6a2c57"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+# Inputs of growing size for the seeded problems, by problem id
+GENERATORS = {
+    1: """import random
+
+
+def generate(n):
+    return [random.randrange(n), random.randrange(n)]
+""",
+    2: """import random
+
+
+def generate(n):
+    return [[random.randint(-n, n) for _ in range(n)]]
+""",
+    3: """import random
+import string
+
+# Reversing runs at C speed, so only long strings take measurable time
+SIZES = [2**k for k in range(10, 23, 2)]
+
+
+def generate(n):
+    return ["".join(random.choices(string.ascii_letters, k=n))]
+""",
+    4: """import random
+
+
+def generate(n):
+    return [[random.randrange(n // 2 + 1) for _ in range(n)]]
+""",
+    5: """# Small sizes first, so that exponential solutions still give a few points
+SIZES = [5, 10, 15, 20, 22, 24, 26, 28, 30, 60, 120, 240, 480, 960]
+
+
+def generate(n):
+    return [n]
+""",
+    6: """import random
+
+
+def generate(n):
+    pairs = random.choices(["()", "[]", "{}"], k=n // 2)
+    return ["".join(pair[0] for pair in pairs) + "".join(pair[1] for pair in reversed(pairs))]
+""",
+    7: """def build(low, high):
+    if low >= high:
+        return None
+    mid = (low + high) // 2
+    return {"val": mid, "left": build(low, mid), "right": build(mid + 1, high)}
+
+
+def generate(n):
+    # Balanced, so that recursive solutions stay within the recursion limit
+    return [build(0, n)]
+""",
+    8: """import random
+
+
+def generate(n):
+    capacity = max(1, n // 4)
+    calls = []
+    for _ in range(n):
+        key = random.randrange(2 * capacity)
+        calls.append(["put", key, key] if random.random() < 0.5 else ["get", key])
+    return [capacity, *calls]
+""",
+    9: """import random
+
+SIZES = [2**k for k in range(6, 15)]
+
+
+def generate(n):
+    words = {"".join(random.choices("abcdefgh", k=5)) for _ in range(n)}
+    return ["aaaaa", "hhhhh", sorted(words | {"hhhhh"})]
+""",
+}
+
+
+def upgrade() -> None:
+    """Add input generators for complexity profiling and fill them in for the seeded problems."""
+    op.add_column("problems", sa.Column("input_generator", sa.Text(), nullable=True))
+
+    problems = sa.table(
+        "problems", sa.column("id", sa.Integer), sa.column("input_generator", sa.Text)
+    )
+    for problem_id, source in GENERATORS.items():
+        op.execute(
+            problems.update().where(problems.c.id == problem_id).values(input_generator=source)
+        )
+
+
+def downgrade() -> None:
+    """Drop the input generators."""
+    op.drop_column("problems", "input_generator")
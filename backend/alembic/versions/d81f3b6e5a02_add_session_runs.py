@@ -0,0 +1,56 @@
+"""add_session_runs
+
+Revision ID: d81f3b6e5a02
+Revises: c4e7a91f2d38
+Create Date: 2026-10-18 18:22:47.306159
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d81f3b6e5a02"
+down_revision: str | Sequence[str] | None = "c4e7a91f2d38"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Add the resource usage recorded for each server-side run."""
+    op.create_table(
+        "session_runs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("problem_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("success", sa.Boolean(), nullable=False),
+        sa.Column("exit_reason", sa.String(), nullable=False),
+        sa.Column("queued_ms", sa.Float(), nullable=True),
+        sa.Column("wall_ms", sa.Float(), nullable=False),
+        sa.Column("cpu_user_ms", sa.Float(), nullable=True),
+        sa.Column("cpu_system_ms", sa.Float(), nullable=True),
+        sa.Column("peak_rss_bytes", sa.BigInteger(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_session_runs_id"), "session_runs", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_session_runs_session_id"), "session_runs", ["session_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Drop the recorded runs."""
+    op.drop_index(op.f("ix_session_runs_session_id"), table_name="session_runs")
+    op.drop_index(op.f("ix_session_runs_id"), table_name="session_runs")
+    op.drop_table("session_runs")
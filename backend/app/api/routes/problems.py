@@ -177,6 +177,7 @@ async def get_problems(
             description=p.description,
             starterCode=p.starter_code,
             testCases=test_cases,
+            profilable=p.input_generator is not None,
         )
         problem_schemas.append(problem_schema)
 
@@ -2,16 +2,21 @@
 Sessions endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.schemas import ExecutionRun, ResourceUsage, SessionCreate, SessionInfo, TestCase
 from app.schemas import Problem as ProblemSchema
 from app.schemas import Session as SessionSchema
-from app.schemas import SessionCreate, SessionInfo, TestCase
 from app.schemas import User as UserSchema
 from app.services import sessions as sessions_service
+from app.websocket import manager
+from app.websocket.frames import encode
 
 router = APIRouter()
 
@@ -47,6 +52,12 @@ class EndSessionResponse(BaseModel):
     success: bool = True
 
 
+class SessionRunsResponse(BaseModel):
+    """Response with the recorded runs of a session"""
+
+    runs: list[ExecutionRun]
+
+
 def db_session_to_schema(
     session, problems_list, interviewer_data, candidate_data=None
 ) -> SessionSchema:
@@ -63,6 +74,7 @@ def db_session_to_schema(
             description=p.description,
             starterCode=p.starter_code,
             testCases=test_cases,
+            profilable=p.input_generator is not None,
         )
         problem_schemas.append(problem_schema)
 
@@ -195,6 +207,8 @@ async def join_session(
     """
     try:
         session = await sessions_service.join_session(db, sessionId, request.candidateName)
+        # Let the candidate's socket in without waiting for the cache to expire
+        manager.set_session_status(sessionId, "active")
 
         # Access relationships in async context
         problems = sessions_service.get_session_problems(session)
@@ -236,7 +250,68 @@ async def end_session(sessionId: str, db: AsyncSession = Depends(get_db)):
     """
     try:
         await sessions_service.end_session(db, sessionId)
+        await manager.end_session(sessionId)
         return EndSessionResponse(success=True)
 
     except ValueError as e:
         raise HTTPException(status_code=404, detail={"error": "NotFound", "message": str(e)}) from e
+
+
+@router.get("/{sessionId}/replay")
+async def replay_session(
+    sessionId: str,
+    speed: Literal["1", "4", "max"] = Query("1"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Replay session events
+
+    Stream the recorded code changes, problem switches, joins and leaves as JSON
+    lines, at the recorded pace, 4x faster, or as fast as possible
+    """
+    session = await sessions_service.get_session_by_id(db, sessionId)
+    if not session:
+        raise HTTPException(
+            status_code=404, detail={"error": "NotFound", "message": "Session not found"}
+        )
+
+    events = manager.journal.replay(sessionId, None if speed == "max" else float(speed))
+    return StreamingResponse(
+        (encode(event) + "\n" async for event in events), media_type="application/x-ndjson"
+    )
+
+
+@router.get("/{sessionId}/runs", response_model=SessionRunsResponse)
+async def get_session_runs(sessionId: str, db: AsyncSession = Depends(get_db)):
+    """
+    Get session runs
+
+    Resource usage and outcome of every server-side run and profile of the
+    session's code, oldest first
+    """
+    session = await sessions_service.get_session_by_id(db, sessionId)
+    if not session:
+        raise HTTPException(
+            status_code=404, detail={"error": "NotFound", "message": "Session not found"}
+        )
+
+    runs = await sessions_service.get_session_runs(db, sessionId)
+    return SessionRunsResponse(
+        runs=[
+            ExecutionRun(
+                problemId=run.problem_id,
+                kind=run.kind,
+                success=run.success,
+                queuedMs=run.queued_ms,
+                usage=ResourceUsage(
+                    exitReason=run.exit_reason,
+                    wallMs=run.wall_ms,
+                    cpuUserMs=run.cpu_user_ms,
+                    cpuSystemMs=run.cpu_system_ms,
+                    peakRssBytes=run.peak_rss_bytes,
+                ),
+                createdAt=run.created_at,
+            )
+            for run in runs
+        ]
+    )
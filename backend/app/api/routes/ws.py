@@ -2,27 +2,303 @@
 WebSocket endpoints for real-time synchronization
 """
 
-import json
+import asyncio
+import functools
+import time
 
 from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
 
+from app import execution
+from app.execution.cache import CacheKey
+from app.schemas.execution import TestCaseResult
 from app.schemas.websocket import (
-    ConnectionStatusMessage,
+    CodeAckMessage,
+    CodeDeltaMessage,
+    CodeOutputMessage,
+    CodeResultMessage,
+    CodeResyncMessage,
+    CodeResyncRequestMessage,
+    CodeUpdateMessage,
     ErrorMessage,
+    PongMessage,
+    PresenceMessage,
+    ProblemChangeMessage,
+    ProfileCodeMessage,
+    ProfileResultMessage,
+    RunCodeMessage,
+    TestCaseResultMessage,
     UserJoinedMessage,
     UserLeftMessage,
 )
-from app.websocket import manager
+from app.websocket import Connection, manager
+from app.websocket.dispatch import (
+    MAX_CODE_MESSAGE_BYTES,
+    Dispatcher,
+    MessageRejected,
+)
+from app.websocket.documents import VersionConflict
+from app.websocket.frames import Frame
+from app.websocket.ratelimit import FLOOD_CLOSE_CODE, RateLimited
+from app.websocket.sessions import SESSION_REJECTED_CLOSE_CODE
 
 router = APIRouter()
 
 
+# Handlers for incoming messages, keyed by message type
+dispatcher = Dispatcher()
+
+
+@dispatcher.register(PongMessage)
+async def handle_pong(connection: Connection, message: PongMessage, data: str | bytes):
+    """Heartbeat answer; activity is recorded for every message"""
+
+
+@dispatcher.register(CodeUpdateMessage, max_bytes=MAX_CODE_MESSAGE_BYTES)
+async def relay_code_update(connection: Connection, message: CodeUpdateMessage, data: str | bytes):
+    """Store a full-text code update and relay it with the new document version"""
+    session_id, websocket = connection.session_id, connection.websocket
+    # Re-encoded from the validated message so only declared fields reach peers
+    frame = Frame.of(message.model_dump(exclude_none=True))
+
+    document = manager.documents.replace(session_id, message.problemId, message.code)
+    manager.record_code(session_id, message.problemId, message.code)
+    if document is None:
+        # Too large to track on the server, relay without a version
+        await manager.broadcast_code_change(frame, session_id, message.problemId, exclude=websocket)
+        return
+
+    await manager.broadcast_code_change(
+        frame.with_fields(version=document.version),
+        session_id,
+        message.problemId,
+        exclude=websocket,  # Don't send back to sender
+    )
+
+    # Versioned clients need the new version to base their next delta on
+    if message.baseVersion is not None:
+        await manager.send_personal_message(
+            CodeAckMessage(problemId=message.problemId, version=document.version), websocket
+        )
+
+
+@dispatcher.register(CodeDeltaMessage, max_bytes=MAX_CODE_MESSAGE_BYTES)
+async def apply_code_delta(connection: Connection, delta: CodeDeltaMessage, data: str | bytes):
+    """Apply range edits and relay them, or resync the sender if it diverged"""
+    session_id, websocket = connection.session_id, connection.websocket
+    ops = [op.model_dump() for op in delta.ops]
+    try:
+        document = manager.documents.apply_delta(
+            session_id, delta.problemId, delta.baseVersion, ops
+        )
+    except (VersionConflict, ValueError):
+        await send_resync(websocket, session_id, delta.problemId)
+        return
+    manager.record_code(session_id, delta.problemId, document.text)
+
+    await manager.broadcast_code_change(
+        CodeDeltaMessage(
+            problemId=delta.problemId,
+            baseVersion=delta.baseVersion,
+            version=document.version,
+            ops=delta.ops,
+        ),
+        session_id,
+        delta.problemId,
+        exclude=websocket,
+    )
+    await manager.send_personal_message(
+        CodeAckMessage(problemId=delta.problemId, version=document.version), websocket
+    )
+
+
+@dispatcher.register(CodeResyncRequestMessage)
+async def handle_resync_request(
+    connection: Connection, message: CodeResyncRequestMessage, data: str | bytes
+):
+    """Client lost track of the document"""
+    await send_resync(connection.websocket, connection.session_id, message.problemId)
+
+
+async def send_resync(websocket: WebSocket, session_id: str, problem_id: int):
+    """Send the full document text to a client whose version diverged"""
+    document = manager.documents.get(session_id, problem_id)
+    await manager.send_personal_message(
+        CodeResyncMessage(
+            problemId=problem_id,
+            version=document.version if document else 0,
+            # A stale copy is not sent back: the client's code_update refreshes it
+            code=document.text if document and not document.stale else None,
+        ),
+        websocket,
+    )
+
+
+@dispatcher.register(ProblemChangeMessage)
+async def handle_problem_change(
+    connection: Connection, message: ProblemChangeMessage, data: str | bytes
+):
+    """Remember the active problem for clients joining later and broadcast it"""
+    session_id = connection.session_id
+    manager.documents.set_active_problem(session_id, message.problemId, message.problemIndex)
+    await manager.broadcast_to_session(
+        Frame.of(message.model_dump(exclude_none=True)),
+        session_id,
+        exclude=connection.websocket,
+    )
+
+
+@dispatcher.register(PresenceMessage)
+async def relay_presence(connection: Connection, message: PresenceMessage, data: str | bytes):
+    """Relay a cursor or selection change, tagged with its sender"""
+    manager.broadcast_presence(
+        message.model_dump(exclude_none=True)
+        | {
+            "clientId": connection.client_id,
+            "userName": connection.user_name,
+            "role": connection.user_role,
+        },
+        connection.websocket,
+    )
+
+
+@dispatcher.register(RunCodeMessage, max_bytes=MAX_CODE_MESSAGE_BYTES)
+async def handle_run_code(connection: Connection, message: RunCodeMessage, data: str | bytes):
+    """Answer from the result cache, or queue the run behind other sessions' runs"""
+    session_id = connection.session_id
+    suite = await execution.suites.get(message.problemId) if message.runTests else None
+    key = execution.cache.key(message.problemId, suite.version if suite else "", message.code)
+    result = execution.cache.get(key)
+    if result is not None:
+        # No usage: the resources were spent, and recorded, by the run that was cached
+        await manager.broadcast_to_session(
+            CodeResultMessage(
+                problemId=message.problemId, cached=True, **result.model_dump(exclude={"usage"})
+            ),
+            session_id,
+        )
+        return
+
+    execution.scheduler.submit(
+        session_id,
+        connection.websocket,
+        connection.user_role,
+        functools.partial(run_code, session_id, message, suite, key),
+    )
+
+
+async def run_code(
+    session_id: str,
+    message: RunCodeMessage,
+    suite: execution.TestSuite | None,
+    key: CacheKey,
+    job: execution.Job,
+):
+    """Execute code on the server and share the result with the whole session"""
+    start = time.perf_counter()
+    try:
+        result = await execution.pool.run(
+            message.code,
+            suite=suite,
+            on_case=functools.partial(send_test_case, session_id, message.problemId),
+            on_output=functools.partial(send_output, session_id, message.problemId),
+        )
+    except asyncio.CancelledError:
+        await send_run_failure(session_id, message.problemId, "Run was cancelled")
+        raise
+    except Exception:
+        # The scheduler logs the error; the session must still learn the run ended
+        await send_run_failure(session_id, message.problemId, "Run failed on the server")
+        raise
+    run_ms = (time.perf_counter() - start) * 1000
+    queued_ms = round(job.waited * 1000, 3)
+    execution.cache.put(key, result)
+    await manager.broadcast_to_session(
+        CodeResultMessage(
+            problemId=message.problemId,
+            queuedMs=queued_ms,
+            runMs=round(run_ms, 3),
+            **result.model_dump(),
+        ),
+        session_id,
+    )
+    await execution.runs.record(
+        session_id, message.problemId, "run", result.success, result.usage, queued_ms
+    )
+
+
+async def send_run_failure(session_id: str, problem_id: int, error: str):
+    """Share the end of a run that produced no result"""
+    await manager.broadcast_to_session(
+        CodeResultMessage(problemId=problem_id, success=False, output="", error=error),
+        session_id,
+    )
+
+
+async def send_output(session_id: str, problem_id: int, output: str):
+    """Share output while the code is still running"""
+    await manager.broadcast_to_session(
+        CodeOutputMessage(problemId=problem_id, output=output), session_id
+    )
+
+
+async def send_test_case(session_id: str, problem_id: int, case: TestCaseResult):
+    """Share a test case result as soon as the case finishes"""
+    await manager.broadcast_to_session(
+        TestCaseResultMessage(problemId=problem_id, **case.model_dump()), session_id
+    )
+
+
+@dispatcher.register(ProfileCodeMessage, max_bytes=MAX_CODE_MESSAGE_BYTES)
+async def handle_profile_code(
+    connection: Connection, message: ProfileCodeMessage, data: str | bytes
+):
+    """Queue a complexity profile of the code for the interviewer asking for it"""
+    if connection.user_role != "interviewer":
+        raise MessageRejected("Only the interviewer can profile code", "FORBIDDEN")
+    suite = await execution.suites.get(message.problemId)
+    if suite is None or suite.generator is None:
+        raise MessageRejected("The problem has no input generator", "PROFILE_UNAVAILABLE")
+
+    # Queued on its own, so it neither replaces nor is replaced by the session's runs
+    execution.scheduler.submit(
+        f"{connection.session_id}:profile",
+        connection.websocket,
+        connection.user_role,
+        functools.partial(profile_code, connection, message, suite),
+    )
+
+
+async def profile_code(
+    connection: Connection,
+    message: ProfileCodeMessage,
+    suite: execution.TestSuite,
+    job: execution.Job,
+):
+    """Profile code on the server and send the result to whoever asked"""
+    result = await execution.pool.profile(message.code, suite)
+    if connection.websocket in manager.connections:
+        await manager.send_personal_message(
+            ProfileResultMessage(problemId=message.problemId, **result.model_dump()),
+            connection.websocket,
+        )
+    await execution.runs.record(
+        connection.session_id,
+        message.problemId,
+        "profile",
+        result.success,
+        result.usage,
+        round(job.waited * 1000, 3),
+    )
+
+
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     session_id: str,
     user_name: str | None = Query(None),
     user_role: str | None = Query(None),
+    epoch: str | None = Query(None),
+    last_seq: int | None = Query(None),
 ):
     """
     WebSocket endpoint for real-time session synchronization
@@ -30,84 +306,78 @@ async def websocket_endpoint(
     Query params:
     - user_name: Name of the user connecting
     - user_role: Role of the user (interviewer or candidate)
+    - epoch, last_seq: Room epoch and last sequence number seen, when reconnecting
     """
-    await manager.connect(websocket, session_id)
+    # Refuse unknown and ended sessions before joining a room
+    reason = await manager.sessions.check(session_id, user_role)
+    if reason:
+        await websocket.close(code=SESSION_REJECTED_CLOSE_CODE, reason=reason)
+        return
 
-    try:
-        # Send connection confirmation
-        connection_count = manager.get_session_connection_count(session_id)
-        await manager.send_personal_message(
-            ConnectionStatusMessage(
-                status="connected", sessionId=session_id, activeUsers=connection_count
-            ).model_dump(),
-            websocket,
-        )
+    # Code saved before everyone left, e.g. when the candidate's browser crashed
+    await manager.restore_documents(session_id)
+
+    # The room greets the client with the connection status, and the broadcasts
+    # missed while reconnecting if they are still buffered
+    await manager.connect(websocket, session_id, user_name, user_role, epoch, last_seq)
 
+    try:
         # Notify others that user joined
         if user_name and user_role:
             await manager.broadcast_to_session(
-                UserJoinedMessage(userName=user_name, role=user_role).model_dump(),
+                UserJoinedMessage(userName=user_name, role=user_role),
                 session_id,
                 exclude=websocket,
             )
 
         # Listen for messages
+        connection = manager.connections[websocket]
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            message_type = message.get("type")
-
-            # Handle different message types
-            if message_type == "code_update":
-                # Broadcast code update to others in session
-                await manager.broadcast_to_session(
-                    message,
-                    session_id,
-                    exclude=websocket,  # Don't send back to sender
-                )
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            manager.touch(websocket)
 
-            elif message_type == "problem_change":
-                # Broadcast problem change to all in session
-                await manager.broadcast_to_session(message, session_id, exclude=websocket)
-
-            elif message_type == "run_code":
-                # For now, just echo back (execution will be implemented in Stage 12)
-                # In production, this would trigger code execution
-                await manager.send_personal_message(
-                    {
-                        "type": "code_result",
-                        "problemId": message.get("problemId"),
-                        "success": False,
-                        "error": "Code execution not yet implemented",
-                    },
-                    websocket,
-                )
+            data = received["text"] if received.get("text") is not None else received["bytes"]
+            try:
+                try:
+                    message, route = dispatcher.parse(data)
+                except MessageRejected:
+                    # Unknown and invalid frames share one budget
+                    manager.rate_limiter.check(websocket, session_id, None)
+                    raise
+                # Charged by the validated type, not one that appears anywhere in the frame
+                manager.rate_limiter.check(websocket, session_id, message.type)
 
-            else:
-                # Unknown message type
+                await route.handler(connection, message, data)
+            except MessageRejected as e:
                 await manager.send_personal_message(
-                    ErrorMessage(
-                        message=f"Unknown message type: {message_type}", code="UNKNOWN_MESSAGE_TYPE"
-                    ).model_dump(),
-                    websocket,
+                    ErrorMessage(message=str(e), code=e.code), websocket
                 )
+                if isinstance(e, RateLimited) and e.disconnect:
+                    # Flooding: close once the error is sent and clean up as a disconnect
+                    connection.close(FLOOD_CLOSE_CODE)
+                    await connection.wait_stopped(timeout=1)
+                    raise WebSocketDisconnect(FLOOD_CLOSE_CODE) from e
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, session_id)
-
-        # Notify others that user left
-        if user_name and user_role:
+        # Notify others that user left, unless the heartbeat already reaped the connection
+        if await manager.disconnect(websocket, session_id) and user_name and user_role:
             await manager.broadcast_to_session(
-                UserLeftMessage(userName=user_name, role=user_role).model_dump(), session_id
+                UserLeftMessage(userName=user_name, role=user_role), session_id
             )
 
     except Exception as e:
         # Handle other errors
         try:
             await manager.send_personal_message(
-                ErrorMessage(message=str(e), code="INTERNAL_ERROR").model_dump(), websocket
+                ErrorMessage(message=str(e), code="INTERNAL_ERROR"), websocket
             )
         except:
             pass
 
-        manager.disconnect(websocket, session_id)
+        await manager.disconnect(websocket, session_id)
+
+    finally:
+        # Runs this socket is still waiting for are no longer wanted
+        execution.scheduler.cancel(websocket)
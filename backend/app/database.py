@@ -3,10 +3,14 @@ Database configuration and session management
 """
 
 import os
+import time
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.metrics import DB_POOL_CHECKOUT_DURATION
 
 # Database URL
 DATABASE_URL = os.getenv(
@@ -16,11 +20,24 @@ DATABASE_URL = os.getenv(
 # Async database URL (for asyncpg)
 ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool that records how long checkouts wait"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_DURATION.observe(time.perf_counter() - start)
+
+
 # Create async engine
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
     echo=True,  # Log SQL queries (disable in production)
     future=True,
+    poolclass=TimedQueuePool,
 )
 
 # Create async session factory
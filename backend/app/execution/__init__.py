@@ -0,0 +1,26 @@
+"""
+Server-side code execution
+"""
+
+from .cache import ResultCache, cache
+from .runs import RunLog, runs
+from .sandbox import Limits, SandboxFailure, SandboxPool, pool
+from .scheduler import Job, Scheduler, scheduler
+from .testcases import TestSuite, TestSuites, suites
+
+__all__ = [
+    "Limits",
+    "SandboxFailure",
+    "SandboxPool",
+    "pool",
+    "ResultCache",
+    "cache",
+    "RunLog",
+    "runs",
+    "Job",
+    "Scheduler",
+    "scheduler",
+    "TestSuite",
+    "TestSuites",
+    "suites",
+]
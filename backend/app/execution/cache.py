@@ -0,0 +1,170 @@
+"""
+Execution result cache
+
+Candidates press Run again on unchanged code and interviewers re-run it while
+reviewing; each run would otherwise take a sandbox process. Results are cached
+per (problem ID, test-case version, normalized code). Normalizing drops
+comments and spacing inside lines but keeps line numbers, since tracebacks
+report them, so reformatting a line or editing a comment still hits.
+Normalizing means tokenizing, so the exact text is also remembered as an
+alias: an unchanged re-run costs one hash.
+
+Entries are evicted least recently used first, when they expire, or when the
+cached output exceeds its byte budget. Results the sandbox cut short (timeouts,
+killed processes), test runs where a case timed out and syntax errors (they
+quote the line as typed) are not cached.
+"""
+
+import hashlib
+import io
+import os
+import time
+import tokenize
+from collections import OrderedDict
+from collections.abc import Callable
+
+from app.schemas.execution import ExecutionResult, TestCaseResult
+
+from .sandbox import SandboxFailure
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("EXEC_CACHE_SIZE", "2048"))
+DEFAULT_MAX_BYTES = int(os.getenv("EXEC_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DEFAULT_TTL = float(os.getenv("EXEC_CACHE_TTL_S", "600"))
+
+# Errors that quote the source line as typed, comments and spacing included
+VERBATIM_ERRORS = ("SyntaxError:", "IndentationError:", "TabError:")
+
+# Rough memory of an entry besides its text: key, result object, slots
+ENTRY_OVERHEAD = 512
+
+# (problem_id, test-case version, code digest)
+CacheKey = tuple[int, str, bytes]
+
+
+def normalize(code: str) -> str:
+    """Tokens of the code with their line numbers, minus comments; as is if it does not tokenize"""
+    try:
+        return "\0".join(
+            f"{token.start[0]}:{token.type}:{token.string}"
+            for token in tokenize.generate_tokens(io.StringIO(code).readline)
+            if token.type not in (tokenize.COMMENT, tokenize.NL)
+        )
+    except (tokenize.TokenError, SyntaxError):
+        return code
+
+
+def digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def cacheable(result: ExecutionResult) -> bool:
+    """Whether a result depends only on the code"""
+    if isinstance(result, SandboxFailure):
+        return False
+    if any(case.timedOut for case in result.testResults or ()):
+        return False
+    last_line = (result.error or "").rstrip().rpartition("\n")[2]
+    return not last_line.startswith(VERBATIM_ERRORS)
+
+
+def _text_size(result: ExecutionResult | TestCaseResult) -> int:
+    return len(result.output.encode()) + len((result.error or "").encode())
+
+
+class _Entry:
+    __slots__ = ("result", "size", "expires")
+
+    def __init__(self, result: ExecutionResult, size: int, expires: float):
+        self.result = result
+        self.size = size
+        self.expires = expires
+
+
+class ResultCache:
+    """LRU cache of execution results with a TTL and a memory budget"""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        # Normalized key -> result, least recently used first
+        self.entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        # Exact-text key -> normalized key, to skip tokenizing unchanged code
+        self.aliases: OrderedDict[CacheKey, CacheKey] = OrderedDict()
+        self.size = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, problem_id: int, tests_version: str, code: str) -> CacheKey:
+        """Key of a run, normalizing the code unless its exact text was seen"""
+        exact = (problem_id, tests_version, digest(code))
+        key = self.aliases.get(exact)
+        if key is None:
+            key = (problem_id, tests_version, digest(normalize(code)))
+            self.aliases[exact] = key
+            while len(self.aliases) > self.max_entries:
+                self.aliases.popitem(last=False)
+        else:
+            self.aliases.move_to_end(exact)
+        return key
+
+    def get(self, key: CacheKey) -> ExecutionResult | None:
+        """Cached result of a run, if any and not expired"""
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires <= self.clock():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.result
+
+    def put(self, key: CacheKey, result: ExecutionResult):
+        """Remember a result unless it did not depend only on the code"""
+        if not cacheable(result):
+            return
+        size = ENTRY_OVERHEAD + _text_size(result)
+        for case in result.testResults or ():
+            size += ENTRY_OVERHEAD + _text_size(case) + len((case.actual or "").encode())
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        self.entries[key] = _Entry(result, size, self.clock() + self.ttl)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def get_stats(self) -> dict:
+        """Cache counters and hit rate for this worker"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# Global result cache instance
+cache = ResultCache()
@@ -0,0 +1,51 @@
+"""
+Growth class of measured costs
+
+Each candidate class f is fitted as cost = c * f(n) in log space, where the
+scale c drops out: the class whose log f(n) follows the log of the measured
+costs most closely, up to a constant, is the estimate. Working with logs
+weighs the small sizes as much as the large ones and keeps the exponential
+class from overflowing. Costs too small to measure reliably, such as calls
+that take about as long as the call itself, are left out.
+"""
+
+import math
+from collections.abc import Callable, Sequence
+
+# log f(n) of each class, slowest growing first
+CLASSES: dict[str, Callable[[int], float]] = {
+    "O(1)": lambda n: 0.0,
+    "O(log n)": lambda n: math.log(math.log(max(n, 2))),
+    "O(n)": lambda n: math.log(max(n, 1)),
+    "O(n log n)": lambda n: math.log(max(n, 1)) + math.log(math.log(max(n, 2))),
+    "O(n^2)": lambda n: 2 * math.log(max(n, 1)),
+    "O(n^3)": lambda n: 3 * math.log(max(n, 1)),
+    "O(2^n)": lambda n: n * math.log(2),
+}
+
+# Fewest distinct sizes a growth class is estimated from
+MIN_POINTS = 3
+
+
+def estimate(points: Sequence[tuple[int, float]], floor: float = 0.0) -> str | None:
+    """
+    Best fitting growth class of (size, cost) points; None with too few sizes.
+    Costs below ``floor`` cannot be told apart from noise and are left out, and
+    costs that never rise above it count as constant
+    """
+    if len({size for size, _ in points}) < MIN_POINTS:
+        return None
+    points = [(size, cost) for size, cost in points if cost > floor]
+    if not points:
+        return "O(1)"
+    if len({size for size, _ in points}) < MIN_POINTS:
+        return None
+    costs = [math.log(cost) for _, cost in points]
+
+    def spread(log_f: Callable[[int], float]) -> float:
+        residuals = [cost - log_f(size) for (size, _), cost in zip(points, costs, strict=True)]
+        mean = sum(residuals) / len(residuals)
+        return sum((residual - mean) ** 2 for residual in residuals)
+
+    # Ties go to the slower growing class
+    return min(CLASSES, key=lambda name: spread(CLASSES[name]))
@@ -0,0 +1,76 @@
+"""
+Recorded runs
+
+The resource usage of every server-side run is saved with its session, so the
+evaluation screen can show what each solution cost and the sandbox limits can
+be tuned from real runs. Results answered from the cache did not run and are
+not recorded. A run that fails to save is only logged.
+"""
+
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Literal
+
+from app.database import AsyncSessionLocal
+from app.schemas.execution import ResourceUsage
+from app.services import sessions as sessions_service
+
+logger = logging.getLogger(__name__)
+
+SaveFunction = Callable[[dict], Awaitable[None]]
+
+
+async def save_run(run: dict):
+    """Insert one run in its own transaction"""
+    async with AsyncSessionLocal() as db:
+        await sessions_service.save_run(db, run)
+        await db.commit()
+
+
+class RunLog:
+    """Saves the resource usage of each run with its session"""
+
+    def __init__(self, save: SaveFunction = save_run):
+        self.save = save
+
+        # Counters
+        self.recorded = 0
+        self.failures = 0
+
+    async def record(
+        self,
+        session_id: str,
+        problem_id: int,
+        kind: Literal["run", "profile"],
+        success: bool,
+        usage: ResourceUsage,
+        queued_ms: float | None = None,
+    ):
+        """Save a finished run"""
+        run = {
+            "session_id": session_id,
+            "problem_id": problem_id,
+            "kind": kind,
+            "success": success,
+            "exit_reason": usage.exitReason,
+            "queued_ms": queued_ms,
+            "wall_ms": usage.wallMs,
+            "cpu_user_ms": usage.cpuUserMs,
+            "cpu_system_ms": usage.cpuSystemMs,
+            "peak_rss_bytes": usage.peakRssBytes,
+        }
+        try:
+            await self.save(run)
+        except Exception:
+            self.failures += 1
+            logger.exception("Failed to record a run of session %s", session_id)
+            return
+        self.recorded += 1
+
+    def get_stats(self) -> dict:
+        """Recording counters for this worker"""
+        return {"recorded": self.recorded, "failures": self.failures}
+
+
+# Global run log instance
+runs = RunLog()
@@ -0,0 +1,523 @@
+"""
+Sandboxed code execution on a pool of warm worker processes
+
+Candidate code runs in separate Python processes (see worker.py) with rlimits
+on CPU time, memory, file sizes and open files, without network access, in a
+temporary working directory that is removed afterwards. Processes are started
+ahead of time and have already imported the common modules, so a run does not
+wait for interpreter startup. Each is a harness that runs the code in a child
+of its own and judges it: nothing the code writes reaches the pool except as
+output. Each serves a single run and is replaced when it ends; the pool size
+caps how many runs execute at once on this worker.
+
+Output is passed on in chunks while the code runs. A run may include a
+problem's test cases: they are all run in the same process against the code
+loaded once, unless one takes the process down, and each case's result is
+passed on as soon as it arrives. A
+profiling run times the code on inputs of growing size from the problem's
+generator instead, and the growth classes of time and memory are fitted to
+the sizes it got through.
+
+Every run reports the CPU time, peak resident memory and wall time it used and
+why it ended. The harness collects the child's usage with wait4 once it has
+exited; a run whose harness stops answering is killed with its usage unknown.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from asyncio.subprocess import DEVNULL, PIPE, Process
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import NamedTuple, TypeVar
+
+from app.metrics import EXEC_CPU_SECONDS, EXEC_PEAK_RSS, EXEC_SANDBOX_RUNS, EXEC_WALL_SECONDS
+from app.schemas.execution import (
+    ExecutionResult,
+    ExitReason,
+    ProfilePoint,
+    ProfileResult,
+    ResourceUsage,
+    TestCaseResult,
+)
+
+from . import complexity
+from .testcases import TestSuite
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = str(Path(__file__).with_name("worker.py"))
+
+DEFAULT_POOL_SIZE = int(os.getenv("EXEC_POOL_SIZE", "2"))
+DEFAULT_TIMEOUT = float(os.getenv("EXEC_TIMEOUT_S", "5"))
+DEFAULT_CPU_SECONDS = int(os.getenv("EXEC_CPU_S", "5"))
+DEFAULT_MEMORY_MB = int(os.getenv("EXEC_MEMORY_MB", "256"))
+DEFAULT_OUTPUT_CHARS = int(os.getenv("EXEC_OUTPUT_CHARS", str(64 * 1024)))
+DEFAULT_CASE_TIMEOUT = float(os.getenv("EXEC_CASE_TIMEOUT_S", "2"))
+DEFAULT_CASE_CPU_SECONDS = float(os.getenv("EXEC_CASE_CPU_S", "2"))
+DEFAULT_STREAM_INTERVAL = int(os.getenv("EXEC_STREAM_INTERVAL_MS", "100")) / 1000
+DEFAULT_PROFILE_BUDGET = float(os.getenv("EXEC_PROFILE_BUDGET_S", "15"))
+
+# Time a line may take to arrive beyond the harness's own timeouts
+CASE_GRACE = 1.0
+# Time a worker that reported its result gets to exit on its own
+EXIT_GRACE = 1.0
+
+# Profiled costs below these are mostly call overhead and timer noise
+PROFILE_TIME_FLOOR_MS = 0.1
+PROFILE_MEMORY_FLOOR_BYTES = 16 * 1024
+
+# The server's settings, such as the database URL, must not reach candidate code.
+# Large blocks get their own mappings and freed memory goes back to the system,
+# so the resident memory the harness reads follows what a call allocates
+WORKER_ENV = {
+    "PATH": "/usr/bin:/bin",
+    "LANG": "C.UTF-8",
+    "MALLOC_MMAP_THRESHOLD_": "65536",
+    "MALLOC_TRIM_THRESHOLD_": "131072",
+}
+
+
+@dataclass(frozen=True)
+class Limits:
+    """Resources a single run may use"""
+
+    # Wall-clock seconds
+    timeout: float = DEFAULT_TIMEOUT
+    cpu_seconds: int = DEFAULT_CPU_SECONDS
+    memory_bytes: int = DEFAULT_MEMORY_MB * 1024 * 1024
+    output_chars: int = DEFAULT_OUTPUT_CHARS
+    file_bytes: int = 1024 * 1024
+    open_files: int = 64
+    # Per test case, on top of loading the code
+    case_timeout: float = DEFAULT_CASE_TIMEOUT
+    case_cpu_seconds: float = DEFAULT_CASE_CPU_SECONDS
+    # Seconds between chunks of output sent while the code runs
+    stream_interval: float = DEFAULT_STREAM_INTERVAL
+    # Wall-clock seconds after which profiling starts no further input sizes
+    profile_budget: float = DEFAULT_PROFILE_BUDGET
+
+    def for_suite(self, suite: TestSuite) -> "Limits":
+        """Limits of a run including the suite's cases: CPU time for each case is added"""
+        extra = math.ceil(len(suite.cases) * self.case_cpu_seconds)
+        return replace(self, cpu_seconds=self.cpu_seconds + extra)
+
+    def for_profile(self) -> "Limits":
+        """Limits of a profiling run: CPU time for the budget and the last size is added"""
+        extra = math.ceil(self.profile_budget + self.case_cpu_seconds)
+        return replace(self, cpu_seconds=self.cpu_seconds + extra)
+
+
+def describe_exit(returncode: int) -> str:
+    """Error for a harness that died without reporting a result"""
+    if returncode == -signal.SIGXCPU:
+        return "CPU time limit exceeded"
+    if returncode == -signal.SIGKILL:
+        return "Process was killed after exceeding its limits"
+    return f"Process exited with code {returncode}"
+
+
+def exit_reason(outcomes: Iterable[tuple[str | None, bool]]) -> ExitReason:
+    """How a run that reported its result ended, from the (error, timed out) of its parts"""
+    for error, timed_out in outcomes:
+        if timed_out:
+            return "timeout"
+        if error:
+            last_line = error.strip().splitlines()[-1]
+            return "memory_limit" if last_line.startswith("MemoryError") else "exception"
+    return "completed"
+
+
+class Usage(NamedTuple):
+    """CPU seconds in user and system mode and peak RSS in bytes"""
+
+    user: float | None = None
+    system: float | None = None
+    peak_rss: int | None = None
+
+
+class Worker:
+    """A warm worker process waiting for its one job"""
+
+    def __init__(self, process: Process, workdir: str):
+        self.process = process
+        self.workdir = workdir
+        # The final line of the run, once it arrived
+        self.report: dict | None = None
+        self.timed_out = False
+        # Resource accounting: the harness reports the usage of the child
+        self.started = self.ended = 0.0
+        self.cut_reason: ExitReason | None = None
+
+    @classmethod
+    async def spawn(cls, python: str, limits: Limits) -> "Worker":
+        """Start a worker process in a new temporary directory"""
+        workdir = tempfile.mkdtemp(prefix="sandbox-")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                python,
+                "-I",
+                WORKER_SCRIPT,
+                stdin=PIPE,
+                stdout=PIPE,
+                stderr=DEVNULL,
+                cwd=workdir,
+                env=WORKER_ENV,
+                # Room for the escaped output on the one result line
+                limit=6 * limits.output_chars + 64 * 1024,
+            )
+        except BaseException:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        return cls(process, workdir)
+
+    async def run(
+        self,
+        code: str,
+        limits: Limits,
+        suite: TestSuite | None = None,
+        on_case: Callable[[TestCaseResult], Awaitable] | None = None,
+        on_output: Callable[[str], Awaitable] | None = None,
+    ) -> ExecutionResult:
+        """Send the job and wait for the result"""
+        job = {"code": code, "limits": asdict(limits)}
+        if suite is not None:
+            job["tests"] = {"entry": suite.entry, "cases": suite.cases}
+
+        cases: list[TestCaseResult] = []
+
+        async def progress(message: dict):
+            if "chunk" in message:
+                if on_output is not None:
+                    await on_output(message["chunk"])
+            elif "case" in message:
+                cases.append(message["case"])
+                if on_case is not None:
+                    await on_case(message["case"])
+
+        error = await self._exchange(job, limits, progress)
+        if error is not None:
+            result = _failure(error, cases)
+        else:
+            result = ExecutionResult(
+                success=self.report["success"] and all(case.passed for case in cases),
+                output=self.report["output"],
+                error=self.report["error"],
+                testResults=cases if suite is not None else None,
+            )
+        result.usage = self._usage([(result.error, False), *((c.error, c.timedOut) for c in cases)])
+        return result
+
+    async def profile(self, code: str, limits: Limits, suite: TestSuite) -> ProfileResult:
+        """Send a profiling job and estimate the growth classes from its sizes"""
+        job = {
+            "code": code,
+            "limits": asdict(limits),
+            "profile": {
+                "entry": suite.entry,
+                "generator": suite.generator,
+                "budget": limits.profile_budget,
+            },
+        }
+        points: list[ProfilePoint] = []
+
+        async def progress(message: dict):
+            if "point" in message:
+                points.append(message["point"])
+
+        error = await self._exchange(job, limits, progress)
+        if error is None:
+            error = self.report["error"]
+        # Running out of time only ends the profile, an exception fails it
+        error = error or next(
+            (point.error for point in points if point.error and not point.timedOut), None
+        )
+        measured = [point for point in points if point.error is None]
+        # Sizes too slow to trace have no peak
+        peaks = [
+            (point.size, point.peakMemoryBytes)
+            for point in measured
+            if point.peakMemoryBytes is not None
+        ]
+        return ProfileResult(
+            success=error is None,
+            points=points,
+            timeComplexity=complexity.estimate(
+                [(point.size, point.timeMs) for point in measured], PROFILE_TIME_FLOOR_MS
+            ),
+            memoryComplexity=complexity.estimate(peaks, PROFILE_MEMORY_FLOOR_BYTES),
+            peakMemoryBytes=max((peak for _, peak in peaks), default=None),
+            error=error,
+            usage=self._usage(
+                [
+                    (self.report and self.report["error"], False),
+                    *((point.error, point.timedOut) for point in points),
+                ]
+            ),
+        )
+
+    async def _exchange(
+        self, job: dict, limits: Limits, progress: Callable[[dict], Awaitable]
+    ) -> str | None:
+        """
+        Send the job, pass each line before the final report to ``progress`` and
+        keep the report; returns the error if the run was cut short
+        """
+        # The harness times the child out itself; these only catch a harness
+        # that stopped answering. Loading the code gets the run's timeout, then
+        # each case or size its own: a size may load inputs and time two calls
+        timeout = limits.timeout + CASE_GRACE
+        step = limits.timeout + 2 * (limits.case_timeout + CASE_GRACE) + EXIT_GRACE
+        self.started = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout) as deadline:
+                self.process.stdin.write(json.dumps(job).encode() + b"\n")
+                await self.process.stdin.drain()
+                while True:
+                    line = await self.process.stdout.readline()
+                    if not line:
+                        break
+                    message = _parse(line)
+                    if message is None:
+                        self._cut_short("crashed")
+                        return "Sandbox returned an invalid result"
+                    if "success" in message:
+                        self.ended = time.perf_counter()
+                        self.report = message
+                        # The harness cut a child short: the error, if any, is the sandbox's
+                        if message["cut"] is not None:
+                            self.cut_reason = message["cut"]
+                            self.timed_out = message["cut"] == "timeout"
+                            return message["error"]
+                        return None
+                    await progress(message)
+                    # Output may arrive at any time and does not extend the deadline
+                    if "chunk" not in message:
+                        timeout = step
+                        deadline.reschedule(asyncio.get_running_loop().time() + timeout)
+        except TimeoutError:
+            self.timed_out = True
+            self._cut_short("timeout")
+            return f"Timed out after {timeout:g}s"
+        except (ConnectionError, ValueError):
+            pass  # The pipe broke or a line was far too long
+
+        self._cut_short("crashed")
+        self.process.kill()
+        returncode = await self.process.wait()
+        if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+            self.cut_reason = "cpu_limit"
+        return describe_exit(returncode)
+
+    def _cut_short(self, reason: ExitReason):
+        """Note how a run that did not report ended; its child dies with the harness"""
+        self.ended = time.perf_counter()
+        self.cut_reason = reason
+
+    def _usage(self, outcomes: Iterable[tuple[str | None, bool]]) -> ResourceUsage:
+        """What the run used and how it ended"""
+        if self.report is not None:
+            used = Usage(*self.report["usage"])
+            reason = self.cut_reason or exit_reason(outcomes)
+        else:
+            used, reason = Usage(), self.cut_reason
+
+        def ms(seconds: float | None) -> float | None:
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        return ResourceUsage(
+            exitReason=reason,
+            wallMs=ms(self.ended - self.started),
+            cpuUserMs=ms(used.user),
+            cpuSystemMs=ms(used.system),
+            peakRssBytes=used.peak_rss,
+        )
+
+    async def close(self):
+        """Stop the process and remove its directory"""
+        # Killing a process that already exited would race asyncio's child watcher
+        if self.report is not None:
+            try:
+                async with asyncio.timeout(EXIT_GRACE):
+                    await self.process.wait()
+            except TimeoutError:
+                pass
+        if self.process.returncode is None:
+            self.process.kill()
+        await self.process.wait()
+        await asyncio.to_thread(shutil.rmtree, self.workdir, True)
+
+
+def observe(usage: ResourceUsage):
+    """Record a run's resource usage in the metrics"""
+    EXEC_SANDBOX_RUNS.labels(usage.exitReason).inc()
+    EXEC_WALL_SECONDS.observe(usage.wallMs / 1000)
+    if usage.cpuUserMs is not None:
+        EXEC_CPU_SECONDS.labels("user").observe(usage.cpuUserMs / 1000)
+        EXEC_CPU_SECONDS.labels("system").observe(usage.cpuSystemMs / 1000)
+    if usage.peakRssBytes is not None:
+        EXEC_PEAK_RSS.observe(usage.peakRssBytes)
+
+
+class SandboxFailure(ExecutionResult):
+    """Result of a run the sandbox cut short, rather than one the code finished"""
+
+
+def _parse(line: bytes) -> dict | None:
+    """A line from the worker, with a case or size result parsed; None if invalid"""
+    try:
+        message = json.loads(line)
+        if "case" in message:
+            message["case"] = TestCaseResult(**message["case"])
+        if "point" in message:
+            message["point"] = ProfilePoint(**message["point"])
+    except (ValueError, TypeError):
+        return None
+    return message
+
+
+def _failure(error: str, cases: list[TestCaseResult] | None = None) -> ExecutionResult:
+    return SandboxFailure(success=False, output="", error=error, testResults=cases or None)
+
+
+class SandboxPool:
+    """Warm single-use worker processes that run code under resource limits"""
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        limits: Limits | None = None,
+        python: str = sys.executable,
+    ):
+        self.size = size
+        self.limits = limits or Limits()
+        self.python = python
+        self.idle: asyncio.Queue[Worker] = asyncio.Queue()
+        self.running = False
+        self._spawning: set[asyncio.Task] = set()
+        self._warned_network = False
+
+        # Counters
+        self.runs = 0
+        self.timeouts = 0
+        self.spawn_failures = 0
+        self.spawn_seconds = 0.0
+        self.run_seconds = 0.0
+
+    async def start(self):
+        """Start the warm processes in the background"""
+        if self.running:
+            return
+        self.running = True
+        # Bound to the running loop on first use, so created on each start
+        self.idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._replenish()
+
+    async def stop(self):
+        """Stop starting processes and kill the idle ones"""
+        self.running = False
+        for task in list(self._spawning):
+            task.cancel()
+        while not self.idle.empty():
+            await self.idle.get_nowait().close()
+
+    def _replenish(self):
+        task = asyncio.get_running_loop().create_task(self._spawn())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def _spawn(self):
+        while self.running:
+            start = time.perf_counter()
+            try:
+                worker = await Worker.spawn(self.python, self.limits)
+            except Exception:
+                self.spawn_failures += 1
+                logger.exception("Failed to start a sandbox worker, retrying")
+                await asyncio.sleep(1)
+                continue
+            self.spawn_seconds += time.perf_counter() - start
+            if not self.running:
+                await worker.close()
+                return
+            self.idle.put_nowait(worker)
+            return
+
+    async def run(
+        self,
+        code: str,
+        limits: Limits | None = None,
+        suite: TestSuite | None = None,
+        on_case: Callable[[TestCaseResult], Awaitable] | None = None,
+        on_output: Callable[[str], Awaitable] | None = None,
+    ) -> ExecutionResult:
+        """
+        Run code in a warm worker, waiting for one if all are busy. ``on_output``
+        gets output as it is printed; with a suite its test cases are run too
+        and ``on_case`` gets each result
+        """
+        limits = limits or self.limits
+        if suite is not None:
+            limits = limits.for_suite(suite)
+        return await self._execute(
+            lambda worker: worker.run(code, limits, suite, on_case, on_output)
+        )
+
+    async def profile(
+        self, code: str, suite: TestSuite, limits: Limits | None = None
+    ) -> ProfileResult:
+        """Profile the time and memory growth of code on the suite's generated inputs"""
+        limits = (limits or self.limits).for_profile()
+        return await self._execute(lambda worker: worker.profile(code, limits, suite))
+
+    async def _execute(self, job: Callable[[Worker], Awaitable[T]]) -> T:
+        await self.start()
+        worker = await self.idle.get()
+        start = time.perf_counter()
+        try:
+            result = await job(worker)
+        finally:
+            # Warm the next process while this one is cleaned up
+            self._replenish()
+            await worker.close()
+            self.runs += 1
+            self.run_seconds += time.perf_counter() - start
+
+        if worker.timed_out:
+            self.timeouts += 1
+        observe(result.usage)
+        report = worker.report or {}
+        if report.get("networkIsolated") is False and not self._warned_network:
+            self._warned_network = True
+            logger.warning(
+                "Sandbox runs cannot create a network namespace; sockets are only "
+                "refused by the audit hook"
+            )
+        return result
+
+    def get_stats(self) -> dict:
+        """Pool counters for this worker"""
+        return {
+            "size": self.size,
+            "idle": self.idle.qsize(),
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "spawn_failures": self.spawn_failures,
+            "spawn_seconds": self.spawn_seconds,
+            "run_seconds": self.run_seconds,
+        }
+
+
+# Global sandbox pool instance
+pool = SandboxPool()
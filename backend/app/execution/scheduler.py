@@ -0,0 +1,160 @@
+"""
+Fair scheduling of runs across sessions
+
+Runs are queued here before they take a sandbox process, so one candidate
+pressing Run over and over cannot hold every process on the worker. At most
+``limit`` runs execute at once. Each session has at most one run executing and
+one waiting: a newer request replaces the waiting one, which would only have
+produced a stale result. Sessions with a waiting run take turns in the order
+they became ready, and a session goes to the back of the line when its run
+ends. Runs requested by an interviewer go ahead of candidates' runs.
+
+Waiting runs belong to the socket that asked for them and are dropped when it
+disconnects; a run already executing finishes and is still shared with the
+session.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass, field
+
+from app.metrics import EXEC_QUEUE_WAIT, EXEC_RUN_DURATION
+
+from .sandbox import DEFAULT_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = int(os.getenv("EXEC_MAX_CONCURRENT", str(DEFAULT_POOL_SIZE)))
+
+PRIORITY_ROLES = frozenset({"interviewer"})
+
+
+@dataclass(eq=False)
+class Job:
+    """A run waiting for its turn"""
+
+    session_id: str
+    # Whoever asked for it, usually their WebSocket
+    owner: Hashable
+    role: str | None
+    work: Callable[["Job"], Awaitable]
+    enqueued: float = field(default_factory=time.perf_counter)
+    started: float | None = None
+
+    @property
+    def priority(self) -> bool:
+        return self.role in PRIORITY_ROLES
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent in the queue"""
+        return (self.started or time.perf_counter()) - self.enqueued
+
+
+class Scheduler:
+    """Round-robin run queue with a concurrency cap and one run per session"""
+
+    def __init__(self, limit: int = DEFAULT_LIMIT):
+        self.limit = limit
+        # Waiting run of each session
+        self.pending: dict[str, Job] = {}
+        # Sessions with a waiting run and none executing, in turn order
+        self.ready: deque[str] = deque()
+        self.running: dict[str, asyncio.Task] = {}
+
+        # Counters
+        self.submitted = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(
+        self,
+        session_id: str,
+        owner: Hashable,
+        role: str | None,
+        work: Callable[[Job], Awaitable],
+    ) -> Job:
+        """Queue a run, replacing the session's waiting one; ``work`` gets the job when it starts"""
+        self.submitted += 1
+        job = Job(session_id, owner, role, work)
+        previous = self.pending.get(session_id)
+        if previous is not None:
+            # Still waiting since the first request
+            job.enqueued = previous.enqueued
+            self.coalesced += 1
+        elif session_id not in self.running:
+            self.ready.append(session_id)
+        self.pending[session_id] = job
+        self._dispatch()
+        return job
+
+    def cancel(self, owner: Hashable) -> int:
+        """Drop the waiting runs of a disconnected owner; returns how many"""
+        dropped = [job for job in self.pending.values() if job.owner == owner]
+        for job in dropped:
+            del self.pending[job.session_id]
+            if job.session_id in self.ready:
+                self.ready.remove(job.session_id)
+        self.cancelled += len(dropped)
+        return len(dropped)
+
+    async def stop(self):
+        """Drop waiting runs and cancel executing ones"""
+        self.pending.clear()
+        self.ready.clear()
+        tasks = list(self.running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _dispatch(self):
+        while self.ready and len(self.running) < self.limit:
+            session_id = next(
+                (session_id for session_id in self.ready if self.pending[session_id].priority),
+                self.ready[0],
+            )
+            self.ready.remove(session_id)
+            job = self.pending.pop(session_id)
+            job.started = time.perf_counter()
+            EXEC_QUEUE_WAIT.labels(job.role or "unknown").observe(job.waited)
+            self.running[session_id] = asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: Job):
+        try:
+            await job.work(job)
+            self.completed += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("Run for session %s failed", job.session_id)
+        finally:
+            EXEC_RUN_DURATION.labels(job.role or "unknown").observe(
+                time.perf_counter() - job.started
+            )
+            del self.running[job.session_id]
+            # The session's next run goes to the back of the line
+            if job.session_id in self.pending:
+                self.ready.append(job.session_id)
+            self._dispatch()
+
+    def get_stats(self) -> dict:
+        """Queue counters for this worker"""
+        return {
+            "limit": self.limit,
+            "running": len(self.running),
+            "waiting": len(self.pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Global run scheduler instance
+scheduler = Scheduler()
@@ -0,0 +1,80 @@
+"""
+Problem test suites
+
+A problem's test cases call the function or class its starter code defines:
+the first one defined at the top level is the entry point. Its input generator,
+if it has one, makes inputs of any size for profiling. Suites are loaded
+from the database once per worker, since problems do not change while the app
+runs.
+"""
+
+import ast
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from app.database import AsyncSessionLocal
+from app.services import problems as problems_service
+
+
+@dataclass(frozen=True)
+class TestSuite:
+    """Test cases of a problem, the name they call and the problem's input generator"""
+
+    entry: str
+    # [{"input": [...], "expected": ...}, ...]
+    cases: list[dict] = field(default_factory=list)
+    # Python source defining generate(n)
+    generator: str | None = None
+
+    @property
+    def version(self) -> str:
+        """Hash of the entry point and cases, for keying cached results"""
+        text = json.dumps([self.entry, self.cases], sort_keys=True)
+        return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def entry_point(starter_code: str) -> str | None:
+    """Name of the first function or class defined by the starter code"""
+    try:
+        tree = ast.parse(starter_code)
+    except SyntaxError:
+        return None
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return node.name
+    return None
+
+
+async def load_suite(problem_id: int) -> TestSuite | None:
+    """Read a problem's test suite; None if it has no cases or generator, or nothing to call"""
+    async with AsyncSessionLocal() as db:
+        problem = await problems_service.get_problem_by_id(db, problem_id)
+    if problem is None or not (problem.test_cases or problem.input_generator):
+        return None
+    entry = entry_point(problem.starter_code)
+    if entry is None:
+        return None
+    return TestSuite(entry, list(problem.test_cases), problem.input_generator)
+
+
+class TestSuites:
+    """Per-worker cache of problem test suites"""
+
+    def __init__(self, load: Callable[[int], Awaitable[TestSuite | None]] = load_suite):
+        self.load = load
+        self.suites: dict[int, TestSuite] = {}
+
+    async def get(self, problem_id: int) -> TestSuite | None:
+        """Test suite of a problem, if it has one"""
+        suite = self.suites.get(problem_id)
+        if suite is None:
+            suite = await self.load(problem_id)
+            if suite is not None:
+                self.suites[problem_id] = suite
+        return suite
+
+
+# Global test suite cache instance
+suites = TestSuites()
@@ -0,0 +1,915 @@
+"""
+Sandbox worker process
+
+Started by the pool ahead of time as ``python -I worker.py`` in an empty
+temporary directory. The process is a harness: it imports the modules
+candidates commonly use and forks the child that will run the candidate's
+code, so a run pays for neither interpreter startup nor the imports. The
+harness then waits for one job on stdin and only ever passes the child the
+code, the limits and the inputs to call it with.
+
+The child cuts itself off from the network, applies the resource limits and
+runs the code with output captured, sending what it printed so far once per
+interval. It answers the harness over a pipe of its own: the harness's pipe to
+the pool is not open in it. Everything the child sends is treated as the
+candidate's: the harness compares returned values with the expected ones
+itself, times each call from its side of the pipe, reads the child's CPU clock
+and resident memory from the kernel, and collects its rusage with wait4 once
+it exits. When the job has test cases they are all run against the same
+loaded code, each case's result written to the pool as its own line as soon as
+it finishes. A case that kills the child or stops answering fails on its own:
+the cases after it run in a fresh child that loads the code again. A profiling
+job instead calls the entry point on inputs of growing size from the problem's
+generator, which runs in the harness, each size in a fresh child whose memory
+growth the harness reads from /proc, one line per size. The process exits
+after that one job, so nothing leaks from one run to the next.
+
+Only the standard library is used: the app and its settings are not
+importable from candidate code.
+"""
+
+import builtins
+import io
+import json
+import math
+import os
+import random
+import resource
+import select
+import signal
+import sys
+import threading
+import time
+import traceback
+
+# Imported while idle so candidate imports of them are free
+PREIMPORTED = (
+    "bisect",
+    "collections",
+    "copy",
+    "dataclasses",
+    "datetime",
+    "decimal",
+    "enum",
+    "fractions",
+    "functools",
+    "heapq",
+    "itertools",
+    "math",
+    "operator",
+    "random",
+    "re",
+    "statistics",
+    "string",
+    "typing",
+)
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+PR_SET_PDEATHSIG = 1
+
+# Audit events that would let code reach outside the sandbox
+BLOCKED_EVENTS = frozenset(
+    {
+        "socket.__new__",
+        "subprocess.Popen",
+        "os.system",
+        "os.exec",
+        "os.posix_spawn",
+        "os.spawn",
+        "os.fork",
+        "os.forkpty",
+        "os.kill",
+        "os.killpg",
+        "ctypes.dlopen",
+        "ctypes.dlsym",
+    }
+)
+
+# Events changing the files named in their first two arguments
+FILE_CHANGE_EVENTS = frozenset(
+    {
+        "os.chmod",
+        "os.chown",
+        "os.link",
+        "os.mkdir",
+        "os.remove",
+        "os.rename",
+        "os.rmdir",
+        "os.symlink",
+        "os.truncate",
+        "os.utime",
+        "shutil.rmtree",
+    }
+)
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+SOLUTION_FILENAME = "<solution>"
+TRUNCATED_NOTICE = "\n[output truncated]\n"
+# Longest repr of a returned value sent back
+MAX_ACTUAL_CHARS = 1000
+
+GENERATOR_FILENAME = "<generator>"
+# Input sizes profiled when the generator does not set its own SIZES
+PROFILE_SIZES = tuple(2**k for k in range(6, 17))
+MAX_PROFILE_SIZES = 16
+# Each size is timed as the best of up to this many calls, until they add up to
+# PROFILE_MIN_SECONDS, so that short calls are not all timer noise
+PROFILE_REPEATS = 5
+PROFILE_MIN_SECONDS = 0.05
+
+# Time a reply may take beyond the child's own timer for the call
+CASE_GRACE = 1.0
+# Time the child gets to exit on its own once it has nothing left to do
+EXIT_GRACE = 1.0
+
+
+class Channel:
+    """Writing end of a pipe, shared by the main thread and the streamer"""
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+
+    def send(self, message: dict):
+        line = json.dumps(message) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+
+class OutputStreamer:
+    """Sends the output written so far as one chunk per interval"""
+
+    def __init__(self, channel: Channel, interval: float):
+        self.channel = channel
+        self.interval = interval
+        self.pending: list[str] = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def add(self, text: str):
+        with self.lock:
+            self.pending.append(text)
+
+    def flush(self):
+        """Send what is pending now, so it arrives before the next reply"""
+        # Held while sending so chunks cannot overtake each other
+        with self.lock:
+            if self.pending:
+                self.channel.send({"chunk": "".join(self.pending)})
+                self.pending = []
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+
+class CappedOutput(io.TextIOBase):
+    """stdout and stderr of the run, keeping at most ``limit`` characters"""
+
+    def __init__(self, limit: int, streamer: OutputStreamer | None = None):
+        self.limit = limit
+        self.streamer = streamer
+        self.parts: list[str] = []
+        self.size = 0
+        self.truncated = False
+        self.stream_truncated = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        room = self.limit - self.size
+        cut = len(text) > room
+        if cut:
+            self.truncated = True
+            text = text[: max(room, 0)]
+        if text:
+            self.parts.append(text)
+            self.size += len(text)
+
+        if self.streamer is not None:
+            streamed = text
+            # The limit covers the whole run, so the stream is cut only once
+            if cut and not self.stream_truncated:
+                self.stream_truncated = True
+                streamed += TRUNCATED_NOTICE
+            if streamed:
+                self.streamer.add(streamed)
+        return len(text)
+
+    def getvalue(self) -> str:
+        output = "".join(self.parts)
+        return output + TRUNCATED_NOTICE if self.truncated else output
+
+    def take(self) -> str:
+        """Output written since the last call; the limit still counts all of it"""
+        output = self.getvalue()
+        self.parts = []
+        self.truncated = False
+        return output
+
+
+class CaseTimeout(BaseException):
+    """Raised in the candidate's code when a test case runs out of time"""
+
+
+class CaseTimers:
+    """Wall and CPU timers interrupting a test case that runs too long"""
+
+    def __init__(self, wall: float, cpu: float):
+        self.wall = wall
+        self.cpu = cpu
+        self.armed = False
+        signal.signal(signal.SIGALRM, self.expired)
+        signal.signal(signal.SIGPROF, self.expired)
+
+    def expired(self, signum: int, frame):
+        # A timer firing just as the case ends must not hit the loop serving the harness
+        if self.armed:
+            self.armed = False
+            limit = f"{self.wall:g}s" if signum == signal.SIGALRM else f"{self.cpu:g}s of CPU"
+            raise CaseTimeout(f"Timed out after {limit}")
+
+    def __enter__(self):
+        self.armed = True
+        signal.setitimer(signal.ITIMER_REAL, self.wall)
+        signal.setitimer(signal.ITIMER_PROF, self.cpu)
+
+    def __exit__(self, *exc_info):
+        self.armed = False
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def die_with_harness(harness: int):
+    """Have the kernel kill the child when the harness goes away"""
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+    # The harness may have gone before the request was made
+    if os.getppid() != harness:
+        os._exit(1)
+
+
+def isolate_network() -> bool:
+    """Move into a network namespace without interfaces; False if not permitted"""
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    # A new user namespace grants the right to create the network one when unprivileged
+    isolated = any(
+        libc.unshare(flags) == 0 for flags in (CLONE_NEWNET, CLONE_NEWUSER | CLONE_NEWNET)
+    )
+    # Re-importing ctypes from candidate code now trips the audit hook. _ctypes stays
+    # loaded, so this only keeps honest code away from it, like the hook itself
+    del sys.modules["ctypes"]
+    return isolated
+
+
+def guard(workdir: str):
+    """
+    Audit hook refusing process, socket and native library access, changes to
+    files outside the working directory and reads of other processes' /proc
+    entries (their environment holds the server's settings). Code in the same
+    interpreter can get around audit hooks, e.g. through modules already
+    loaded, so this is not a security boundary: the kernel-enforced limits and
+    the network namespace are
+    """
+    own_proc = f"/proc/{os.getpid()}"
+
+    def inside(path, root: str) -> bool:
+        if isinstance(path, int):
+            return True  # An already open descriptor
+        real = os.path.realpath(os.fsdecode(path))
+        return real == root or real.startswith(root + os.sep)
+
+    def hook(event: str, args: tuple):
+        if event in BLOCKED_EVENTS:
+            raise PermissionError(f"{event} is not allowed in the sandbox")
+        if event == "open":
+            path, _, flags = args
+            if flags & WRITE_FLAGS and not inside(path, workdir):
+                raise PermissionError(f"Cannot write outside the working directory: {path}")
+            if inside(path, "/proc") and not inside(path, own_proc):
+                raise PermissionError(f"Cannot read {path}")
+        elif event in FILE_CHANGE_EVENTS:
+            for path in args[:2]:
+                if isinstance(path, (str, bytes, os.PathLike)) and not inside(path, workdir):
+                    raise PermissionError(
+                        f"Cannot change files outside the working directory: {path}"
+                    )
+
+    return hook
+
+
+def apply_limits(limits: dict):
+    """Cap CPU time, memory, file sizes, open files and child processes"""
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = math.ceil(used.ru_utime + used.ru_stime) + limits["cpu_seconds"]
+    # Past the soft limit the process gets SIGXCPU, past the hard one SIGKILL
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (limits["memory_bytes"],) * 2)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limits["file_bytes"],) * 2)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limits["open_files"],) * 2)
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def format_error(error: BaseException) -> str:
+    """Traceback of an error, without the worker's own frames"""
+    frames = [
+        frame
+        for frame in traceback.extract_tb(error.__traceback__)
+        if frame.filename == SOLUTION_FILENAME
+    ]
+    lines = ["Traceback (most recent call last):\n"] if frames else []
+    lines += traceback.format_list(frames)
+    lines += traceback.format_exception_only(type(error), error)
+    return "".join(lines)
+
+
+def run(code: str, namespace: dict, output: CappedOutput) -> str | None:
+    """Execute code as __main__ in the namespace; returns the error, if any"""
+    sys.stdout = sys.stderr = output
+    try:
+        exec(compile(code, SOLUTION_FILENAME, "exec"), namespace)
+    except SystemExit as exit:
+        if exit.code not in (None, 0):
+            return f"SystemExit: {exit.code}"
+    except BaseException as error:
+        return format_error(error)
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return None
+
+
+def is_call(item) -> bool:
+    return isinstance(item, list) and bool(item) and isinstance(item[0], str)
+
+
+def call_entry(target, inputs: list):
+    """
+    Call the function under test with the case's inputs. A class is built from
+    the leading inputs and the remaining ``[method, *args]`` items are called on
+    it in turn, returning the list of their results
+    """
+    if not isinstance(target, type):
+        return target(*inputs)
+    split = next((i for i, item in enumerate(inputs) if is_call(item)), len(inputs))
+    instance = target(*inputs[:split])
+    return [getattr(instance, name)(*args) for name, *args in inputs[split:]]
+
+
+def as_json(value):
+    """The value as it would come back from JSON, tuples as lists and so on"""
+    return json.loads(json.dumps(value))
+
+
+def short_repr(value) -> str:
+    text = repr(value)
+    return text if len(text) <= MAX_ACTUAL_CHARS else text[: MAX_ACTUAL_CHARS - 3] + "..."
+
+
+def call(
+    namespace: dict, entry: str, inputs: list, timers: CaseTimers, output: CappedOutput
+) -> tuple:
+    """Call the entry point under the timers; returns (value, error, timed out)"""
+    value = error = None
+    timed_out = False
+    sys.stdout = sys.stderr = output
+    try:
+        with timers:
+            if entry not in namespace:
+                raise NameError(f"name {entry!r} is not defined")
+            value = call_entry(namespace[entry], inputs)
+    except CaseTimeout as timeout:
+        timed_out, error = True, str(timeout)
+    except BaseException as exception:
+        error = format_error(exception)
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return value, error, timed_out
+
+
+def serve(job: dict, commands, channel: Channel):
+    """
+    Child side: load the code, then answer the harness's commands until it
+    closes the pipe. Runs the candidate's code, so nothing it sends is trusted
+    """
+    limits = job["limits"]
+    isolate_network()
+    # Unsharing needs a single thread, and the limits forbid starting one
+    streamer = OutputStreamer(channel, limits["stream_interval"])
+    streamer.start()
+    apply_limits(limits)
+    # Imports must not try to write bytecode outside the working directory
+    sys.dont_write_bytecode = True
+    sys.addaudithook(guard(os.path.realpath(os.getcwd())))
+
+    output = CappedOutput(limits["output_chars"], streamer)
+    namespace = {"__name__": "__main__", "__builtins__": builtins}
+    error = run(job["code"], namespace, output)
+    streamer.flush()
+    channel.send({"loaded": {"output": output.take(), "error": error}})
+    if error is not None:
+        streamer.stop()
+        return
+
+    if job["profile"]:
+        # Output printed while profiling is dropped
+        output.streamer = None
+    timers = CaseTimers(limits["case_timeout"], limits["case_cpu_seconds"])
+    inputs = args = None
+    for line in commands:
+        command = json.loads(line)
+        if "case" in command:
+            value, error, timed_out = call(namespace, job["entry"], command["case"], timers, output)
+            returned = {
+                "actual": None if error else short_repr(value),
+                "output": output.take(),
+                "error": error,
+                "timedOut": timed_out,
+            }
+            if error is None:
+                try:
+                    returned["value"] = as_json(value)
+                except (TypeError, ValueError):
+                    pass  # Not JSON, so it cannot equal the expected value
+            streamer.flush()
+            channel.send({"returned": returned})
+        elif "inputs" in command or "copy" in command:
+            # Kept encoded, so each call gets inputs of its own to change
+            inputs = command.get("inputs", inputs)
+            args = json.loads(inputs)
+            channel.send({"ready": True})
+        elif "go" in command:
+            _, error, timed_out = call(namespace, job["entry"], args, timers, output)
+            # Printing is not what is profiled
+            output.take()
+            channel.send({"done": {"error": error, "timedOut": timed_out}})
+    streamer.stop()
+
+
+def child_main(harness: int, commands_fd: int, results_fd: int):
+    """Entry point of the forked child: wait for the job, then serve it"""
+    die_with_harness(harness)
+    # Only the two pipes to the harness stay open; not stdin, not the pool's pipe
+    for name in os.listdir("/proc/self/fd"):
+        fd = int(name)
+        if fd > 2 and fd not in (commands_fd, results_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    commands = os.fdopen(commands_fd)
+    channel = Channel(os.fdopen(results_fd, "w"))
+    line = commands.readline()
+    if line:
+        serve(json.loads(line), commands, channel)
+
+
+def describe_exit(status: int) -> tuple[str, str]:
+    """Error and exit reason of a child that died without answering"""
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        if signum == signal.SIGXCPU:
+            return "CPU time limit exceeded", "cpu_limit"
+        if signum == signal.SIGKILL:
+            return "Process was killed after exceeding its limits", "cpu_limit"
+        return f"Process exited with code {-signum}", "crashed"
+    return f"Process exited with code {os.waitstatus_to_exitcode(status)}", "crashed"
+
+
+class ChildFailed(Exception):
+    """The child stopped answering: it timed out, died or sent something invalid"""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.message = message
+        self.reason = reason
+
+
+class Child:
+    """The forked process running the candidate's code, seen from the harness"""
+
+    def __init__(self, pid: int, commands: int, results: int, on_chunk, max_line: int):
+        self.pid = pid
+        self.commands = os.fdopen(commands, "w")
+        self.results = results
+        self.on_chunk = on_chunk
+        self.max_line = max_line
+        self.buffer = b""
+        self.rusage: resource.struct_rusage | None = None
+        self.status: int | None = None
+        self.killed = False
+
+    @classmethod
+    def fork(cls) -> "Child":
+        """Fork the child; it waits for its job"""
+        harness = os.getpid()
+        commands_read, commands_write = os.pipe()
+        results_read, results_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                child_main(harness, commands_read, results_write)
+            finally:
+                # Skip exit handlers the code may have registered
+                os._exit(0)
+        os.close(commands_read)
+        os.close(results_write)
+        return cls(pid, commands_write, results_read, None, 0)
+
+    def send(self, message: dict):
+        try:
+            self.commands.write(json.dumps(message) + "\n")
+            self.commands.flush()
+        except (BrokenPipeError, ValueError):
+            raise self._died() from None
+
+    def receive(self, kind: str, timeout: float):
+        """
+        The child's next answer, which must be of the given kind; output it
+        prints meanwhile is passed on
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            line = self._readline(deadline, timeout)
+            try:
+                message = json.loads(line)
+                (key, value), *rest = message.items()
+                if key == "chunk" and not rest:
+                    self.on_chunk(str(value))
+                    continue
+                if key == kind and not rest:
+                    return value
+            except (ValueError, AttributeError, TypeError):
+                pass
+            self.kill()
+            raise ChildFailed("Sandbox returned an invalid result", "crashed")
+
+    def _readline(self, deadline: float, timeout: float) -> bytes:
+        while b"\n" not in self.buffer:
+            left = deadline - time.monotonic()
+            if left <= 0 or not select.select([self.results], [], [], left)[0]:
+                self.kill()
+                raise ChildFailed(f"Timed out after {timeout:g}s", "timeout")
+            data = os.read(self.results, 1 << 16)
+            if not data:
+                raise self._died()
+            self.buffer += data
+            if len(self.buffer) > self.max_line and b"\n" not in self.buffer:
+                self.kill()
+                raise ChildFailed("Sandbox returned an invalid result", "crashed")
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line
+
+    def _died(self) -> ChildFailed:
+        self.wait()
+        return ChildFailed(*describe_exit(self.status))
+
+    def cpu_time(self) -> float:
+        """CPU seconds the child used so far, from its process CPU clock"""
+        try:
+            return time.clock_gettime(((~self.pid) << 3) | 2)
+        except OSError:
+            with open(f"/proc/{self.pid}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def reset_peak(self) -> int | None:
+        """Start a new resident memory high-water mark; the current RSS, or None"""
+        try:
+            with open(f"/proc/{self.pid}/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+            return self._status("VmRSS")
+        except OSError:
+            return None
+
+    def peak(self) -> int | None:
+        """Resident memory high-water mark in bytes"""
+        try:
+            return self._status("VmHWM")
+        except OSError:
+            return None
+
+    def _status(self, field: str) -> int | None:
+        with open(f"/proc/{self.pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+        return None
+
+    def network_isolated(self) -> bool:
+        """Whether the child is in a network namespace of its own"""
+        try:
+            return os.readlink(f"/proc/{self.pid}/ns/net") != os.readlink("/proc/self/ns/net")
+        except OSError:
+            return False
+
+    def kill(self):
+        if self.status is None:
+            self.killed = True
+            os.kill(self.pid, signal.SIGKILL)
+            self.wait()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Reap the child; False if it is still running after the timeout"""
+        if self.status is not None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            flags = 0 if deadline is None else os.WNOHANG
+            pid, status, rusage = os.wait4(self.pid, flags)
+            if pid:
+                self.status, self.rusage = status, rusage
+                return True
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def finish(self):
+        """Let the child exit on its own, or kill it"""
+        try:
+            self.commands.close()
+        except BrokenPipeError:
+            pass
+        if not self.wait(EXIT_GRACE):
+            self.kill()
+
+
+def load_generator(source: str) -> tuple:
+    """The problem's generate(n) and the sizes to profile"""
+    namespace = {"__name__": "generator", "__builtins__": builtins}
+    exec(compile(source, GENERATOR_FILENAME, "exec"), namespace)
+    sizes = namespace.get("SIZES", PROFILE_SIZES)
+    return namespace["generate"], [int(size) for size in sizes][:MAX_PROFILE_SIZES]
+
+
+def text(value, limit: int) -> str | None:
+    """A string from the child, cut to the output limit"""
+    if value is None:
+        return None
+    value = str(value)
+    return value if len(value) <= limit else value[:limit] + TRUNCATED_NOTICE
+
+
+class Harness:
+    """Runs one job through the child, judging and measuring everything itself"""
+
+    def __init__(self, job: dict, child: Child, channel: Channel):
+        self.job = job
+        self.limits = job["limits"]
+        self.channel = channel
+        self.streamed = 0
+        self.truncated = False
+        # CPU seconds in user and system mode and peak RSS of the children so far
+        self.used = [0.0, 0.0, 0]
+        # Why the child was first cut short, if it was
+        self.cut: str | None = None
+        self.child = self.adopt(child)
+
+    def adopt(self, child: Child) -> Child:
+        child.on_chunk = self.forward
+        # Room for the escaped output on one line
+        child.max_line = 6 * self.limits["output_chars"] + 64 * 1024
+        return child
+
+    def retire(self):
+        """Let the current child exit and add up what it used"""
+        self.child.finish()
+        used = self.child.rusage
+        self.used[0] += used.ru_utime
+        self.used[1] += used.ru_stime
+        self.used[2] = max(self.used[2], used.ru_maxrss * 1024)
+
+    def replace_child(self) -> str | None:
+        """Retire the child and have a fresh one load the code; returns the loading error"""
+        self.retire()
+        self.child = self.adopt(Child.fork())
+        return self.load()[1]
+
+    def forward(self, chunk: str):
+        """Pass output on to the pool, within the output limit"""
+        if self.truncated:
+            return
+        limit = self.limits["output_chars"]
+        # The child's own notice may follow the limit's worth of output
+        if self.streamed + len(chunk) > limit + len(TRUNCATED_NOTICE):
+            chunk = chunk[: max(limit - self.streamed, 0)] + TRUNCATED_NOTICE
+            self.truncated = True
+        self.streamed += len(chunk)
+        if chunk:
+            self.channel.send({"chunk": chunk})
+
+    def load(self) -> tuple[str, str | None]:
+        """Have the child load the code; returns its output and error"""
+        limit = self.limits["output_chars"]
+        tests, profile = self.job.get("tests"), self.job.get("profile")
+        self.child.send(
+            {
+                "code": self.job["code"],
+                "limits": self.limits,
+                "entry": (tests or profile or {}).get("entry"),
+                "profile": profile is not None,
+            }
+        )
+        loaded = self.child.receive("loaded", self.limits["timeout"])
+        return text(loaded["output"], limit) or "", text(loaded["error"], limit)
+
+    def run(self) -> dict:
+        """Run the job; returns the final report"""
+        tests, profile = self.job.get("tests"), self.job.get("profile")
+        output, error, network_isolated = "", None, False
+        try:
+            output, error = self.load()
+            network_isolated = self.child.network_isolated()
+            if tests and error is None:
+                # From here on the pool waits for each case on its own timeout
+                self.channel.send({"loaded": True})
+                for index, case in enumerate(tests["cases"]):
+                    self.channel.send({"case": self.run_case(index, case)})
+            if profile and error is None:
+                self.channel.send({"loaded": True})
+                error = self.run_profile(profile)
+        except ChildFailed as failure:
+            error, self.cut = failure.message, failure.reason
+        except (KeyError, TypeError):
+            self.child.kill()
+            error, self.cut = "Sandbox returned an invalid result", "crashed"
+        self.retire()
+
+        return {
+            "success": error is None,
+            "output": output,
+            "error": error,
+            "networkIsolated": network_isolated,
+            # Set when the child was cut short rather than finished
+            "cut": self.cut,
+            "usage": self.used,
+        }
+
+    def run_case(self, index: int, case: dict) -> dict:
+        """Run one test case and compare what it returns with the expected value"""
+        if self.child.status is not None:
+            # An earlier case took the child down with it
+            error = self.replace_child()
+            if error is not None:
+                raise ChildFailed(error, "crashed")
+
+        start, cpu_start = time.perf_counter(), self.child.cpu_time()
+        try:
+            self.child.send({"case": case["input"]})
+            returned = self.child.receive("returned", self.limits["case_timeout"] + CASE_GRACE)
+        except ChildFailed as failure:
+            # Only this case fails; the child is gone and its rusage collected
+            self.cut = self.cut or failure.reason
+            used = self.child.rusage
+            return {
+                "index": index,
+                "passed": False,
+                "actual": None,
+                "output": "",
+                "error": failure.message,
+                "timedOut": failure.reason != "crashed",
+                "durationMs": round((time.perf_counter() - start) * 1000, 3),
+                "cpuMs": round((used.ru_utime + used.ru_stime - cpu_start) * 1000, 3),
+            }
+        duration, cpu = time.perf_counter() - start, self.child.cpu_time() - cpu_start
+
+        error = text(returned["error"], self.limits["output_chars"])
+        timed_out = bool(returned["timedOut"])
+        return {
+            "index": index,
+            "passed": error is None
+            and not timed_out
+            and "value" in returned
+            and returned["value"] == case["expected"],
+            "actual": None if error else text(returned["actual"], MAX_ACTUAL_CHARS),
+            "output": text(returned["output"], self.limits["output_chars"]) or "",
+            "error": error,
+            "timedOut": timed_out,
+            "durationMs": round(duration * 1000, 3),
+            "cpuMs": round(cpu * 1000, 3),
+        }
+
+    def run_profile(self, profile: dict) -> str | None:
+        """Profile the entry point at growing sizes until one fails or the budget is spent"""
+        try:
+            generate, sizes = load_generator(profile["generator"])
+        except Exception as error:
+            return "Input generator failed: " + "".join(
+                traceback.format_exception_only(type(error), error)
+            )
+
+        deadline = time.perf_counter() + profile["budget"]
+        for number, size in enumerate(sizes):
+            if time.perf_counter() > deadline:
+                break
+            try:
+                random.seed(size)
+                inputs = generate(size)
+            except Exception as error:
+                return "Input generator failed: " + "".join(
+                    traceback.format_exception_only(type(error), error)
+                )
+            point = self.profile_size(size, inputs, fresh=number > 0)
+            self.channel.send({"point": point})
+            # Larger sizes would only fail the same way
+            if point["error"]:
+                break
+        return None
+
+    def profile_size(self, size: int, inputs, fresh: bool) -> dict:
+        """
+        Measure the memory one call on inputs of one size takes, then time the
+        function on them. Each size gets a child of its own, so memory earlier
+        calls freed but kept is not reused unseen
+        """
+        limit = self.limits["case_timeout"] + CASE_GRACE
+        times = []
+        peak = error = None
+        timed_out = False
+        try:
+            if fresh:
+                error = self.replace_child()
+            if error is None:
+                # Decoding large inputs is part of loading, not of the call
+                self.child.send({"inputs": json.dumps(inputs)})
+                self.child.receive("ready", self.limits["timeout"])
+                baseline = self.child.reset_peak()
+                _, error, timed_out = self.timed_call(limit)
+                high = self.child.peak()
+                if error is None and baseline is not None and high is not None:
+                    peak = max(high - baseline, 0)
+
+            while error is None and len(times) < PROFILE_REPEATS:
+                if sum(times) >= PROFILE_MIN_SECONDS:
+                    break
+                # Solutions may change their inputs in place
+                self.child.send({"copy": True})
+                self.child.receive("ready", self.limits["timeout"])
+                took, error, timed_out = self.timed_call(limit)
+                if error is None:
+                    times.append(took)
+        except ChildFailed as failure:
+            # Running out of time only ends the profile; the child is gone either way
+            if failure.reason != "timeout":
+                raise
+            error, timed_out = failure.message, True
+        return {
+            "size": size,
+            "timeMs": round(min(times) * 1000, 4) if times else None,
+            "repeats": len(times),
+            "peakMemoryBytes": peak if error is None else None,
+            "error": error,
+            "timedOut": timed_out,
+        }
+
+    def timed_call(self, limit: float) -> tuple:
+        """One call on the prepared inputs, timed from this side; (seconds, error, timed out)"""
+        start = time.perf_counter()
+        self.child.send({"go": True})
+        done = self.child.receive("done", limit)
+        took = time.perf_counter() - start
+        return took, text(done["error"], self.limits["output_chars"]), bool(done["timedOut"])
+
+
+def main():
+    for name in PREIMPORTED:
+        __import__(name)
+
+    # Results go to a private copy of stdout; writes to fd 1 and 2 are dropped
+    channel = Channel(os.fdopen(os.dup(1), "w"))
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    os.close(devnull)
+
+    child = Child.fork()
+    line = sys.stdin.readline()
+    if not line:
+        child.kill()
+        return
+    channel.send(Harness(json.loads(line), child, channel).run())
+
+
+if __name__ == "__main__":
+    main()
+    os._exit(0)
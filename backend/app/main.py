@@ -4,9 +4,34 @@ LiveCoding Interview API
 FastAPI application for conducting live coding interviews with real-time synchronization.
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app import metrics
+from app.database import async_engine
+from app.execution import cache, pool, scheduler
+from app.websocket import manager
+
+worker_metrics = metrics.WorkerMetrics(manager, async_engine, cache, scheduler)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start and stop background services shared by the worker
+    """
+    await manager.start()
+    await pool.start()
+    worker_metrics.start()
+    yield
+    worker_metrics.stop()
+    await scheduler.stop()
+    await pool.stop()
+    await manager.stop()
+
+
 # Create FastAPI application
 app = FastAPI(
     title="LiveCoding Interview API",
@@ -21,6 +46,7 @@ app = FastAPI(
     },
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configure CORS for Frontend
@@ -37,6 +63,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per router
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 @app.get("/")
 async def root():
@@ -59,6 +88,16 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """
+    Prometheus metrics for this worker, or all workers in multiprocess mode
+    """
+    worker_metrics.sync()
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+
 # Import API routes
 from app.api.routes import auth, evaluations, problems, sessions, ws
 
@@ -0,0 +1,266 @@
+"""
+Prometheus metrics
+
+HTTP latency per router, WebSocket gauges and counters, code execution and
+database pool usage, served in the Prometheus text format on /metrics.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers: each worker writes its samples there and any
+worker answering a scrape reports the totals of all of them.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+SYNC_INTERVAL = float(os.getenv("METRICS_SYNC_INTERVAL_S", "5"))
+
+# HTTP
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["router", "method", "route", "status"],
+)
+
+# WebSocket: gauges are summed over live workers
+
+WS_CONNECTIONS = Gauge("ws_connections", "Open WebSocket connections", multiprocess_mode="livesum")
+WS_ROOMS = Gauge("ws_rooms", "Sessions with open sockets", multiprocess_mode="livesum")
+WS_ROOMS_BY_SIZE = Gauge(
+    "ws_rooms_by_size",
+    "Sessions by number of open sockets",
+    ["connections"],
+    multiprocess_mode="livesum",
+)
+WS_QUEUE_DEPTH = Gauge(
+    "ws_send_queue_depth", "Messages waiting in outbound queues", multiprocess_mode="livesum"
+)
+WS_ROOM_INBOX_DEPTH = Gauge(
+    "ws_room_inbox_depth", "Events waiting in room actor inboxes", multiprocess_mode="livesum"
+)
+WS_ROOM_BUSY_SECONDS = Counter("ws_room_busy_seconds", "Time room actors spent handling events")
+WS_OUTBOUND_MESSAGES = Counter(
+    "ws_outbound_messages", "Outbound WebSocket message events", ["event"]
+)
+WS_INBOUND_MESSAGES = Counter(
+    "ws_inbound_messages", "Inbound WebSocket messages by rate limit outcome", ["outcome"]
+)
+WS_REAPED_CONNECTIONS = Counter(
+    "ws_reaped_connections", "Connections closed by the heartbeat for being silent"
+)
+WS_DIAGNOSTICS = Counter("ws_diagnostics", "Code diagnostics checks and sends, by event", ["event"])
+WS_BROADCAST_DURATION = Histogram(
+    "ws_broadcast_duration_seconds",
+    "Time to queue a broadcast on local sockets and hand it to the broker",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+
+# Code execution
+
+EXEC_CACHE_LOOKUPS = Counter(
+    "exec_cache_lookups", "Execution result cache lookups by outcome", ["result"]
+)
+EXEC_CACHE_BYTES = Gauge(
+    "exec_cache_bytes", "Memory held by cached execution results", multiprocess_mode="livesum"
+)
+EXEC_QUEUE_WAIT = Histogram(
+    "exec_queue_wait_seconds",
+    "Time runs wait for their turn, by requester role",
+    ["role"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EXEC_RUN_DURATION = Histogram(
+    "exec_run_duration_seconds",
+    "Time from a run's start to its result being shared, by requester role",
+    ["role"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EXEC_QUEUE_DEPTH = Gauge(
+    "exec_queue_depth", "Runs waiting for their turn", multiprocess_mode="livesum"
+)
+EXEC_SANDBOX_RUNS = Counter("exec_sandbox_runs", "Sandbox runs by how they ended", ["reason"])
+EXEC_WALL_SECONDS = Histogram(
+    "exec_wall_seconds",
+    "Wall time of sandbox runs",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EXEC_CPU_SECONDS = Histogram(
+    "exec_cpu_seconds",
+    "CPU time of sandbox runs, in user or system mode",
+    ["mode"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EXEC_PEAK_RSS = Histogram(
+    "exec_peak_rss_bytes",
+    "Peak resident memory of sandbox processes",
+    buckets=tuple(mb * 1024 * 1024 for mb in (16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512)),
+)
+
+# Database pool
+
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_seconds",
+    "Time waiting for a database connection from the pool",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections in use", multiprocess_mode="livesum"
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size", multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections opened beyond the pool size", multiprocess_mode="livesum"
+)
+
+
+class WorkerMetrics:
+    """Copies this worker's WebSocket, execution and pool statistics into the metrics"""
+
+    def __init__(self, manager, engine, result_cache=None, scheduler=None):
+        self.manager = manager
+        self.engine = engine
+        self.result_cache = result_cache
+        self.scheduler = scheduler
+        self._task: asyncio.Task | None = None
+        # Last value of each cumulative counter, to increment by the difference
+        self._last: dict[str, int] = {}
+
+    def start(self):
+        """Sync periodically so every worker's numbers stay fresh"""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop syncing and drop this worker's live gauges"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if MULTIPROCESS:
+            multiprocess.mark_process_dead(os.getpid())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SYNC_INTERVAL)
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Failed to sync metrics")
+
+    def sync(self):
+        """Update gauges and counters from the current statistics"""
+        manager = self.manager
+        queue_stats = manager.get_queue_stats()
+        WS_CONNECTIONS.set(queue_stats["connections"])
+        WS_QUEUE_DEPTH.set(queue_stats["queue_depth"])
+
+        sizes = {"1": 0, "2": 0, "3+": 0}
+        for room in manager.rooms.values():
+            size = len(room.members)
+            sizes[str(size) if size < 3 else "3+"] += 1
+        WS_ROOMS.set(len(manager.rooms))
+        for size, count in sizes.items():
+            WS_ROOMS_BY_SIZE.labels(size).set(count)
+
+        room_stats = manager.get_room_stats()
+        WS_ROOM_INBOX_DEPTH.set(room_stats["inbox"])
+
+        for event in (
+            "enqueued",
+            "sent",
+            "dropped",
+            "coalesced",
+            "send_failures",
+            "slow_consumer_disconnects",
+            "presence_superseded",
+            "presence_throttled",
+        ):
+            self._advance(WS_OUTBOUND_MESSAGES.labels(event), event, queue_stats[event])
+
+        rate_stats = manager.rate_limiter.get_stats()
+        self._advance(WS_INBOUND_MESSAGES.labels("allowed"), "allowed", rate_stats["allowed"])
+        self._advance(WS_INBOUND_MESSAGES.labels("throttled"), "throttled", rate_stats["throttled"])
+        self._advance(WS_REAPED_CONNECTIONS, "reaped", manager.heartbeat.get_stats()["reaped"])
+        diagnostics_stats = manager.diagnostics.get_stats()
+        for event in ("checked", "cache_hits", "sent"):
+            self._advance(
+                WS_DIAGNOSTICS.labels(event), f"diagnostics_{event}", diagnostics_stats[event]
+            )
+
+        if self.result_cache is not None:
+            cache_stats = self.result_cache.get_stats()
+            EXEC_CACHE_BYTES.set(cache_stats["bytes"])
+            self._advance(EXEC_CACHE_LOOKUPS.labels("hit"), "cache_hits", cache_stats["hits"])
+            self._advance(EXEC_CACHE_LOOKUPS.labels("miss"), "cache_misses", cache_stats["misses"])
+        if self.scheduler is not None:
+            EXEC_QUEUE_DEPTH.set(self.scheduler.get_stats()["waiting"])
+
+        pool = self.engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.set(pool.checkedout())
+            DB_POOL_SIZE.set(pool.size())
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    def _advance(self, counter, key: str, value: int):
+        delta = value - self._last.get(key, 0)
+        if delta > 0:
+            counter.inc(delta)
+        self._last[key] = value
+
+
+def render() -> tuple[bytes, str]:
+    """Metrics in the Prometheus text format and their content type"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by router and route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The matched route is only known once routing has run
+            route = scope.get("route")
+            if route is not None:
+                path = route.path
+                tags = getattr(route, "tags", None)
+                router = tags[0].lower() if tags else "root"
+            else:
+                path, router = "unmatched", "none"
+            HTTP_REQUEST_DURATION.labels(router, scope["method"], path, str(status)).observe(
+                time.perf_counter() - start
+            )
@@ -4,7 +4,16 @@ Database models
 
 from .evaluation import Evaluation
 from .problem import Problem
-from .session import Session, SessionProblem
+from .session import Session, SessionCode, SessionEventBlock, SessionProblem, SessionRun
 from .user import User
 
-__all__ = ["User", "Problem", "Session", "SessionProblem", "Evaluation"]
+__all__ = [
+    "User",
+    "Problem",
+    "Session",
+    "SessionProblem",
+    "SessionCode",
+    "SessionEventBlock",
+    "SessionRun",
+    "Evaluation",
+]
@@ -36,6 +36,8 @@ class Problem(Base):
     description = Column(Text, nullable=False)
     starter_code = Column(Text, nullable=False)
     test_cases = Column(JSON, nullable=False)  # List of test cases
+    # Python source defining generate(n), the inputs of size n for profiling
+    input_generator = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     def __repr__(self):
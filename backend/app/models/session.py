@@ -4,7 +4,20 @@ Session models
 
 import enum
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -63,3 +76,62 @@ class SessionProblem(Base):
 
     def __repr__(self):
         return f"<SessionProblem(session_id='{self.session_id}', problem_id={self.problem_id}, order={self.order_index})>"
+
+
+class SessionCode(Base):
+    """Latest code of a problem in a session, saved from the live editor"""
+
+    __tablename__ = "session_code"
+    __table_args__ = (UniqueConstraint("session_id", "problem_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    problem_id = Column(Integer, nullable=False)
+    code = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<SessionCode(session_id='{self.session_id}', problem_id={self.problem_id})>"
+
+
+class SessionEventBlock(Base):
+    """Compressed block of a session's journaled events, for replaying the interview"""
+
+    __tablename__ = "session_event_blocks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(
+        String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+    event_count = Column(Integer, nullable=False)
+    # zlib-compressed JSON lines, see app.websocket.journal
+    data = Column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<SessionEventBlock(session_id='{self.session_id}', events={self.event_count})>"
+
+
+class SessionRun(Base):
+    """Resource usage of one server-side run of a session's code"""
+
+    __tablename__ = "session_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(
+        String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    problem_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # run or profile
+    success = Column(Boolean, nullable=False)
+    exit_reason = Column(String, nullable=False)
+    queued_ms = Column(Float, nullable=True)
+    wall_ms = Column(Float, nullable=False)
+    cpu_user_ms = Column(Float, nullable=True)
+    cpu_system_ms = Column(Float, nullable=True)
+    peak_rss_bytes = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<SessionRun(session_id='{self.session_id}', problem_id={self.problem_id}, exit_reason='{self.exit_reason}')>"
@@ -4,7 +4,14 @@ Pydantic schemas for request/response validation
 
 from .error import Error
 from .evaluation import ProblemEvaluation
-from .execution import ExecutionResult
+from .execution import (
+    ExecutionResult,
+    ExecutionRun,
+    ProfilePoint,
+    ProfileResult,
+    ResourceUsage,
+    TestCaseResult,
+)
 from .problem import Problem, TestCase
 from .session import (
     Session,
@@ -22,5 +29,10 @@ __all__ = [
     "SessionInfo",
     "ProblemEvaluation",
     "ExecutionResult",
+    "TestCaseResult",
+    "ProfilePoint",
+    "ProfileResult",
+    "ResourceUsage",
+    "ExecutionRun",
     "Error",
 ]
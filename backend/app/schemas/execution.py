@@ -2,8 +2,38 @@
 Code execution schemas
 """
 
+from datetime import datetime
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
+ExitReason = Literal["completed", "exception", "timeout", "cpu_limit", "memory_limit", "crashed"]
+
+
+class TestCaseResult(BaseModel):
+    """Result of one test case"""
+
+    index: int = Field(..., description="Position of the case in the problem's test cases")
+    passed: bool = Field(..., example=True)
+    actual: str | None = Field(None, description="repr of the returned value", example="8")
+    output: str = Field("", description="Output printed while the case ran")
+    error: str | None = Field(None, example=None)
+    timedOut: bool = Field(False, description="Whether the case ran out of time")
+    durationMs: float = Field(..., description="Wall time of the case", example=0.02)
+    cpuMs: float = Field(..., description="CPU time of the case", example=0.02)
+
+
+class ResourceUsage(BaseModel):
+    """Resources a server-side run used and how it ended"""
+
+    exitReason: ExitReason = Field(..., example="completed")
+    wallMs: float = Field(..., description="Wall time in the sandbox", example=7.2)
+    cpuUserMs: float | None = Field(None, description="CPU time in user mode", example=4.0)
+    cpuSystemMs: float | None = Field(None, description="CPU time in system mode", example=1.0)
+    peakRssBytes: int | None = Field(
+        None, description="Peak resident memory of the sandbox process", example=18874368
+    )
+
 
 class ExecutionResult(BaseModel):
     """Result of code execution"""
@@ -11,9 +41,51 @@ class ExecutionResult(BaseModel):
     success: bool = Field(..., example=True)
     output: str = Field(..., example="8\n0\n350\n")
     error: str | None = Field(None, example=None)
+    testResults: list[TestCaseResult] | None = Field(
+        None, description="Test case results, when the test cases were run"
+    )
+    usage: ResourceUsage | None = Field(None, description="Resources the run used")
 
     model_config = {
         "json_schema_extra": {
             "examples": [{"success": True, "output": "8\n0\n350\n", "error": None}]
         }
     }
+
+
+class ProfilePoint(BaseModel):
+    """Cost of the solution at one input size"""
+
+    size: int = Field(..., description="Input size n passed to the problem's generator")
+    timeMs: float | None = Field(None, description="Fastest of the timed calls", example=0.41)
+    repeats: int = Field(0, description="Number of timed calls")
+    peakMemoryBytes: int | None = Field(
+        None, description="Most memory allocated during one call", example=4096
+    )
+    error: str | None = Field(None, example=None)
+    timedOut: bool = Field(False, description="Whether the size ran out of time")
+
+
+class ProfileResult(BaseModel):
+    """Empirical time and memory growth of a solution"""
+
+    success: bool = Field(..., example=True)
+    points: list[ProfilePoint] = Field(default_factory=list, description="Profiled sizes, in order")
+    timeComplexity: str | None = Field(
+        None, description="Best fitting growth class", example="O(n)"
+    )
+    memoryComplexity: str | None = Field(None, example="O(1)")
+    peakMemoryBytes: int | None = Field(None, description="Largest peak over all sizes")
+    error: str | None = Field(None, example=None)
+    usage: ResourceUsage | None = Field(None, description="Resources the profiling run used")
+
+
+class ExecutionRun(BaseModel):
+    """A recorded server-side run of a session's code"""
+
+    problemId: int = Field(..., example=1)
+    kind: Literal["run", "profile"] = Field(..., example="run")
+    success: bool = Field(..., example=True)
+    queuedMs: float | None = Field(None, description="Time the run waited for its turn")
+    usage: ResourceUsage
+    createdAt: datetime
@@ -32,6 +32,9 @@ class Problem(BaseModel):
         example="def sum_two_numbers(a, b):\n    # Write your code here\n    pass",
     )
     testCases: list[TestCase] = Field(default_factory=list, alias="testCases")
+    profilable: bool = Field(
+        False, description="Whether solutions can be profiled for their time complexity"
+    )
 
     model_config = {
         "populate_by_name": True,
@@ -6,6 +6,8 @@ from typing import Literal
 
 from pydantic import BaseModel, Field
 
+from .execution import ProfileResult, ResourceUsage, TestCaseResult
+
 
 class WebSocketMessage(BaseModel):
     """Base WebSocket message"""
@@ -19,7 +21,85 @@ class CodeUpdateMessage(WebSocketMessage):
     type: Literal["code_update"] = "code_update"
     problemId: int = Field(..., description="Problem being edited")
     code: str = Field(..., description="Current code content")
+    problemIndex: int | None = Field(None, description="Index of the problem in the session")
     cursorPosition: dict | None = Field(None, description="Cursor position (line, column)")
+    baseVersion: int | None = Field(
+        None, description="Version the sender had; when set the sender gets a code_ack"
+    )
+    version: int | None = Field(None, description="Document version (set by server)")
+    sentAt: int | None = Field(None, description="Sender clock in ns, relayed for latency tests")
+
+
+class TextEdit(BaseModel):
+    """Replace the code point range [start, end) with text"""
+
+    start: int = Field(..., ge=0, description="Start offset (inclusive)")
+    end: int = Field(..., ge=0, description="End offset (exclusive)")
+    text: str = Field("", description="Inserted text")
+
+
+class CodeDeltaMessage(WebSocketMessage):
+    """Incremental code edits against a document version"""
+
+    type: Literal["code_delta"] = "code_delta"
+    problemId: int = Field(..., description="Problem being edited")
+    baseVersion: int = Field(..., ge=0, description="Document version the edits apply to")
+    version: int | None = Field(None, description="Resulting version (set by server)")
+    ops: list[TextEdit] = Field(..., description="Edits, applied in order")
+
+
+class CursorPosition(BaseModel):
+    """1-based position in the editor"""
+
+    line: int = Field(..., ge=1, description="Line number")
+    column: int = Field(..., ge=1, description="Column number")
+
+
+class SelectionRange(BaseModel):
+    """Selected text between two positions"""
+
+    start: CursorPosition = Field(..., description="Selection start")
+    end: CursorPosition = Field(..., description="Selection end")
+
+
+class PresenceMessage(WebSocketMessage):
+    """Cursor and selection of a participant, relayed at a throttled rate"""
+
+    type: Literal["presence"] = "presence"
+    problemId: int = Field(..., description="Problem being viewed")
+    cursor: CursorPosition = Field(..., description="Cursor position")
+    selections: list[SelectionRange] = Field(
+        default_factory=list, max_length=16, description="Non-empty selections"
+    )
+    clientId: str | None = Field(None, description="Sending connection (set by server)")
+    userName: str | None = Field(None, description="Sender name (set by server)")
+    role: str | None = Field(None, description="Sender role (set by server)")
+
+
+class CodeAckMessage(WebSocketMessage):
+    """Confirms the sender's edits were applied"""
+
+    type: Literal["code_ack"] = "code_ack"
+    problemId: int = Field(..., description="Problem that was edited")
+    version: int = Field(..., description="New document version")
+
+
+class CodeResyncRequestMessage(WebSocketMessage):
+    """Client lost track of a document and asks for the full text"""
+
+    type: Literal["code_resync_request"] = "code_resync_request"
+    problemId: int = Field(..., description="Problem to resync")
+
+
+class CodeResyncMessage(WebSocketMessage):
+    """Full document text for a client whose version diverged"""
+
+    type: Literal["code_resync"] = "code_resync"
+    problemId: int = Field(..., description="Problem being resynced")
+    version: int = Field(..., description="Current document version")
+    code: str | None = Field(
+        None, description="Full code; null if the server has no copy and needs a code_update"
+    )
 
 
 class ProblemChangeMessage(WebSocketMessage):
@@ -27,6 +107,8 @@ class ProblemChangeMessage(WebSocketMessage):
 
     type: Literal["problem_change"] = "problem_change"
     problemId: int = Field(..., description="New active problem ID")
+    problemIndex: int | None = Field(None, description="Index of the new active problem")
+    sentAt: int | None = Field(None, description="Sender clock in ns, relayed for latency tests")
 
 
 class UserJoinedMessage(WebSocketMessage):
@@ -45,6 +127,25 @@ class UserLeftMessage(WebSocketMessage):
     role: Literal["interviewer", "candidate"] = Field(..., description="User role")
 
 
+class DocumentSnapshot(BaseModel):
+    """Latest code of one problem"""
+
+    problemId: int = Field(..., description="Problem ID")
+    code: str = Field(..., description="Current code content")
+    version: int = Field(..., description="Document version")
+    stale: bool = Field(
+        False, description="Code is the last known text, missing edits made on another worker"
+    )
+
+
+class SessionSnapshot(BaseModel):
+    """Current state of a session, sent to joining clients"""
+
+    activeProblemId: int | None = Field(None, description="Problem the interviewer selected")
+    activeProblemIndex: int | None = Field(None, description="Index of the active problem")
+    documents: list[DocumentSnapshot] = Field(default_factory=list)
+
+
 class ConnectionStatusMessage(WebSocketMessage):
     """Connection status message"""
 
@@ -52,6 +153,29 @@ class ConnectionStatusMessage(WebSocketMessage):
     status: Literal["connected", "disconnected"] = Field(..., description="Connection status")
     sessionId: str = Field(..., description="Session ID")
     activeUsers: int = Field(..., description="Number of active users in session")
+    snapshot: SessionSnapshot | None = Field(None, description="Current session state, if any")
+    epoch: str | None = Field(None, description="Room incarnation the sequence numbers belong to")
+    seq: int = Field(0, description="Sequence number of the latest broadcast in the room")
+    resumed: bool = Field(False, description="Missed broadcasts follow instead of a snapshot")
+
+
+class SessionEndedMessage(WebSocketMessage):
+    """The interviewer ended the session"""
+
+    type: Literal["session_ended"] = "session_ended"
+    sessionId: str = Field(..., description="Session ID")
+
+
+class PingMessage(WebSocketMessage):
+    """Server heartbeat"""
+
+    type: Literal["ping"] = "ping"
+
+
+class PongMessage(WebSocketMessage):
+    """Client answer to a heartbeat"""
+
+    type: Literal["pong"] = "pong"
 
 
 class ErrorMessage(WebSocketMessage):
@@ -68,6 +192,15 @@ class RunCodeMessage(WebSocketMessage):
     type: Literal["run_code"] = "run_code"
     problemId: int = Field(..., description="Problem to run")
     code: str = Field(..., description="Code to execute")
+    runTests: bool = Field(False, description="Also run the problem's test cases")
+
+
+class CodeOutputMessage(WebSocketMessage):
+    """Output printed by a run so far, sent while it runs"""
+
+    type: Literal["code_output"] = "code_output"
+    problemId: int = Field(..., description="Problem being run")
+    output: str = Field(..., description="Output since the previous chunk")
 
 
 class CodeResultMessage(WebSocketMessage):
@@ -78,4 +211,48 @@ class CodeResultMessage(WebSocketMessage):
     success: bool = Field(..., description="Whether execution succeeded")
     output: str | None = Field(None, description="Execution output")
     error: str | None = Field(None, description="Error message if failed")
-    testResults: list | None = Field(None, description="Test case results")
+    testResults: list[TestCaseResult] | None = Field(None, description="Test case results")
+    queuedMs: float | None = Field(None, description="Time the run waited for its turn")
+    runMs: float | None = Field(None, description="Time the run took in the sandbox")
+    usage: ResourceUsage | None = Field(None, description="Resources the run used")
+    cached: bool = Field(False, description="Answered from the result cache; nothing ran")
+
+
+class TestCaseResultMessage(WebSocketMessage, TestCaseResult):
+    """Result of one test case, sent as soon as the case finishes"""
+
+    type: Literal["test_case_result"] = "test_case_result"
+    problemId: int = Field(..., description="Problem whose test case ran")
+
+
+class ProfileCodeMessage(WebSocketMessage):
+    """Profile a solution's time and memory growth (interviewer only)"""
+
+    type: Literal["profile_code"] = "profile_code"
+    problemId: int = Field(..., description="Problem to profile")
+    code: str = Field(..., description="Code to profile")
+
+
+class ProfileResultMessage(WebSocketMessage, ProfileResult):
+    """Complexity profile, sent to the interviewer who asked for it"""
+
+    type: Literal["profile_result"] = "profile_result"
+    problemId: int = Field(..., description="Problem that was profiled")
+
+
+class Diagnostic(BaseModel):
+    """A syntax error or lint warning in the code"""
+
+    line: int = Field(..., ge=1, description="1-based line")
+    column: int = Field(..., ge=1, description="1-based column")
+    severity: Literal["error", "warning"] = Field(..., description="Errors stop the code running")
+    code: str = Field(..., description="Rule that fired", example="undefined-name")
+    message: str = Field(..., example="Undefined name 'reslt'")
+
+
+class DiagnosticsMessage(WebSocketMessage):
+    """Diagnostics of a problem's latest code, sent to interviewers when they change"""
+
+    type: Literal["diagnostics"] = "diagnostics"
+    problemId: int = Field(..., description="Problem whose code was checked")
+    diagnostics: list[Diagnostic] = Field(..., description="Empty once the code is clean")
@@ -6,11 +6,19 @@ import random
 import string
 from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models import Problem, Session, SessionProblem
+from app.models import (
+    Problem,
+    Session,
+    SessionCode,
+    SessionEventBlock,
+    SessionProblem,
+    SessionRun,
+)
 from app.services import problems as problems_service
 from app.services import users
 
@@ -170,3 +178,83 @@ def get_session_problems(session: Session) -> list[Problem]:
     """
     session_problems = sorted(session.session_problems, key=lambda sp: sp.order_index)
     return [sp.problem for sp in session_problems]
+
+
+async def save_session_code(db: AsyncSession, rows: list[tuple[str, int, str]]):
+    """
+    Save the latest code of (session_id, problem_id, code) rows in one upsert
+    """
+    if not rows:
+        return
+
+    statement = insert(SessionCode).values(
+        [
+            {"session_id": session_id, "problem_id": problem_id, "code": code}
+            for session_id, problem_id, code in rows
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[SessionCode.session_id, SessionCode.problem_id],
+        set_={"code": statement.excluded.code, "updated_at": func.now()},
+    )
+    await db.execute(statement)
+
+
+async def get_session_code(db: AsyncSession, session_id: str) -> dict[int, str]:
+    """
+    Get the saved code of a session by problem ID
+    """
+    result = await db.execute(
+        select(SessionCode.problem_id, SessionCode.code).where(SessionCode.session_id == session_id)
+    )
+    return dict(result.all())
+
+
+async def save_event_blocks(db: AsyncSession, blocks: list[dict]):
+    """
+    Append compressed event blocks to session journals in one insert
+    """
+    if not blocks:
+        return
+
+    await db.execute(insert(SessionEventBlock).values(blocks))
+
+
+async def get_event_blocks(
+    db: AsyncSession, session_id: str, after: tuple | None = None, limit: int = 16
+) -> list[SessionEventBlock]:
+    """
+    Get the next event blocks of a session by start time, after a (started_at, id) position
+    """
+    query = (
+        select(SessionEventBlock)
+        .where(SessionEventBlock.session_id == session_id)
+        .order_by(SessionEventBlock.started_at, SessionEventBlock.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(tuple_(SessionEventBlock.started_at, SessionEventBlock.id) > after)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def save_run(db: AsyncSession, run: dict) -> SessionRun:
+    """
+    Record the resource usage of a server-side run
+    """
+    session_run = SessionRun(**run)
+    db.add(session_run)
+    await db.flush()
+    return session_run
+
+
+async def get_session_runs(db: AsyncSession, session_id: str) -> list[SessionRun]:
+    """
+    Get the recorded runs of a session, oldest first
+    """
+    result = await db.execute(
+        select(SessionRun)
+        .where(SessionRun.session_id == session_id)
+        .order_by(SessionRun.created_at, SessionRun.id)
+    )
+    return list(result.scalars().all())
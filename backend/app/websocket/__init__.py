@@ -0,0 +1,30 @@
+"""
+WebSocket real-time synchronization
+"""
+
+from .broker import (
+    Broker,
+    InMemoryBroker,
+    PostgresBroker,
+    UnixSocketBroker,
+    UnixSocketHub,
+    create_broker,
+)
+from .connection import Connection, QueuePolicy, QueueStats
+from .frames import Frame
+from .manager import ConnectionManager, manager
+
+__all__ = [
+    "ConnectionManager",
+    "manager",
+    "Broker",
+    "InMemoryBroker",
+    "PostgresBroker",
+    "UnixSocketBroker",
+    "UnixSocketHub",
+    "create_broker",
+    "Connection",
+    "QueuePolicy",
+    "QueueStats",
+    "Frame",
+]
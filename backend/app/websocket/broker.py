@@ -0,0 +1,460 @@
+"""
+Cross-worker message brokers for WebSocket fan-out
+
+Each uvicorn worker owns only the sockets that connected to it. A broker ships
+every broadcast to the other workers so they can forward it to their own
+sockets. Messages published within one flush interval are sent as a single
+batch, so a burst of keystrokes costs one round trip per worker, not one per
+message.
+"""
+
+import abc
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+import uuid
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Called with (session_id, encoded frame) for every message received from another worker
+MessageHandler = Callable[[str, str], Awaitable[None]]
+
+
+class Broker(abc.ABC):
+    """Base class for cross-worker brokers with batched publishing"""
+
+    def __init__(self, flush_interval: float = 0.0):
+        # Unique per worker, used to drop our own messages when they come back
+        self.origin = uuid.uuid4().hex[:12]
+        self.flush_interval = flush_interval
+        self._handler: MessageHandler | None = None
+        self._pending: list[tuple[str, str]] = []
+        self._flush_task: asyncio.Task | None = None
+        self._send_lock = asyncio.Lock()
+
+        # Counters
+        self.published = 0
+        self.batches_sent = 0
+        self.received = 0
+
+    async def start(self, handler: MessageHandler):
+        """Start receiving messages from other workers"""
+        self._handler = handler
+
+    async def stop(self):
+        """Flush pending messages and stop receiving"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        self._handler = None
+
+    def publish(self, session_id: str, payload: str):
+        """Queue an encoded message for other workers; sent with the next batch"""
+        self._pending.append((session_id, payload))
+        self.published += 1
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def flush(self):
+        """Send all pending messages as one batch"""
+        async with self._send_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            try:
+                await self._send(batch)
+                self.batches_sent += 1
+            except Exception:
+                logger.exception("Broker failed to send batch of %d messages", len(batch))
+
+    async def _flush_later(self):
+        # Let other coroutines publish during this tick before sending
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
+    @abc.abstractmethod
+    async def _send(self, batch: list[tuple[str, str]]):
+        """Deliver a batch to other workers"""
+
+    async def _receive(self, origin: str, batch: list):
+        """Hand a batch received from another worker to the manager"""
+        if origin == self.origin or self._handler is None:
+            return
+
+        for session_id, payload in batch:
+            self.received += 1
+            try:
+                await self._handler(session_id, payload)
+            except Exception:
+                logger.exception("Failed to deliver broker message for session %s", session_id)
+
+
+class InMemoryBroker(Broker):
+    """
+    Broker for a single process
+
+    Brokers sharing the same ``peers`` list see each other's messages, which lets
+    tests run several managers as if they were separate workers. With no peers
+    publishing is a no-op.
+    """
+
+    def __init__(self, peers: list["InMemoryBroker"] | None = None, flush_interval: float = 0.0):
+        super().__init__(flush_interval)
+        self.peers = peers if peers is not None else []
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        if self not in self.peers:
+            self.peers.append(self)
+
+    async def stop(self):
+        await super().stop()
+        if self in self.peers:
+            self.peers.remove(self)
+
+    def publish(self, session_id: str, payload: str):
+        if len(self.peers) < 2:
+            return
+        super().publish(session_id, payload)
+
+    async def _send(self, batch: list[tuple[str, str]]):
+        for peer in list(self.peers):
+            if peer is not self:
+                await peer._receive(self.origin, batch)
+
+
+class PostgresBroker(Broker):
+    """
+    Broker using PostgreSQL LISTEN/NOTIFY
+
+    NOTIFY payloads are limited to 8000 bytes, so batches are split into
+    fragments and reassembled by the listeners. All fragments of a batch are
+    sent in a single statement. Received batches are delivered one at a time,
+    in the order they were notified. If the connection drops it is opened
+    again with backoff; batches published meanwhile are lost.
+    """
+
+    MAX_PAYLOAD = 7900
+    MAX_PARTIAL_BATCHES = 256
+    RECONNECT_DELAY = 0.5
+    MAX_RECONNECT_DELAY = 30.0
+
+    def __init__(self, dsn: str, channel: str = "ws_broadcast", flush_interval: float = 0.002):
+        super().__init__(flush_interval)
+        # asyncpg expects a plain postgresql:// DSN
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://")
+        self.channel = channel
+        self._conn = None
+        self._batch_counter = 0
+        # batch_id -> list of fragments received so far
+        self._partial: dict[str, list[str | None]] = {}
+        # Complete batches waiting for delivery, as (origin, batch)
+        self._inbox: asyncio.Queue[tuple[str, list]] = asyncio.Queue()
+        self._deliver_task: asyncio.Task | None = None
+        self._reconnect_task: asyncio.Task | None = None
+
+        # Counters
+        self.reconnects = 0
+        # Messages published while the connection was down, never delivered
+        self.dropped = 0
+        self._dropped_since_lost = 0
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        # Bound to the running loop on first use, so created on each start
+        self._inbox = asyncio.Queue()
+        self._deliver_task = asyncio.get_running_loop().create_task(self._deliver_loop())
+        await self._connect()
+
+    async def stop(self):
+        await super().stop()
+        for task in (self._reconnect_task, self._deliver_task):
+            if task:
+                task.cancel()
+        self._reconnect_task = self._deliver_task = None
+        # Cleared first, so closing it is not taken for a lost connection
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                await conn.remove_listener(self.channel, self._on_notify)
+            finally:
+                await conn.close()
+        self._partial.clear()
+
+    async def _connect(self):
+        import asyncpg
+
+        conn = await asyncpg.connect(self.dsn)
+        await conn.add_listener(self.channel, self._on_notify)
+        conn.add_termination_listener(self._on_lost)
+        self._conn = conn
+
+    def _on_lost(self, connection):
+        if connection is not self._conn:
+            return
+        self._conn = None
+        # Fragments of batches cut by the drop will never be completed
+        self._partial.clear()
+        logger.warning("Broker lost its LISTEN connection, reconnecting")
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.RECONNECT_DELAY
+        while self._handler is not None:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+            except Exception as e:
+                logger.warning("Broker could not reconnect, retrying in %gs: %s", delay, e)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+                continue
+            self.reconnects += 1
+            logger.info(
+                "Broker LISTEN connection re-established, %d messages were dropped meanwhile",
+                self._dropped_since_lost,
+            )
+            self._dropped_since_lost = 0
+            return
+
+    async def _deliver_loop(self):
+        # A single consumer, so a slow batch is never overtaken by a later one
+        while True:
+            origin, batch = await self._inbox.get()
+            await self._receive(origin, batch)
+
+    async def _send(self, batch: list[tuple[str, str]]):
+        if self._conn is None:
+            # Other workers never see these; counted so the gap shows up in the logs
+            if not self._dropped_since_lost:
+                logger.warning("Broker is reconnecting, dropping published messages")
+            self.dropped += len(batch)
+            self._dropped_since_lost += len(batch)
+            return
+
+        # ensure_ascii keeps one byte per character so fragments can be cut anywhere
+        payload = json.dumps(batch, separators=(",", ":"))
+        self._batch_counter += 1
+        batch_id = f"{self.origin}.{self._batch_counter}"
+
+        chunk_size = self.MAX_PAYLOAD - len(batch_id) - 16
+        chunks = [payload[i : i + chunk_size] for i in range(0, len(payload), chunk_size)]
+        fragments = [f"{batch_id}:{i}:{len(chunks)}:{chunk}" for i, chunk in enumerate(chunks)]
+
+        await self._conn.execute(
+            "SELECT pg_notify($1, fragment) FROM unnest($2::text[]) AS fragment",
+            self.channel,
+            fragments,
+        )
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        batch_id, index, count, chunk = payload.split(":", 3)
+        origin = batch_id.split(".", 1)[0]
+        if origin == self.origin:
+            return
+
+        index, count = int(index), int(count)
+        if count == 1:
+            data = chunk
+        else:
+            parts = self._partial.setdefault(batch_id, [None] * count)
+            parts[index] = chunk
+            if any(part is None for part in parts):
+                # Drop the oldest incomplete batches if a sender died mid-batch
+                while len(self._partial) > self.MAX_PARTIAL_BATCHES:
+                    self._partial.pop(next(iter(self._partial)))
+                return
+            data = "".join(self._partial.pop(batch_id))
+
+        self._inbox.put_nowait((origin, json.loads(data)))
+
+
+class UnixSocketHub:
+    """
+    Relay between brokers on the same host
+
+    Every frame received from one client is written to all other clients.
+    Frames are length-prefixed: a 4-byte big-endian size followed by the payload.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        """Bind the Unix socket, replacing a stale socket file"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+
+    async def stop(self):
+        """Close the server and all client connections"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                if frame is None:
+                    break
+
+                for client in list(self._clients):
+                    if client is writer:
+                        continue
+                    try:
+                        client.write(frame)
+                        await client.drain()
+                    except Exception:
+                        self._clients.discard(client)
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+class UnixSocketBroker(Broker):
+    """
+    Broker for workers on one host, connected through a UnixSocketHub
+
+    The first worker to take the lock file next to the socket runs the hub;
+    the others connect to it. If the hub's worker dies, the survivors elect a
+    new one and reconnect.
+    """
+
+    RECONNECT_DELAY = 0.1
+
+    def __init__(self, path: str, flush_interval: float = 0.002):
+        super().__init__(flush_interval)
+        self.path = path
+        self.hub: UnixSocketHub | None = None
+        self._lock_fd: int | None = None
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        await self._connect()
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def stop(self):
+        await super().stop()
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._close_connection()
+        if self.hub is not None:
+            await self.hub.stop()
+            self.hub = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def _connect(self):
+        """Connect to the hub, starting it first if no other worker runs one"""
+        for _ in range(50):
+            if self.hub is None and self._try_acquire_hub_lock():
+                self.hub = UnixSocketHub(self.path)
+                await self.hub.start()
+
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                # Another worker holds the lock but has not bound the socket yet
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+        raise ConnectionError(f"Could not connect to broker hub at {self.path}")
+
+    def _try_acquire_hub_lock(self) -> bool:
+        fd = os.open(f"{self.path}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _close_connection(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _read_loop(self):
+        while True:
+            frame = await _read_frame(self._reader) if self._reader else None
+            if frame is None:
+                # Hub went away: elect a new one and reconnect
+                self._close_connection()
+                await asyncio.sleep(self.RECONNECT_DELAY)
+                try:
+                    await self._connect()
+                except ConnectionError:
+                    logger.exception("Lost connection to broker hub")
+                continue
+
+            envelope = json.loads(frame[4:])
+            await self._receive(envelope["o"], envelope["m"])
+
+    async def _send(self, batch: list[tuple[str, str]]):
+        if self._writer is None:
+            return
+
+        payload = json.dumps({"o": self.origin, "m": batch}, separators=(",", ":")).encode()
+        self._writer.write(struct.pack(">I", len(payload)) + payload)
+        await self._writer.drain()
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes | None:
+    """Read one length-prefixed frame, including its header; None on EOF"""
+    try:
+        header = await reader.readexactly(4)
+        (size,) = struct.unpack(">I", header)
+        return header + await reader.readexactly(size)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+def create_broker() -> Broker:
+    """
+    Create the broker selected by the WS_BROKER environment variable
+
+    - memory (default): single worker, no cross-worker fan-out
+    - postgres: LISTEN/NOTIFY on the application database
+    - unix: local hub on WS_BROKER_UNIX_PATH, for several workers on one host
+    """
+    kind = os.getenv("WS_BROKER", "memory")
+    flush_interval = float(os.getenv("WS_BROKER_FLUSH_MS", "2")) / 1000
+
+    if kind == "postgres":
+        from app.database import DATABASE_URL
+
+        return PostgresBroker(DATABASE_URL, flush_interval=flush_interval)
+
+    if kind == "unix":
+        path = os.getenv("WS_BROKER_UNIX_PATH", "/tmp/livecoding-ws.sock")
+        return UnixSocketBroker(path, flush_interval=flush_interval)
+
+    if kind == "memory":
+        return InMemoryBroker()
+
+    raise ValueError(f"Unknown WS_BROKER: {kind}")
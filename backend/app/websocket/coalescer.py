@@ -0,0 +1,133 @@
+"""
+Server-side coalescing of bursty code updates
+
+Code updates for the same (session, problem) arriving within the flush
+interval are merged and relayed once: for full-text updates the latest state
+wins, consecutive deltas from one sender are concatenated. Any other broadcast
+in the session flushes pending updates first, so problem changes and join/leave
+events are never reordered around code.
+"""
+
+import asyncio
+import os
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from fastapi import WebSocket
+
+from .frames import Frame
+
+DEFAULT_COALESCE_INTERVAL = float(os.getenv("WS_COALESCE_INTERVAL_MS", "50")) / 1000
+
+# Broadcasts a frame to a session: (frame, session_id, exclude)
+SendFunction = Callable[[Frame, str, WebSocket | None], Awaitable[None]]
+
+
+@dataclass
+class PendingUpdate:
+    """Latest merged code update waiting to be flushed"""
+
+    frame: Frame
+    exclude: WebSocket | None
+
+
+class Coalescer:
+    """Merges code updates per (session, problem) within a flush interval"""
+
+    def __init__(self, send: SendFunction, interval: float = DEFAULT_COALESCE_INTERVAL):
+        self.send = send
+        self.interval = interval
+        # session_id -> problem_id -> pending update, in arrival order
+        self._pending: dict[str, dict[int, PendingUpdate]] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+
+        # Counters
+        self.submitted = 0
+        self.merged = 0
+        self.flushed = 0
+
+    async def submit(
+        self, frame: Frame, session_id: str, problem_id: int, exclude: WebSocket | None = None
+    ):
+        """Queue a code update, merging it with a pending one for the same problem"""
+        self.submitted += 1
+        if self.interval <= 0:
+            self.flushed += 1
+            await self.send(frame, session_id, exclude)
+            return
+
+        pending = self._pending.setdefault(session_id, {})
+        current = pending.get(problem_id)
+        merged = _merge(current, frame, exclude) if current else None
+
+        if merged is not None:
+            pending[problem_id] = merged
+            self.merged += 1
+        else:
+            if current:
+                # Cannot merge (e.g. delta after full text): send the older one first
+                await self.flush(session_id)
+                pending = self._pending.setdefault(session_id, {})
+            pending[problem_id] = PendingUpdate(frame, exclude)
+
+        if session_id not in self._timers:
+            self._timers[session_id] = asyncio.get_running_loop().create_task(
+                self._flush_later(session_id)
+            )
+
+    async def flush(self, session_id: str):
+        """Send all pending updates of a session now"""
+        timer = self._timers.pop(session_id, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+        pending = self._pending.pop(session_id, None)
+        if not pending:
+            return
+
+        for update in pending.values():
+            self.flushed += 1
+            await self.send(update.frame, session_id, update.exclude)
+
+    async def flush_all(self):
+        """Send pending updates of every session"""
+        for session_id in list(self._pending):
+            await self.flush(session_id)
+
+    async def _flush_later(self, session_id: str):
+        await asyncio.sleep(self.interval)
+        await self.flush(session_id)
+
+    def get_stats(self) -> dict:
+        """Coalescing counters"""
+        return {
+            "submitted": self.submitted,
+            "merged": self.merged,
+            "flushed": self.flushed,
+            "pending": sum(len(pending) for pending in self._pending.values()),
+        }
+
+
+def _merge(current: PendingUpdate, frame: Frame, exclude: WebSocket | None) -> PendingUpdate | None:
+    """Merge a new update into a pending one; None if they cannot be merged"""
+    old, new = current.frame.message, frame.message
+
+    if new.get("type") == "code_update" and old.get("type") == "code_update":
+        # Full text: latest state wins. The earlier sender still gets it.
+        return PendingUpdate(frame, exclude)
+
+    if (
+        new.get("type") == "code_delta"
+        and old.get("type") == "code_delta"
+        and exclude is current.exclude
+        and new.get("baseVersion") == old.get("version")
+    ):
+        # Consecutive edits from one sender: apply one after another
+        combined = {
+            **old,
+            "version": new.get("version"),
+            "ops": [*old.get("ops", []), *new.get("ops", [])],
+        }
+        return PendingUpdate(Frame.of(combined), exclude)
+
+    return None
@@ -0,0 +1,216 @@
+"""
+Per-connection outbound queues
+
+Each connection gets a bounded queue drained by its own writer task, so a slow
+socket only delays itself. Broadcasting just enqueues. Presence updates skip
+the queue: the latest one of each peer waits in a slot that is sent first.
+"""
+
+import asyncio
+import enum
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from fastapi import WebSocket
+
+from .frames import Frame
+
+logger = logging.getLogger(__name__)
+
+
+class QueuePolicy(str, enum.Enum):
+    """What to do when a connection's outbound queue is full"""
+
+    DROP_OLDEST = "drop_oldest"  # Discard the oldest queued message unless it is sequenced
+    COALESCE = "coalesce"  # Replace an older message for the same document, else disconnect
+    DISCONNECT = "disconnect"  # Close the slow connection
+
+
+DEFAULT_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+DEFAULT_QUEUE_POLICY = QueuePolicy(os.getenv("WS_SEND_QUEUE_POLICY", QueuePolicy.COALESCE.value))
+
+# Close code sent to consumers that cannot keep up (RFC 6455: "try again later"); the
+# client reconnects with the last sequence number it received and is sent what it missed
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+@dataclass
+class QueueStats:
+    """Outbound queue counters shared by all connections of a manager"""
+
+    enqueued: int = 0
+    sent: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+    slow_consumer_disconnects: int = 0
+    send_failures: int = 0
+    presence_superseded: int = 0
+
+
+def coalesce_key(frame: Frame) -> tuple | None:
+    """Frames with the same key supersede each other; None if never coalesced"""
+    message = frame.message
+    if message.get("type") == "code_update":
+        return ("code_update", message.get("problemId"))
+    return None
+
+
+class Connection:
+    """A WebSocket with a bounded outbound queue and a writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        stats: QueueStats,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        policy: QueuePolicy = DEFAULT_QUEUE_POLICY,
+        on_failure: Callable[["Connection"], None] | None = None,
+        user_name: str | None = None,
+        user_role: str | None = None,
+    ):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.user_name = user_name
+        self.user_role = user_role
+        # Identifies this client in relayed presence updates
+        self.client_id = uuid.uuid4().hex[:8]
+        self.stats = stats
+        self.max_queue = max_queue
+        self.policy = policy
+        self.on_failure = on_failure
+
+        self.queue: deque[Frame] = deque()
+        # Latest unsent presence frame per peer client id
+        self.presence: dict[str, Frame] = {}
+        self.max_depth = 0
+        # When the client was last heard from, for the heartbeat
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self._closing = False
+        self._close_code: int | None = None
+        self._wakeup = asyncio.Event()
+        self._writer_task: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        """Number of messages waiting to be sent"""
+        return len(self.queue)
+
+    def touch(self):
+        """Record that the client is alive"""
+        self.last_seen = time.monotonic()
+
+    def start(self):
+        """Start the writer task"""
+        self._writer_task = asyncio.get_running_loop().create_task(self._write_loop())
+
+    def stop(self):
+        """Stop the writer once the queued messages are sent"""
+        self._closing = True
+        self._wakeup.set()
+
+    def close(self, code: int):
+        """Send the queued messages, then close the socket with a close code"""
+        self._close_code = code
+        self.stop()
+
+    async def wait_stopped(self, timeout: float):
+        """Wait for the writer to finish after stop() or close()"""
+        if self._writer_task:
+            await asyncio.wait([self._writer_task], timeout=timeout)
+
+    def enqueue(self, frame: Frame):
+        """Queue a frame for sending, applying the full-queue policy"""
+        if self.closed or self._closing:
+            return
+
+        if len(self.queue) >= self.max_queue and not self._make_room(frame):
+            return
+
+        self.queue.append(frame)
+        self.stats.enqueued += 1
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._wakeup.set()
+
+    def set_presence(self, client_id: str, frame: Frame):
+        """Hold a peer's latest presence, replacing an unsent older one"""
+        if self.closed or self._closing:
+            return
+
+        if client_id in self.presence:
+            self.stats.presence_superseded += 1
+        self.presence[client_id] = frame
+        self._wakeup.set()
+
+    def clear_presence(self, client_id: str):
+        """Forget an unsent presence frame of a peer that left"""
+        self.presence.pop(client_id, None)
+
+    def _make_room(self, frame: Frame) -> bool:
+        """Free a slot in a full queue; False if the frame must not be queued"""
+        if self.policy == QueuePolicy.COALESCE:
+            key = coalesce_key(frame)
+            if key is not None:
+                for queued in self.queue:
+                    if coalesce_key(queued) == key:
+                        # The newer state goes to the back, keeping order with other messages
+                        self.queue.remove(queued)
+                        self.stats.coalesced += 1
+                        return True
+        elif self.policy == QueuePolicy.DROP_OLDEST and "seq" not in self.queue[0].message:
+            self.queue.popleft()
+            self.stats.dropped += 1
+            return True
+
+        # Dropping a sequenced frame would leave a gap the client's last seq skips over.
+        # Closing instead makes it resume from the last frame it actually received.
+        self.stats.slow_consumer_disconnects += 1
+        self._disconnect_slow_consumer()
+        return False
+
+    def _disconnect_slow_consumer(self):
+        self.closed = True
+        self.queue.clear()
+        self.presence.clear()
+        self._wakeup.set()
+        asyncio.get_running_loop().create_task(self._close_socket(SLOW_CONSUMER_CLOSE_CODE))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _write_loop(self):
+        while not self.closed:
+            if not self.queue and not self.presence:
+                if self._closing:
+                    if self._close_code is not None:
+                        await self._close_socket(self._close_code)
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if self.presence:
+                # Cursor moves never wait behind queued code updates
+                frame = self.presence.pop(next(iter(self.presence)))
+            else:
+                frame = self.queue.popleft()
+            try:
+                await self.websocket.send_text(frame.text)
+                self.stats.sent += 1
+            except Exception:
+                # Connection is broken, stop writing and let the manager remove it
+                self.closed = True
+                self.stats.send_failures += 1
+                self.queue.clear()
+                self.presence.clear()
+                if self.on_failure:
+                    self.on_failure(self)
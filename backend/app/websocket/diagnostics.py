@@ -0,0 +1,299 @@
+"""
+Live syntax and lint diagnostics
+
+Every code change is handed to this stage, which waits until a problem's code
+has been quiet for an interval and then checks only its latest text: a parse
+with ``ast``, a compile for the errors the parser lets through (such as
+``return`` outside a function) and a few cheap lint rules. Checks run in a
+small thread pool so large files do not stall the event loop, and results are
+cached by code digest, so undoing back to a checked state costs a lookup. A
+problem's diagnostics are sent only when they differ from the last ones sent;
+the latest are kept to greet interviewers who join later.
+"""
+
+import ast
+import asyncio
+import builtins
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from app.schemas.websocket import Diagnostic, DiagnosticsMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIAGNOSTICS_DELAY = float(os.getenv("WS_DIAGNOSTICS_DELAY_MS", "300")) / 1000
+DEFAULT_CACHE_SIZE = int(os.getenv("WS_DIAGNOSTICS_CACHE_SIZE", "1024"))
+DEFAULT_THREADS = int(os.getenv("WS_DIAGNOSTICS_THREADS", "2"))
+
+# Who gets the diagnostics; the candidate has their own editor
+DIAGNOSTICS_ROLE = "interviewer"
+
+# Diagnostics sent per problem; a broken file should not produce a flood
+MAX_DIAGNOSTICS = 50
+
+# Names every module has without binding them
+MODULE_NAMES = frozenset(dir(builtins)) | {"__file__", "__builtins__", "__annotations__"}
+
+# Statements after which the rest of a block never runs
+TERMINAL_STATEMENTS = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+
+# (session_id, problem_id)
+Key = tuple[str, int]
+# Sends a problem's changed diagnostics: (session_id, problem_id, diagnostics)
+DiagnosticsSend = Callable[[str, int, list[Diagnostic]], Awaitable[None]]
+
+
+def _at(node: ast.AST, severity: str, code: str, message: str) -> Diagnostic:
+    return Diagnostic(
+        line=node.lineno,
+        column=node.col_offset + 1,
+        severity=severity,
+        code=code,
+        message=message,
+    )
+
+
+def _syntax_error(error: SyntaxError) -> Diagnostic:
+    return Diagnostic(
+        line=max(error.lineno or 1, 1),
+        column=max(error.offset or 1, 1),
+        severity="error",
+        code="syntax-error",
+        message=f"{type(error).__name__}: {error.msg}",
+    )
+
+
+def _bound_names(tree: ast.Module) -> set[str]:
+    """Every name the module binds anywhere, whatever the scope"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add(node.asname or node.name.partition(".")[0])
+        elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def lint(tree: ast.Module) -> list[Diagnostic]:
+    """
+    Cheap checks of a module that compiles. Scopes are not told apart, so a
+    name bound anywhere counts as defined everywhere: the rules miss some
+    problems but do not report correct code
+    """
+    diagnostics = []
+    loaded = {
+        node.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+    }
+    bound = _bound_names(tree)
+    star_import = any(
+        isinstance(node, ast.ImportFrom) and node.names[0].name == "*" for node in ast.walk(tree)
+    )
+    if not star_import:
+        defined = bound | MODULE_NAMES
+        diagnostics += [
+            _at(node, "error", "undefined-name", f"Undefined name '{node.id}'")
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Name)
+            and isinstance(node.ctx, ast.Load)
+            and node.id not in defined
+        ]
+
+    # Names listed in __all__ are used by whoever imports the module
+    if "__all__" not in loaded | bound:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                continue
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    name = alias.asname or alias.name.partition(".")[0]
+                    if name != "*" and name not in loaded:
+                        diagnostics.append(
+                            _at(node, "warning", "unused-import", f"'{alias.name}' is never used")
+                        )
+
+    for node in ast.walk(tree):
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if not isinstance(block, list):
+                continue
+            for statement, following in zip(block, block[1:], strict=False):
+                if isinstance(statement, TERMINAL_STATEMENTS):
+                    diagnostics.append(
+                        _at(following, "warning", "unreachable-code", "Code is unreachable")
+                    )
+                    break
+    return diagnostics
+
+
+def diagnose(code: str) -> list[Diagnostic]:
+    """Syntax errors of the code, or its lint warnings when it compiles; in source order"""
+    try:
+        tree = ast.parse(code, "<solution>")
+        compile(tree, "<solution>", "exec", dont_inherit=True)
+    except SyntaxError as error:
+        return [_syntax_error(error)]
+    except (ValueError, RecursionError, MemoryError) as error:
+        # Null bytes, or nesting too deep to parse
+        return [
+            Diagnostic(line=1, column=1, severity="error", code="syntax-error", message=str(error))
+        ]
+    diagnostics = sorted(lint(tree), key=lambda d: (d.line, d.column, d.code))
+    return diagnostics[:MAX_DIAGNOSTICS]
+
+
+def digest(code: str) -> bytes:
+    return hashlib.blake2b(code.encode(), digest_size=16).digest()
+
+
+class DiagnosticsStage:
+    """Checks the latest code of each problem once it settles and sends changes"""
+
+    def __init__(
+        self,
+        send: DiagnosticsSend,
+        delay: float = DEFAULT_DIAGNOSTICS_DELAY,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        threads: int = DEFAULT_THREADS,
+    ):
+        self.send = send
+        self.delay = delay
+        self.cache_size = cache_size
+        self.threads = threads
+        # Code waiting to be checked, and the timer that checks it
+        self._pending: dict[Key, str] = {}
+        self._timers: dict[Key, asyncio.TimerHandle] = {}
+        # Problems with a check in flight; edits made meanwhile wait for it
+        self._running: set[Key] = set()
+        # Last diagnostics sent per problem, absent when there were none
+        self.latest: dict[Key, list[Diagnostic]] = {}
+        # Code digest -> diagnostics, least recently used first
+        self.cache: OrderedDict[bytes, list[Diagnostic]] = OrderedDict()
+        self._executor: ThreadPoolExecutor | None = None
+
+        # Counters
+        self.submitted = 0
+        self.checked = 0
+        self.cache_hits = 0
+        self.sent = 0
+
+    async def stop(self):
+        """Drop pending checks and stop the thread pool"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._pending.clear()
+        self._running.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, session_id: str, problem_id: int, code: str):
+        """Check a problem's code once it has not changed for the delay"""
+        self.submitted += 1
+        key = (session_id, problem_id)
+        self._pending[key] = code
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._timers[key] = asyncio.get_running_loop().call_later(self.delay, self._fire, key)
+
+    def _fire(self, key: Key):
+        self._timers.pop(key, None)
+        # A check in flight picks up the pending code when it finishes
+        if key in self._pending and key not in self._running:
+            self._running.add(key)
+            asyncio.get_running_loop().create_task(self._check(key))
+
+    async def _check(self, key: Key):
+        try:
+            diagnostics = await self.check(self._pending.pop(key))
+            # Dropped meanwhile, or newer code is waiting to be checked
+            if key not in self._running or key in self._pending:
+                return
+            if diagnostics == self.latest.get(key, []):
+                return
+            self.remember(*key, diagnostics)
+            self.sent += 1
+            await self.send(*key, diagnostics)
+        except Exception:
+            logger.exception("Failed to check the code of problem %s in session %s", key[1], key[0])
+        finally:
+            if key in self._running:
+                self._running.discard(key)
+                if key in self._pending and key not in self._timers:
+                    self._fire(key)
+
+    async def check(self, code: str) -> list[Diagnostic]:
+        """Diagnostics of the code, from the cache or the thread pool"""
+        key = digest(code)
+        diagnostics = self.cache.get(key)
+        if diagnostics is not None:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            return diagnostics
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix="diagnostics")
+        diagnostics = await asyncio.get_running_loop().run_in_executor(
+            self._executor, diagnose, code
+        )
+        self.checked += 1
+        self.cache[key] = diagnostics
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return diagnostics
+
+    def remember(self, session_id: str, problem_id: int, diagnostics: list[Diagnostic]):
+        """Record the diagnostics last sent for a problem, here or by another worker"""
+        if diagnostics:
+            self.latest[(session_id, problem_id)] = diagnostics
+        else:
+            self.latest.pop((session_id, problem_id), None)
+
+    def messages(self, session_id: str) -> list[DiagnosticsMessage]:
+        """Current diagnostics of a session's problems that have any"""
+        return [
+            DiagnosticsMessage(problemId=problem_id, diagnostics=diagnostics)
+            for (sid, problem_id), diagnostics in self.latest.items()
+            if sid == session_id
+        ]
+
+    def drop_session(self, session_id: str):
+        """Forget a session's code and diagnostics"""
+        for key in [
+            key
+            for key in self._pending.keys() | self.latest.keys() | self._running
+            if key[0] == session_id
+        ]:
+            timer = self._timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            self._pending.pop(key, None)
+            self._running.discard(key)
+            self.latest.pop(key, None)
+
+    def get_stats(self) -> dict:
+        """Diagnostics counters for this worker"""
+        return {
+            "submitted": self.submitted,
+            "checked": self.checked,
+            "cache_hits": self.cache_hits,
+            "sent": self.sent,
+            "cached": len(self.cache),
+        }
@@ -0,0 +1,125 @@
+"""
+Typed dispatch of incoming WebSocket messages
+
+Handlers are registered per message type together with the pydantic model of
+the message. All models are combined into one discriminated union whose
+TypeAdapter is built once and validates straight from the raw frame, so a
+message is parsed exactly once. Frames are capped per message type: the type
+is sniffed from the raw text and oversized frames are rejected before parsing.
+"""
+
+import functools
+import operator
+import os
+import re
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Annotated, Any
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+from .connection import Connection
+
+DEFAULT_MAX_MESSAGE_BYTES = int(os.getenv("WS_MAX_MESSAGE_BYTES", str(4 * 1024)))
+MAX_CODE_MESSAGE_BYTES = int(os.getenv("WS_MAX_CODE_MESSAGE_BYTES", str(512 * 1024)))
+
+# Called with (connection, validated message, raw frame)
+Handler = Callable[[Connection, Any, str | bytes], Awaitable[None]]
+
+_TYPE_TEXT = re.compile(r'"type"\s*:\s*"([^"\\]{1,64})"')
+_TYPE_BYTES = re.compile(rb'"type"\s*:\s*"([^"\\]{1,64})"')
+
+
+def sniff_type(data: str | bytes) -> str | None:
+    """First "type" value in a raw frame, without parsing it"""
+    pattern = _TYPE_BYTES if isinstance(data, bytes) else _TYPE_TEXT
+    match = pattern.search(data)
+    if match is None:
+        return None
+    value = match.group(1)
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class MessageRejected(Exception):
+    """An incoming frame was refused before reaching a handler"""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+@dataclass
+class Route:
+    """Handler and limits for one message type"""
+
+    model: type[BaseModel]
+    handler: Handler
+    max_bytes: int
+
+
+class Dispatcher:
+    """Registry of message handlers keyed by message type"""
+
+    def __init__(self, default_max_bytes: int = DEFAULT_MAX_MESSAGE_BYTES):
+        self.default_max_bytes = default_max_bytes
+        self.routes: dict[str, Route] = {}
+        self._adapter: TypeAdapter | None = None
+        self._max_bytes = 0
+
+    def register(self, model: type[BaseModel], max_bytes: int | None = None):
+        """Decorator registering a handler for the message type of a model"""
+        message_type = model.model_fields["type"].default
+
+        def decorator(handler: Handler) -> Handler:
+            self.routes[message_type] = Route(model, handler, max_bytes or self.default_max_bytes)
+            # Rebuilt on next use with the new member
+            self._adapter = None
+            return handler
+
+        return decorator
+
+    @property
+    def adapter(self) -> TypeAdapter:
+        """Discriminated union of every registered message model"""
+        if self._adapter is None:
+            models = tuple(route.model for route in self.routes.values())
+            if len(models) > 1:
+                union = functools.reduce(operator.or_, models)
+                self._adapter = TypeAdapter(Annotated[union, Field(discriminator="type")])
+            else:
+                self._adapter = TypeAdapter(models[0])
+            self._max_bytes = max(route.max_bytes for route in self.routes.values())
+        return self._adapter
+
+    def parse(self, data: str | bytes) -> tuple[BaseModel, Route]:
+        """Validate a raw frame; raises MessageRejected if it is refused"""
+        adapter = self.adapter
+        # Text frames arrive decoded and the caps are on their UTF-8 size; the character
+        # count is a lower bound, enough to refuse a huge frame without encoding it
+        size = len(data)
+        if isinstance(data, str) and size <= self._max_bytes:
+            size = len(data.encode())
+        if size > self._max_bytes:
+            raise MessageRejected(f"Message of {size} bytes is too large", "MESSAGE_TOO_LARGE")
+
+        # Cheap check of the per-type cap before paying for a full parse
+        route = self.routes.get(sniff_type(data))
+        if route and size > route.max_bytes:
+            raise MessageRejected(f"Message of {size} bytes is too large", "MESSAGE_TOO_LARGE")
+
+        try:
+            message = adapter.validate_json(data)
+        except ValidationError as e:
+            error = e.errors()[0]
+            if error["type"] in ("union_tag_invalid", "union_tag_not_found"):
+                message_type = error.get("ctx", {}).get("tag")
+                raise MessageRejected(
+                    f"Unknown message type: {message_type}", "UNKNOWN_MESSAGE_TYPE"
+                ) from e
+            raise MessageRejected(str(e), "INVALID_MESSAGE") from e
+
+        # The sniffed type may have come from a nested object; check the real one
+        route = self.routes[message.type]
+        if size > route.max_bytes:
+            raise MessageRejected(f"Message of {size} bytes is too large", "MESSAGE_TOO_LARGE")
+        return message, route
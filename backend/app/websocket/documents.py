@@ -0,0 +1,242 @@
+"""
+Authoritative session state: versioned code documents and the active problem
+
+The worker keeps the latest code of every problem being edited in its rooms,
+plus the problem the interviewer has selected, so a joining or reconnecting
+client gets a snapshot instead of waiting for the next keystroke. Clients send
+range edits against a base version; edits are only applied when the base
+matches the server's version, otherwise the client is resynced with the full
+text. A copy that missed edits made on another worker is kept but marked stale
+until a full-text update refreshes it.
+
+Memory is capped per document, per session and per worker; the least recently
+edited sessions are evicted first. State is freed when a room empties or the
+session ends.
+"""
+
+import os
+from collections import OrderedDict
+from collections.abc import Iterable
+
+MAX_DOCUMENT_CHARS = int(os.getenv("WS_MAX_DOCUMENT_CHARS", str(200_000)))
+MAX_DOCUMENTS_PER_SESSION = int(os.getenv("WS_MAX_DOCUMENTS_PER_SESSION", "10"))
+MAX_TOTAL_CHARS = int(os.getenv("WS_DOCUMENT_STORE_MAX_CHARS", str(50_000_000)))
+
+
+class VersionConflict(Exception):
+    """Edits were made against a version the server does not have"""
+
+
+class Document:
+    """Code of one problem in a session, with a version bumped on every change"""
+
+    __slots__ = ("text", "version", "stale")
+
+    def __init__(self, text: str = "", version: int = 0):
+        self.text = text
+        self.version = version
+        # Set when edits made on another worker could not be applied; cleared by a full text
+        self.stale = False
+
+    def apply(self, ops: Iterable[dict]) -> str:
+        """
+        Apply edits in order and return the new text
+
+        Each op replaces the code point range [start, end) with ``text``: an
+        insert has start == end, a delete has empty text. Raises ValueError if
+        a range falls outside the document; the document is left unchanged.
+        """
+        text = self.text
+        for op in ops:
+            start, end = op["start"], op["end"]
+            if not 0 <= start <= end <= len(text):
+                raise ValueError(f"Edit range {start}-{end} outside document of {len(text)}")
+            text = text[:start] + op.get("text", "") + text[end:]
+        return text
+
+
+class SessionState:
+    """Documents and active problem of one session"""
+
+    __slots__ = ("documents", "active_problem_id", "active_problem_index", "size")
+
+    def __init__(self):
+        self.documents: dict[int, Document] = {}
+        self.active_problem_id: int | None = None
+        self.active_problem_index: int | None = None
+        # Total characters held by the documents
+        self.size = 0
+
+
+class DocumentStore:
+    """Session state per session on this worker"""
+
+    def __init__(
+        self,
+        max_document_chars: int = MAX_DOCUMENT_CHARS,
+        max_documents_per_session: int = MAX_DOCUMENTS_PER_SESSION,
+        max_total_chars: int = MAX_TOTAL_CHARS,
+    ):
+        self.max_document_chars = max_document_chars
+        self.max_documents_per_session = max_documents_per_session
+        self.max_total_chars = max_total_chars
+
+        # session_id -> state, least recently edited first
+        self.sessions: OrderedDict[str, SessionState] = OrderedDict()
+        self.total_size = 0
+        self.evicted_sessions = 0
+
+    def get(self, session_id: str, problem_id: int) -> Document | None:
+        """Get a document if the server has a copy"""
+        state = self.sessions.get(session_id)
+        return state.documents.get(problem_id) if state else None
+
+    def replace(
+        self, session_id: str, problem_id: int, code: str, version: int | None = None
+    ) -> Document | None:
+        """
+        Replace a document's full text; bumps the version unless one is given
+
+        Returns None if the code is over the size cap and was not stored.
+        """
+        state = self._touch(session_id)
+        document = state.documents.get(problem_id)
+        if document is None:
+            document = Document()
+            self._add_document(state, problem_id, document)
+
+        if not self._set_text(session_id, state, problem_id, document, code):
+            return None
+        document.version = version if version is not None else document.version + 1
+        document.stale = False
+        return document
+
+    def apply_delta(
+        self, session_id: str, problem_id: int, base_version: int, ops: list[dict]
+    ) -> Document:
+        """
+        Apply edits made against base_version
+
+        Raises VersionConflict if the server has no up-to-date copy, is at
+        another version or the result is over the size cap, and ValueError if
+        an edit range is invalid.
+        """
+        document = self.get(session_id, problem_id)
+        if document is None or document.stale or document.version != base_version:
+            raise VersionConflict(f"Document {problem_id} is not at version {base_version}")
+
+        state = self._touch(session_id)
+        if not self._set_text(session_id, state, problem_id, document, document.apply(ops)):
+            raise VersionConflict(f"Document {problem_id} is too large to track")
+        document.version += 1
+        return document
+
+    def set_active_problem(self, session_id: str, problem_id: int, problem_index: int | None):
+        """Remember the problem the interviewer switched to"""
+        state = self._touch(session_id)
+        state.active_problem_id = problem_id
+        state.active_problem_index = problem_index
+
+    def apply_remote(self, session_id: str, message: dict):
+        """Mirror a state change broadcast by another worker"""
+        message_type = message.get("type")
+        if message_type == "problem_change":
+            if isinstance(message.get("problemId"), int):
+                self.set_active_problem(
+                    session_id, message["problemId"], message.get("problemIndex")
+                )
+            return
+
+        problem_id = message.get("problemId")
+        version = message.get("version")
+        if problem_id is None or version is None:
+            return
+
+        if message_type == "code_update":
+            self.replace(session_id, problem_id, message.get("code", ""), version)
+            return
+
+        document = self.get(session_id, problem_id)
+        try:
+            if document is None or document.version != message.get("baseVersion"):
+                raise VersionConflict
+            self.apply_delta(session_id, problem_id, document.version, message.get("ops", []))
+            document.version = version
+        except (VersionConflict, ValueError, KeyError):
+            # Our copy diverged. Joining clients still get the last text we had, and the
+            # next edit here is refused until a full-text update brings the copy back
+            if document is not None:
+                document.stale = True
+
+    def snapshot(self, session_id: str) -> dict | None:
+        """Compact copy of a session's state for a joining client"""
+        state = self.sessions.get(session_id)
+        if state is None:
+            return None
+
+        return {
+            "activeProblemId": state.active_problem_id,
+            "activeProblemIndex": state.active_problem_index,
+            "documents": [
+                {
+                    "problemId": problem_id,
+                    "code": document.text,
+                    "version": document.version,
+                    "stale": document.stale,
+                }
+                for problem_id, document in state.documents.items()
+            ],
+        }
+
+    def drop_session(self, session_id: str):
+        """Free all state of a session"""
+        state = self.sessions.pop(session_id, None)
+        if state:
+            self.total_size -= state.size
+
+    def _touch(self, session_id: str) -> SessionState:
+        """Get or create a session's state and mark it recently used"""
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = SessionState()
+        else:
+            self.sessions.move_to_end(session_id)
+        return state
+
+    def _add_document(self, state: SessionState, problem_id: int, document: Document):
+        # Make room by dropping the oldest document other than the active one
+        while len(state.documents) >= self.max_documents_per_session:
+            oldest = next(
+                (pid for pid in state.documents if pid != state.active_problem_id),
+                next(iter(state.documents)),
+            )
+            self._remove_document(state, oldest)
+        state.documents[problem_id] = document
+
+    def _remove_document(self, state: SessionState, problem_id: int):
+        document = state.documents.pop(problem_id, None)
+        if document:
+            state.size -= len(document.text)
+            self.total_size -= len(document.text)
+
+    def _set_text(
+        self, session_id: str, state: SessionState, problem_id: int, document: Document, text: str
+    ) -> bool:
+        """Store new text within the caps; False if the document was dropped"""
+        if len(text) > self.max_document_chars:
+            self._remove_document(state, problem_id)
+            return False
+
+        growth = len(text) - len(document.text)
+        document.text = text
+        state.size += growth
+        self.total_size += growth
+
+        # Evict least recently edited sessions while over the worker-wide cap
+        while self.total_size > self.max_total_chars and len(self.sessions) > 1:
+            evicted_id = next(iter(self.sessions))
+            if evicted_id == session_id:
+                break
+            self.drop_session(evicted_id)
+            self.evicted_sessions += 1
+        return True
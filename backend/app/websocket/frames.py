@@ -0,0 +1,82 @@
+"""
+Encode-once WebSocket frames
+
+A broadcast is serialized to JSON text once and the same text is sent to every
+recipient (and to the other workers), instead of calling ``send_json`` per
+socket. orjson is used when installed (``pip install .[speedups]``).
+"""
+
+import json
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on installed extras
+    orjson = None
+
+
+def encode(message: dict) -> str:
+    """Serialize a message to compact JSON text"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode(text: str | bytes) -> dict:
+    """Parse JSON text into a message"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class Frame:
+    """A message encoded once and shared by every recipient"""
+
+    __slots__ = ("text", "_message")
+
+    def __init__(self, text: str, message: dict | None = None):
+        self.text = text
+        self._message = message
+
+    @classmethod
+    def of(cls, message: "dict | BaseModel | Frame") -> "Frame":
+        """Build a frame from a dict, a pydantic message or an existing frame"""
+        if isinstance(message, Frame):
+            return message
+        if isinstance(message, BaseModel):
+            return cls(message.model_dump_json())
+        return cls(encode(message), message)
+
+    @property
+    def message(self) -> dict:
+        """Decoded message, parsed lazily for frames built from text"""
+        if self._message is None:
+            self._message = decode(self.text)
+        return self._message
+
+    def with_fields(self, **fields) -> "Frame":
+        """Copy of the frame with extra top-level fields"""
+        message = self.message
+        merged = {**message, **fields}
+
+        # Splice new keys into the encoded text instead of re-encoding the whole message
+        text = self.text.rstrip()
+        if message and text.endswith("}") and not fields.keys() & message.keys():
+            return Frame(f"{text[:-1]},{encode(fields)[1:]}", merged)
+        return Frame(encode(merged), merged)
+
+    def with_seq(self, seq: int) -> "Frame":
+        """Copy of the frame with a sequence number, appended without decoding the text"""
+        message = {**self._message, "seq": seq} if self._message is not None else None
+        text = self.text.rstrip()[:-1]
+        separator = "," if text.rstrip() != "{" else ""
+        return Frame(f'{text}{separator}"seq":{seq}}}', message)
+
+    @property
+    def type(self) -> str | None:
+        """Message type"""
+        return self.message.get("type")
+
+    def __repr__(self):
+        return f"<Frame({self.text[:60]!r})>"
@@ -0,0 +1,104 @@
+"""
+Server-driven heartbeats and idle connection reaping
+
+A half-open TCP connection is only noticed when a send fails, which may never
+happen for a quiet session. The heartbeat pings every connection on this
+worker each interval; clients answer with a pong (any message counts). Sockets
+that stayed silent for longer than the timeout are closed and removed, and the
+rest of the room is told the user left.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING
+
+from app.schemas.websocket import PingMessage
+
+from .frames import Frame
+
+if TYPE_CHECKING:
+    from .connection import Connection
+    from .manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL_S", "20"))
+DEFAULT_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT_S", "60"))
+
+# Close code for reaped connections (RFC 6455: "going away")
+IDLE_CLOSE_CODE = 1001
+
+PING = Frame.of(PingMessage())
+
+
+class Heartbeat:
+    """Pings this worker's connections and reaps the ones that stopped answering"""
+
+    def __init__(
+        self,
+        manager: "ConnectionManager",
+        interval: float = DEFAULT_PING_INTERVAL,
+        timeout: float = DEFAULT_PING_TIMEOUT,
+    ):
+        self.manager = manager
+        self.interval = interval
+        self.timeout = timeout
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.pings_sent = 0
+        self.reaped = 0
+
+    def start(self):
+        """Start the sweeper task"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop the sweeper task"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Heartbeat sweep failed")
+
+    async def sweep(self):
+        """Reap silent connections and ping the others"""
+        deadline = time.monotonic() - self.timeout
+        for connection in list(self.manager.connections.values()):
+            if connection.last_seen < deadline:
+                await self._reap(connection)
+            else:
+                connection.enqueue(PING)
+                self.pings_sent += 1
+
+    async def _reap(self, connection: "Connection"):
+        session_id = connection.session_id
+        if not await self.manager.disconnect(connection.websocket, session_id):
+            return
+
+        self.reaped += 1
+        logger.info("Reaped idle WebSocket in session %s", session_id)
+        try:
+            # A half-open socket may never finish the closing handshake
+            await asyncio.wait_for(connection.websocket.close(code=IDLE_CLOSE_CODE), self.interval)
+        except Exception:
+            pass
+
+        await self.manager.announce_left(connection)
+
+    def get_stats(self) -> dict:
+        """Live and reaped connection gauges for this worker"""
+        return {
+            "live": len(self.manager.connections),
+            "reaped": self.reaped,
+            "pings_sent": self.pings_sent,
+        }
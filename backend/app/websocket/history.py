@@ -0,0 +1,85 @@
+"""
+Sequenced broadcast history for resuming after a reconnect
+
+Every broadcast delivered to a room on this worker gets the next sequence
+number of that room and is kept in a bounded ring buffer. A client that
+reconnects with the epoch and last sequence number it saw is sent only the
+messages it missed. If the room was recreated in the meantime (new epoch) or
+the missed messages were already evicted, the client gets a full snapshot
+instead.
+"""
+
+import os
+import uuid
+from collections import deque
+
+from .frames import Frame
+
+DEFAULT_HISTORY_SIZE = int(os.getenv("WS_HISTORY_SIZE", "512"))
+
+
+class RoomHistory:
+    """Ring buffer of the latest sequenced frames of one room"""
+
+    __slots__ = ("epoch", "seq", "frames")
+
+    def __init__(self, size: int = DEFAULT_HISTORY_SIZE):
+        # Identifies this incarnation of the room; sequence numbers restart with it
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.frames: deque[Frame] = deque(maxlen=size)
+
+    def append(self, frame: Frame) -> Frame:
+        """Number a frame and remember it; returns the sequenced frame"""
+        self.seq += 1
+        sequenced = frame.with_seq(self.seq)
+        self.frames.append(sequenced)
+        return sequenced
+
+    def since(self, last_seq: int) -> list[Frame] | None:
+        """Frames after last_seq, or None if some of them were evicted"""
+        if last_seq > self.seq:
+            return None
+
+        missed = self.seq - last_seq
+        if missed > len(self.frames):
+            return None
+        return list(self.frames)[len(self.frames) - missed :] if missed else []
+
+
+class History:
+    """Room histories of the sessions on this worker"""
+
+    def __init__(self, size: int = DEFAULT_HISTORY_SIZE):
+        self.size = size
+        self.rooms: dict[str, RoomHistory] = {}
+
+        # Counters
+        self.resumed = 0
+        self.resume_misses = 0
+
+    def room(self, session_id: str) -> RoomHistory:
+        """Get or create the history of a room"""
+        room = self.rooms.get(session_id)
+        if room is None:
+            room = self.rooms[session_id] = RoomHistory(self.size)
+        return room
+
+    def replay(
+        self, session_id: str, epoch: str | None, last_seq: int | None
+    ) -> list[Frame] | None:
+        """Frames a reconnecting client missed; None if it needs a full snapshot"""
+        if epoch is None or last_seq is None:
+            return None
+
+        room = self.rooms.get(session_id)
+        missed = room.since(last_seq) if room and room.epoch == epoch else None
+        if missed is None:
+            self.resume_misses += 1
+        else:
+            self.resumed += 1
+        return missed
+
+    def drop(self, session_id: str):
+        """Forget a room's history"""
+        self.rooms.pop(session_id, None)
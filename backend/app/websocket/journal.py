@@ -0,0 +1,308 @@
+"""
+Append-only event journal of sessions, for replaying interviews
+
+Code changes, problem switches, joins, leaves and the end of a session are
+recorded with their time by the worker that relays them. Events are buffered
+per session into blocks. Inside a block a code change is stored as one splice
+against the previous text of its problem (the first change of a problem holds
+the full text, so every block decodes on its own) and times as milliseconds
+since the previous event; the block's JSON lines are then zlib-compressed.
+Sealed blocks are written in batches on an interval, when the session ends
+and at shutdown.
+
+Replays read the blocks a page at a time and merge the blocks of different
+workers by time, so the log is never loaded whole. Events are paced at the
+recorded speed, a multiple of it, or sent as fast as the client reads.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterator
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.services import sessions as sessions_service
+
+from .frames import decode, encode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("WS_JOURNAL_FLUSH_INTERVAL_S", "30"))
+MAX_BLOCK_EVENTS = int(os.getenv("WS_JOURNAL_BLOCK_EVENTS", "2000"))
+
+# Broadcasts recorded besides code changes
+JOURNALED_TYPES = frozenset({"problem_change", "user_joined", "user_left", "session_ended"})
+
+
+@dataclass
+class Block:
+    """Compressed events of one session, as stored"""
+
+    session_id: str
+    started_at: datetime
+    ended_at: datetime
+    event_count: int
+    data: bytes
+
+
+SaveFunction = Callable[[list[Block]], Awaitable[None]]
+LoadFunction = Callable[[str], AsyncIterable[Block]]
+
+
+async def save_blocks(blocks: list[Block]):
+    """Insert blocks in one transaction"""
+    async with AsyncSessionLocal() as db:
+        await sessions_service.save_event_blocks(db, [asdict(block) for block in blocks])
+        await db.commit()
+
+
+async def load_blocks(session_id: str, page_size: int = 16) -> AsyncIterator[Block]:
+    """Blocks of a session by start time, one short query per page"""
+    after = None
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = await sessions_service.get_event_blocks(db, session_id, after, page_size)
+        for row in rows:
+            yield Block(row.session_id, row.started_at, row.ended_at, row.event_count, row.data)
+        if len(rows) < page_size:
+            return
+        after = (rows[-1].started_at, rows[-1].id)
+
+
+def splice(old: str, new: str) -> tuple[int, int, str]:
+    """Smallest single replacement turning old into new: (start, end, text)"""
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    suffix = 0
+    while suffix < limit - start and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return start, len(old) - suffix, new[start : len(new) - suffix]
+
+
+class _OpenBlock:
+    """Events of a session recorded since its last block was sealed"""
+
+    __slots__ = ("started", "last", "lines", "code")
+
+    def __init__(self, now: float):
+        self.started = self.last = now
+        self.lines: list[str] = []
+        # problem_id -> text after the block's last change of it
+        self.code: dict[int, str] = {}
+
+
+def decode_block(block: Block) -> Iterator[tuple[float, dict]]:
+    """Events of a block with their time; splices become code_delta ops"""
+    at = block.started_at.timestamp()
+    # JSON escapes newlines, so every line is one event
+    for line in zlib.decompress(block.data).decode().split("\n"):
+        event = decode(line)
+        at += event.pop("t") / 1000
+        if event.get("type") == "code":
+            if "code" in event:
+                event["type"] = "code_update"
+            else:
+                event = {
+                    "type": "code_delta",
+                    "problemId": event["problemId"],
+                    "ops": [{"start": event["start"], "end": event["end"], "text": event["text"]}],
+                }
+        yield at, event
+
+
+async def merge_blocks(blocks: AsyncIterable[Block]) -> AsyncIterator[tuple[float, dict]]:
+    """Events of blocks sorted by start time, in time order; blocks may overlap"""
+    heap: list = []
+    order = itertools.count()
+
+    def push(events: Iterator[tuple[float, dict]]):
+        for at, event in events:
+            heapq.heappush(heap, (at, next(order), event, events))
+            return
+
+    pending = aiter(blocks)
+    upcoming = await anext(pending, None)
+    while heap or upcoming:
+        # Open every block starting before the next event; usually one at a time
+        while upcoming and (not heap or upcoming.started_at.timestamp() <= heap[0][0]):
+            push(decode_block(upcoming))
+            upcoming = await anext(pending, None)
+        if heap:
+            at, _, event, events = heapq.heappop(heap)
+            yield at, event
+            push(events)
+
+
+class Journal:
+    """Records session events into compressed blocks and replays them"""
+
+    def __init__(
+        self,
+        save: SaveFunction = save_blocks,
+        load: LoadFunction = load_blocks,
+        interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_block_events: int = MAX_BLOCK_EVENTS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.save = save
+        self.load = load
+        self.interval = interval
+        self.max_block_events = max_block_events
+        self.clock = clock
+        self.open: dict[str, _OpenBlock] = {}
+        self.sealed: list[Block] = []
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.events = 0
+        self.blocks_written = 0
+        self.raw_bytes = 0
+        self.bytes_written = 0
+        self.failures = 0
+
+    def start(self):
+        """Start writing blocks periodically"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic writes and write what is left"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def record(self, session_id: str, message: dict):
+        """Record a broadcast if it is worth replaying"""
+        if message.get("type") in JOURNALED_TYPES:
+            self._append(session_id, message)
+
+    def record_code(self, session_id: str, problem_id: int, code: str):
+        """Record the new text of a problem as a splice of its previous text"""
+        block = self._block(session_id)
+        previous = block.code.get(problem_id)
+        block.code[problem_id] = code
+        if previous is None:
+            self._append(session_id, {"type": "code", "problemId": problem_id, "code": code})
+            return
+
+        start, end, text = splice(previous, code)
+        if start == end and not text:
+            return
+        self._append(
+            session_id,
+            {"type": "code", "problemId": problem_id, "start": start, "end": end, "text": text},
+        )
+
+    def _block(self, session_id: str) -> _OpenBlock:
+        block = self.open.get(session_id)
+        if block is None:
+            block = self.open[session_id] = _OpenBlock(self.clock())
+        return block
+
+    def _append(self, session_id: str, event: dict):
+        block = self._block(session_id)
+        now = self.clock()
+        block.lines.append(encode({"t": round((now - block.last) * 1000), **event}))
+        block.last = now
+        self.events += 1
+        if len(block.lines) >= self.max_block_events:
+            self._seal(session_id)
+
+    def _seal(self, session_id: str):
+        block = self.open.pop(session_id, None)
+        if block is None or not block.lines:
+            return
+        raw = "\n".join(block.lines).encode()
+        self.raw_bytes += len(raw)
+        self.sealed.append(
+            Block(
+                session_id,
+                datetime.fromtimestamp(block.started, UTC),
+                datetime.fromtimestamp(block.last, UTC),
+                len(block.lines),
+                zlib.compress(raw, 9),
+            )
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self, session_id: str | None = None):
+        """Seal the open blocks, of one session or of all, and write the sealed ones"""
+        for sid in [session_id] if session_id else list(self.open):
+            self._seal(sid)
+        if session_id is None:
+            batch, self.sealed = self.sealed, []
+        else:
+            batch = [block for block in self.sealed if block.session_id == session_id]
+            self.sealed = [block for block in self.sealed if block.session_id != session_id]
+        if not batch:
+            return
+
+        try:
+            await self.save(batch)
+        except IntegrityError:
+            # E.g. the session was deleted; retrying cannot succeed
+            self.failures += 1
+            logger.exception("Dropped %d journal blocks that cannot be saved", len(batch))
+            return
+        except Exception:
+            self.failures += 1
+            logger.exception("Failed to save %d journal blocks, will retry", len(batch))
+            self.sealed[:0] = batch
+            return
+
+        self.blocks_written += len(batch)
+        self.bytes_written += sum(len(block.data) for block in batch)
+
+    async def replay(self, session_id: str, speed: float | None = 1) -> AsyncIterator[dict]:
+        """
+        Stream the events of a session in time order
+
+        Each event gets its time and its offset in seconds from the first
+        event. With a speed the gaps between events are kept, divided by it;
+        without one events are yielded as fast as they are read.
+        """
+        # Include what this worker has not written yet
+        await self.flush(session_id)
+
+        loop = asyncio.get_running_loop()
+        first = began = None
+        async for at, event in merge_blocks(self.load(session_id)):
+            if first is None:
+                first, began = at, loop.time()
+            offset = at - first
+            if speed:
+                delay = began + offset / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield {
+                "at": datetime.fromtimestamp(at, UTC).isoformat(),
+                "offset": round(offset, 3),
+                **event,
+            }
+
+    def get_stats(self) -> dict:
+        """Journal counters for this worker"""
+        return {
+            "open_blocks": len(self.open),
+            "pending_blocks": len(self.sealed),
+            "events": self.events,
+            "blocks_written": self.blocks_written,
+            "raw_bytes": self.raw_bytes,
+            "bytes_written": self.bytes_written,
+            "failures": self.failures,
+        }
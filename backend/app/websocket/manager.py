@@ -0,0 +1,337 @@
+"""
+WebSocket connection manager for real-time synchronization
+"""
+
+import asyncio
+import logging
+
+from fastapi import WebSocket
+from pydantic import BaseModel
+
+from app.schemas.websocket import (
+    Diagnostic,
+    DiagnosticsMessage,
+    SessionEndedMessage,
+    UserLeftMessage,
+)
+
+from .broker import Broker, InMemoryBroker, create_broker
+from .coalescer import Coalescer
+from .connection import Connection, QueueStats
+from .diagnostics import DIAGNOSTICS_ROLE, DiagnosticsStage
+from .documents import DocumentStore
+from .frames import Frame
+from .heartbeat import Heartbeat
+from .history import History
+from .journal import Journal
+from .persistence import CodeWriteBehind
+from .presence import PresenceRelay
+from .ratelimit import RateLimiter
+from .room import Broadcast, Join, Leave, Presence, RoleBroadcast, Room
+from .sessions import SessionCache
+
+logger = logging.getLogger(__name__)
+
+# Session status changes sent to the other workers; never forwarded to clients
+SESSION_STATUS_PREFIX = '{"type":"session_status",'
+
+# Anything that can be sent: plain dicts, pydantic messages or pre-encoded frames
+Message = dict | BaseModel | Frame
+
+
+class ConnectionManager:
+    """Manages WebSocket connections for sessions"""
+
+    def __init__(self, broker: Broker | None = None):
+        # session_id -> room actor owning the session's connections on this worker
+        self.rooms: dict[str, Room] = {}
+        # websocket -> connection, for personal messages
+        self.connections: dict[WebSocket, Connection] = {}
+        # Ships broadcasts to the other workers
+        self.broker = broker or InMemoryBroker()
+        self.queue_stats = QueueStats()
+        # Latest code and active problem per session for rooms on this worker
+        self.documents = DocumentStore()
+        # Merges bursts of code updates before they are broadcast
+        self.coalescer = Coalescer(self._broadcast_now)
+        # Recent sequenced broadcasts per room, for resuming after a reconnect
+        self.history = History()
+        # Pings connections and reaps the ones that went silent
+        self.heartbeat = Heartbeat(self)
+        # Inbound message budgets per connection and per session
+        self.rate_limiter = RateLimiter()
+        # Throttled cursor and selection updates, outside the ordered stream
+        self.presence = PresenceRelay(self._broadcast_presence)
+        # Status of sessions, checked before accepting a connect
+        self.sessions = SessionCache()
+        # Saves the latest code of edits made on this worker in batches
+        self.code_writer = CodeWriteBehind()
+        # Records session events for replaying interviews
+        self.journal = Journal()
+        # Syntax and lint checks of the latest code, sent to interviewers
+        self.diagnostics = DiagnosticsStage(self._send_diagnostics)
+
+    async def start(self):
+        """Start receiving broadcasts from other workers and the heartbeat"""
+        await self.broker.start(self._deliver_remote)
+        self.heartbeat.start()
+        self.code_writer.start()
+        self.journal.start()
+
+    async def stop(self):
+        """Flush pending broadcasts, let rooms finish their events and stop the broker"""
+        self.heartbeat.stop()
+        await self.coalescer.flush_all()
+        for room in list(self.rooms.values()):
+            await room.stop()
+        await self.code_writer.stop()
+        await self.journal.stop()
+        await self.diagnostics.stop()
+        await self.broker.stop()
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        user_name: str | None = None,
+        user_role: str | None = None,
+        epoch: str | None = None,
+        last_seq: int | None = None,
+    ):
+        """Accept WebSocket connection and add to session room"""
+        await websocket.accept()
+
+        connection = Connection(
+            websocket,
+            session_id,
+            self.queue_stats,
+            on_failure=self._on_send_failure,
+            user_name=user_name,
+            user_role=user_role,
+        )
+        connection.start()
+        self.connections[websocket] = connection
+
+        # The room greets the connection with its state before any later broadcast
+        join = Join(connection, epoch, last_seq)
+        while not await self._room(session_id).post(join):
+            pass  # The room closed as we posted; a new one is created
+        await join.done
+
+    async def restore_documents(self, session_id: str):
+        """Seed the documents of a session without a room here from the saved code"""
+        if session_id in self.rooms:
+            return
+        try:
+            saved = await self.code_writer.load(session_id)
+        except Exception:
+            logger.exception("Failed to load saved code of session %s", session_id)
+            return
+        for problem_id, code in saved.items():
+            # Edits that arrived while loading are newer
+            if self.documents.get(session_id, problem_id) is None:
+                self.documents.replace(session_id, problem_id, code)
+
+    def record_code(self, session_id: str, problem_id: int, code: str):
+        """Queue the latest code of a problem for saving and checking, and journal the change"""
+        self.code_writer.mark(session_id, problem_id, code)
+        self.journal.record_code(session_id, problem_id, code)
+        self.diagnostics.submit(session_id, problem_id, code)
+
+    def _room(self, session_id: str) -> Room:
+        room = self.rooms.get(session_id)
+        if room is None:
+            room = self.rooms[session_id] = Room(self, session_id)
+            room.start()
+        return room
+
+    async def disconnect(self, websocket: WebSocket, session_id: str) -> bool:
+        """Remove WebSocket connection from session room; False if it was already removed"""
+        removed = False
+        room = self.rooms.get(session_id)
+        if room:
+            leave = Leave(websocket)
+            removed = await room.post(leave) and await leave.done
+
+        connection = self.connections.pop(websocket, None)
+        if connection:
+            self.rate_limiter.forget_client(websocket)
+            self.presence.forget(websocket)
+            connection.stop()
+        return removed
+
+    def _on_room_empty(self, room: Room):
+        """Free the state of a room whose last connection left"""
+        if self.rooms.get(room.session_id) is room:
+            del self.rooms[room.session_id]
+            self.documents.drop_session(room.session_id)
+            self.history.drop(room.session_id)
+            self.rate_limiter.forget_session(room.session_id)
+            self.diagnostics.drop_session(room.session_id)
+
+    def touch(self, websocket: WebSocket):
+        """Record activity on a connection so the heartbeat keeps it"""
+        connection = self.connections.get(websocket)
+        if connection:
+            connection.touch()
+
+    def _on_send_failure(self, connection: Connection):
+        # Only remove the entry if it still belongs to this connection
+        if self.connections.get(connection.websocket) is connection:
+            asyncio.get_running_loop().create_task(self._remove_failed(connection))
+
+    async def _remove_failed(self, connection: Connection):
+        if await self.disconnect(connection.websocket, connection.session_id):
+            await self.announce_left(connection)
+
+    async def announce_left(self, connection: Connection):
+        """Tell the rest of the room that a removed connection's user left"""
+        if connection.user_name and connection.user_role:
+            await self.broadcast_to_session(
+                UserLeftMessage(userName=connection.user_name, role=connection.user_role),
+                connection.session_id,
+            )
+
+    async def send_personal_message(self, message: Message, websocket: WebSocket):
+        """Send message to specific WebSocket connection"""
+        frame = Frame.of(message)
+        connection = self.connections.get(websocket)
+        if connection:
+            connection.enqueue(frame)
+            return
+
+        # Not registered (e.g. rejected before joining a room): send directly
+        await websocket.send_text(frame.text)
+
+    async def broadcast_to_session(
+        self, message: Message, session_id: str, exclude: WebSocket = None
+    ):
+        """Broadcast message to all connections in a session, optionally excluding sender"""
+        # Pending code updates go out first so events are never reordered around them
+        await self.coalescer.flush(session_id)
+        frame = Frame.of(message)
+        self.journal.record(session_id, frame.message)
+        await self._broadcast_now(frame, session_id, exclude)
+
+    async def broadcast_code_change(
+        self, message: Message, session_id: str, problem_id: int, exclude: WebSocket = None
+    ):
+        """Broadcast a code_update or code_delta through the coalescing stage"""
+        await self.coalescer.submit(Frame.of(message), session_id, problem_id, exclude)
+
+    async def _broadcast_now(self, frame: Frame, session_id: str, exclude: WebSocket = None):
+        """Send a frame to this worker's sockets and to the other workers"""
+        room = self.rooms.get(session_id)
+        if room is None or not await room.post(Broadcast(frame, exclude)):
+            # No sockets here; other workers may still have some
+            self.broker.publish(session_id, frame.text)
+
+    async def _send_diagnostics(
+        self, session_id: str, problem_id: int, diagnostics: list[Diagnostic]
+    ):
+        """Send changed diagnostics to the session's interviewers on every worker"""
+        frame = Frame.of(DiagnosticsMessage(problemId=problem_id, diagnostics=diagnostics))
+        room = self.rooms.get(session_id)
+        if room is None or not await room.post(RoleBroadcast(frame, DIAGNOSTICS_ROLE)):
+            self.broker.publish(session_id, frame.text)
+
+    def broadcast_presence(self, message: Message, websocket: WebSocket):
+        """Relay a client's cursor and selection to the rest of its session, throttled"""
+        connection = self.connections.get(websocket)
+        if connection:
+            self.presence.submit(Frame.of(message), connection.session_id, websocket)
+
+    def _broadcast_presence(self, frame: Frame, session_id: str, exclude: WebSocket):
+        room = self.rooms.get(session_id)
+        if room is None or not room.post_nowait(Presence(frame, exclude)):
+            self.broker.publish(session_id, frame.text)
+
+    def set_session_status(self, session_id: str, status: str):
+        """Update the cached status of a session on every worker"""
+        self.sessions.set_status(session_id, status)
+        self.broker.publish(session_id, f'{SESSION_STATUS_PREFIX}"status":"{status}"}}')
+
+    async def _deliver_remote(self, session_id: str, text: str):
+        """Forward a broadcast from another worker to this worker's sockets"""
+        if text.startswith(SESSION_STATUS_PREFIX):
+            status = Frame(text).message["status"]
+            self.sessions.set_status(session_id, status)
+            # Every worker gets this, with or without a room: save what it holds
+            if status == "ended":
+                self._forget_ended(session_id)
+            return
+        room = self.rooms.get(session_id)
+        if room is None:
+            return
+
+        frame = Frame(text)
+        if frame.type == "presence":
+            # Not part of the sequenced stream; dropped if the room is backed up
+            room.post_nowait(Presence(frame, publish=False))
+            return
+        if frame.type == "diagnostics":
+            self.diagnostics.remember(
+                session_id,
+                frame.message["problemId"],
+                [Diagnostic(**diagnostic) for diagnostic in frame.message["diagnostics"]],
+            )
+            await room.post(RoleBroadcast(frame, DIAGNOSTICS_ROLE, publish=False))
+            return
+        if frame.type in ("code_update", "code_delta", "problem_change"):
+            self.documents.apply_remote(session_id, frame.message)
+        await room.post(Broadcast(frame, publish=False))
+
+    def _forget_ended(self, session_id: str):
+        """Save and free what this worker holds of a session ended on another one"""
+        self.documents.drop_session(session_id)
+        self.diagnostics.drop_session(session_id)
+        loop = asyncio.get_running_loop()
+        loop.create_task(self.code_writer.flush(session_id))
+        loop.create_task(self.journal.flush(session_id))
+
+    async def end_session(self, session_id: str):
+        """Tell participants the session ended and free its state on every worker"""
+        self.set_session_status(session_id, "ended")
+        await self.code_writer.flush(session_id)
+        await self.broadcast_to_session(SessionEndedMessage(sessionId=session_id), session_id)
+        self.documents.drop_session(session_id)
+        self.diagnostics.drop_session(session_id)
+        await self.journal.flush(session_id)
+
+    def get_session_connection_count(self, session_id: str) -> int:
+        """Get number of active connections in a session"""
+        room = self.rooms.get(session_id)
+        return len(room.members) if room else 0
+
+    def get_queue_stats(self) -> dict:
+        """Outbound queue depth and drop counters for this worker"""
+        connections = list(self.connections.values())
+        return {
+            "connections": len(connections),
+            "queue_depth": sum(c.depth for c in connections),
+            "max_queue_depth": max((c.max_depth for c in connections), default=0),
+            "enqueued": self.queue_stats.enqueued,
+            "sent": self.queue_stats.sent,
+            "dropped": self.queue_stats.dropped,
+            "coalesced": self.queue_stats.coalesced,
+            "slow_consumer_disconnects": self.queue_stats.slow_consumer_disconnects,
+            "send_failures": self.queue_stats.send_failures,
+            "presence_superseded": self.queue_stats.presence_superseded,
+            "presence_throttled": self.presence.superseded,
+        }
+
+    def get_room_stats(self, top: int = 5) -> dict:
+        """Load of the room actors on this worker, with the busiest rooms"""
+        rooms = {session_id: room.get_stats() for session_id, room in self.rooms.items()}
+        busiest = sorted(rooms, key=lambda session_id: rooms[session_id]["busy_seconds"])
+        return {
+            "rooms": len(rooms),
+            "inbox": sum(r["inbox"] for r in rooms.values()),
+            "events": sum(r["events"] for r in rooms.values()),
+            "busy_seconds": sum(r["busy_seconds"] for r in rooms.values()),
+            "busiest": {session_id: rooms[session_id] for session_id in busiest[::-1][:top]},
+        }
+
+
+# Global connection manager instance
+manager = ConnectionManager(create_broker())
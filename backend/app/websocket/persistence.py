@@ -0,0 +1,126 @@
+"""
+Write-behind persistence of live code
+
+Relayed code only lives in WebSocket frames and in the worker's document
+store. The latest text of each (session, problem) edited on this worker is
+kept in a dirty buffer and written to Postgres on an interval, all dirty
+entries in one multi-row upsert, so keystrokes never cost a query each. A
+session's entries are also written when it ends, and everything is written at
+shutdown. Rooms that start empty are seeded from the saved code.
+"""
+
+import asyncio
+import logging
+import os
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.services import sessions as sessions_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("WS_CODE_FLUSH_INTERVAL_S", "5"))
+
+# (session_id, problem_id, code)
+CodeRow = tuple[str, int, str]
+SaveFunction = Callable[[list[CodeRow]], Awaitable[None]]
+LoadFunction = Callable[[str], Awaitable[dict[int, str]]]
+
+
+async def save_code(rows: list[CodeRow]):
+    """Upsert code rows in one transaction"""
+    async with AsyncSessionLocal() as db:
+        await sessions_service.save_session_code(db, rows)
+        await db.commit()
+
+
+async def load_code(session_id: str) -> dict[int, str]:
+    """Saved code of a session by problem ID"""
+    async with AsyncSessionLocal() as db:
+        return await sessions_service.get_session_code(db, session_id)
+
+
+class CodeWriteBehind:
+    """Buffers the latest code per (session, problem) and flushes it in batches"""
+
+    def __init__(
+        self,
+        save: SaveFunction = save_code,
+        load: LoadFunction = load_code,
+        interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.save = save
+        self.load = load
+        self.interval = interval
+        # (session_id, problem_id) -> latest unsaved code
+        self.dirty: dict[tuple[str, int], str] = {}
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.marked = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def start(self):
+        """Start flushing periodically"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write what is left"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def mark(self, session_id: str, problem_id: int, code: str):
+        """Remember the latest code of a problem; replaces an unsaved older one"""
+        self.dirty[(session_id, problem_id)] = code
+        self.marked += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self, session_id: str | None = None):
+        """Write the dirty entries, of one session or of all"""
+        if session_id is None:
+            batch, self.dirty = self.dirty, {}
+        else:
+            keys = [key for key in self.dirty if key[0] == session_id]
+            batch = {key: self.dirty.pop(key) for key in keys}
+        if not batch:
+            return
+
+        rows = [(sid, problem_id, code) for (sid, problem_id), code in batch.items()]
+        try:
+            await self.save(rows)
+        except IntegrityError:
+            # E.g. the session was deleted; retrying cannot succeed
+            self.failures += 1
+            logger.exception("Dropped %d code rows that cannot be saved", len(rows))
+            return
+        except Exception:
+            self.failures += 1
+            logger.exception("Failed to save %d code rows, will retry", len(rows))
+            for key, code in batch.items():
+                # Newer edits made during the write win
+                self.dirty.setdefault(key, code)
+            return
+
+        self.flushes += 1
+        self.rows_written += len(rows)
+
+    def get_stats(self) -> dict:
+        """Write-behind counters for this worker"""
+        return {
+            "dirty": len(self.dirty),
+            "marked": self.marked,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
@@ -0,0 +1,75 @@
+"""
+Cursor and selection presence
+
+Presence updates are relayed at most once per interval per client, keeping
+only the latest position. They bypass the coalescer and the history: on each
+recipient connection the latest presence of every peer sits in a slot that is
+sent before queued messages and overwritten, not queued, while the socket is
+busy.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Callable
+
+from fastapi import WebSocket
+
+from .frames import Frame
+
+DEFAULT_PRESENCE_INTERVAL = float(os.getenv("WS_PRESENCE_INTERVAL_MS", "100")) / 1000
+
+# Broadcasts a presence frame to a session: (frame, session_id, exclude)
+PresenceSend = Callable[[Frame, str, WebSocket], None]
+
+
+class PresenceRelay:
+    """Throttles presence updates per client, keeping only the latest one"""
+
+    def __init__(self, send: PresenceSend, interval: float = DEFAULT_PRESENCE_INTERVAL):
+        self.send = send
+        self.interval = interval
+        self._last_sent: dict[WebSocket, float] = {}
+        # Latest update waiting for the client's next slot
+        self._pending: dict[WebSocket, tuple[Frame, str]] = {}
+        self._timers: dict[WebSocket, asyncio.TimerHandle] = {}
+
+        # Counters
+        self.submitted = 0
+        self.superseded = 0
+
+    def submit(self, frame: Frame, session_id: str, websocket: WebSocket):
+        """Relay a client's presence now, or as the latest one at its next slot"""
+        self.submitted += 1
+        if websocket in self._timers:
+            if websocket in self._pending:
+                self.superseded += 1
+            self._pending[websocket] = (frame, session_id)
+            return
+
+        now = time.monotonic()
+        wait = self._last_sent.get(websocket, 0.0) + self.interval - now
+        if wait <= 0:
+            self._last_sent[websocket] = now
+            self.send(frame, session_id, websocket)
+            return
+
+        self._pending[websocket] = (frame, session_id)
+        self._timers[websocket] = asyncio.get_running_loop().call_later(
+            wait, self._flush, websocket
+        )
+
+    def _flush(self, websocket: WebSocket):
+        self._timers.pop(websocket, None)
+        pending = self._pending.pop(websocket, None)
+        if pending:
+            self._last_sent[websocket] = time.monotonic()
+            self.send(pending[0], pending[1], websocket)
+
+    def forget(self, websocket: WebSocket):
+        """Drop the state of a closed connection"""
+        timer = self._timers.pop(websocket, None)
+        if timer:
+            timer.cancel()
+        self._pending.pop(websocket, None)
+        self._last_sent.pop(websocket, None)
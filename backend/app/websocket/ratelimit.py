@@ -0,0 +1,157 @@
+"""
+Inbound rate limiting for WebSocket messages
+
+Every message is charged to a token bucket of its connection and one of its
+session, with separate budgets per message type, so one flooding tab cannot
+starve the other rooms served by the same event loop. Over-limit messages are
+dropped and answered with an error. Each rejection also costs a strike from a
+slowly refilling bucket; a client that runs out of strikes is disconnected.
+"""
+
+import os
+import time
+from dataclasses import dataclass, field
+
+from .dispatch import MessageRejected
+
+STRIKES = int(os.getenv("WS_RATE_LIMIT_STRIKES", "10"))
+
+# Close code for flooding clients (RFC 6455: "policy violation")
+FLOOD_CLOSE_CODE = 1008
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Sustained messages per second and burst size"""
+
+    rate: float
+    burst: float
+
+
+# Per connection, by message type
+CONNECTION_BUDGETS = {
+    "code_update": Budget(rate=10, burst=20),
+    "code_delta": Budget(rate=50, burst=100),
+    "run_code": Budget(rate=1, burst=3),
+    "profile_code": Budget(rate=0.2, burst=3),
+    "problem_change": Budget(rate=5, burst=10),
+    # Relayed at a lower fixed rate; the budget only stops floods
+    "presence": Budget(rate=60, burst=120),
+}
+DEFAULT_CONNECTION_BUDGET = Budget(rate=20, burst=40)
+
+# Per session, shared by all of its connections on this worker
+SESSION_BUDGETS = {
+    "code_update": Budget(rate=20, burst=40),
+    "code_delta": Budget(rate=100, burst=200),
+    "run_code": Budget(rate=2, burst=5),
+    "profile_code": Budget(rate=0.4, burst=5),
+    "problem_change": Budget(rate=10, burst=20),
+    "presence": Budget(rate=120, burst=240),
+}
+DEFAULT_SESSION_BUDGET = Budget(rate=50, burst=100)
+
+
+class TokenBucket:
+    """Allows ``rate`` events per second with bursts of up to ``burst``"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, budget: Budget):
+        self.rate = budget.rate
+        self.burst = budget.burst
+        self.tokens = budget.burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float | None = None) -> bool:
+        """Take one token; False if the bucket is empty"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimited(MessageRejected):
+    """A message was over its budget; ``disconnect`` is set once strikes run out"""
+
+    def __init__(self, message_type: str | None, disconnect: bool):
+        super().__init__(f"Too many {message_type or 'unknown'} messages", "RATE_LIMITED")
+        self.disconnect = disconnect
+
+
+@dataclass
+class ClientLimits:
+    """Buckets of one connection"""
+
+    buckets: dict[str, TokenBucket] = field(default_factory=dict)
+    # One strike is refilled per second
+    strikes: TokenBucket = field(default_factory=lambda: TokenBucket(Budget(1, STRIKES)))
+
+
+class RateLimiter:
+    """Per-connection and per-session token buckets for inbound messages"""
+
+    def __init__(
+        self,
+        connection_budgets: dict[str, Budget] | None = None,
+        session_budgets: dict[str, Budget] | None = None,
+    ):
+        self.connection_budgets = connection_budgets or CONNECTION_BUDGETS
+        self.session_budgets = session_budgets or SESSION_BUDGETS
+        self._clients: dict[object, ClientLimits] = {}
+        self._sessions: dict[str, dict[str, TokenBucket]] = {}
+
+        # Counters
+        self.allowed = 0
+        self.throttled: dict[str, int] = {}
+        self.disconnects = 0
+
+    def check(self, client: object, session_id: str, message_type: str | None):
+        """Charge a message to its budgets; raises RateLimited if it is over"""
+        key = message_type or ""
+        limits = self._clients.get(client)
+        if limits is None:
+            limits = self._clients[client] = ClientLimits()
+
+        bucket = limits.buckets.get(key)
+        if bucket is None:
+            budget = self.connection_budgets.get(key, DEFAULT_CONNECTION_BUDGET)
+            bucket = limits.buckets[key] = TokenBucket(budget)
+
+        session = self._sessions.setdefault(session_id, {})
+        session_bucket = session.get(key)
+        if session_bucket is None:
+            budget = self.session_budgets.get(key, DEFAULT_SESSION_BUDGET)
+            session_bucket = session[key] = TokenBucket(budget)
+
+        now = time.monotonic()
+        # Don't charge the session for messages the connection's own budget refuses
+        if bucket.take(now) and session_bucket.take(now):
+            self.allowed += 1
+            return
+
+        self.throttled[key] = self.throttled.get(key, 0) + 1
+        disconnect = not limits.strikes.take(now)
+        if disconnect:
+            self.disconnects += 1
+        raise RateLimited(message_type, disconnect)
+
+    def forget_client(self, client: object):
+        """Free the buckets of a closed connection"""
+        self._clients.pop(client, None)
+
+    def forget_session(self, session_id: str):
+        """Free the buckets of an empty session"""
+        self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> dict:
+        """Throttling counters for this worker"""
+        return {
+            "allowed": self.allowed,
+            "throttled": sum(self.throttled.values()),
+            "throttled_by_type": dict(self.throttled),
+            "disconnects": self.disconnects,
+        }
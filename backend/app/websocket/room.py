@@ -0,0 +1,248 @@
+"""
+Session rooms as actors
+
+Each session with sockets on this worker is run by one asyncio task that owns
+its membership, sequence numbers and fan-out. Connection handlers, the
+coalescer, the broker and the heartbeat post events to the room's inbox and
+the room applies them one at a time, so joins, leaves and broadcasts are
+ordered deterministically without locks. Frames meant for one role, such as
+diagnostics, go only to the members with that role and are not sequenced.
+The inbox is bounded: a room that falls behind makes the handlers posting to
+it wait, without slowing other rooms. Time spent on each room's events is
+recorded.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from fastapi import WebSocket
+
+from app.metrics import WS_BROADCAST_DURATION, WS_ROOM_BUSY_SECONDS
+from app.schemas.websocket import ConnectionStatusMessage
+
+from .connection import Connection
+from .diagnostics import DIAGNOSTICS_ROLE
+from .frames import Frame
+
+if TYPE_CHECKING:
+    from .manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INBOX_SIZE = int(os.getenv("WS_ROOM_INBOX_SIZE", "1024"))
+
+
+@dataclass
+class Join:
+    """Add a connection and greet it with the room state"""
+
+    connection: Connection
+    epoch: str | None = None
+    last_seq: int | None = None
+    done: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+@dataclass
+class Leave:
+    """Remove a connection; resolves to False if it was not a member"""
+
+    websocket: WebSocket
+    done: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+@dataclass
+class Broadcast:
+    """Sequence a frame and queue it on every member but one"""
+
+    frame: Frame
+    exclude: WebSocket | None = None
+    # Frames from other workers are not published again
+    publish: bool = True
+
+
+@dataclass
+class RoleBroadcast:
+    """Queue an unsequenced frame on the members with one role"""
+
+    frame: Frame
+    role: str
+    publish: bool = True
+
+
+@dataclass
+class Presence:
+    """Put a presence frame in every other member's presence slot"""
+
+    frame: Frame
+    exclude: WebSocket | None = None
+    publish: bool = True
+
+
+Event = Join | Leave | Broadcast | RoleBroadcast | Presence
+
+
+class Room:
+    """Actor owning the members and broadcast order of one session on this worker"""
+
+    def __init__(
+        self, manager: "ConnectionManager", session_id: str, inbox_size: int = DEFAULT_INBOX_SIZE
+    ):
+        self.manager = manager
+        self.session_id = session_id
+        self.members: dict[WebSocket, Connection] = {}
+        self.history = manager.history.room(session_id)
+        self.inbox: asyncio.Queue[Event] = asyncio.Queue(inbox_size)
+        self.closed = False
+        self._task: asyncio.Task | None = None
+
+        # Counters
+        self.events = 0
+        self.busy_seconds = 0.0
+        self.max_inbox = 0
+
+    def start(self):
+        """Start processing the inbox"""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Apply the events already posted, then stop"""
+        if self._task and not self._task.done():
+            await self.inbox.join()
+            self._task.cancel()
+
+    async def post(self, event: Event) -> bool:
+        """Queue an event, waiting while the inbox is full; False if the room closed"""
+        if not self.closed:
+            await self.inbox.put(event)
+        # The room may have emptied and closed while we waited for space
+        if self.closed:
+            return False
+        self.max_inbox = max(self.max_inbox, self.inbox.qsize())
+        return True
+
+    def post_nowait(self, event: Event) -> bool:
+        """Queue an event from synchronous code; False if the room closed or is full"""
+        if self.closed:
+            return False
+        try:
+            self.inbox.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        self.max_inbox = max(self.max_inbox, self.inbox.qsize())
+        return True
+
+    async def _run(self):
+        while True:
+            event = await self.inbox.get()
+            start = time.perf_counter()
+            try:
+                self._handle(event)
+            except Exception:
+                logger.exception(
+                    "Room %s failed to handle %s", self.session_id, type(event).__name__
+                )
+                if isinstance(event, (Join, Leave)) and not event.done.done():
+                    event.done.set_result(False)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.busy_seconds += elapsed
+                WS_ROOM_BUSY_SECONDS.inc(elapsed)
+                self.events += 1
+                self.inbox.task_done()
+
+            # Nobody left and nothing pending: later connects start a new room
+            if not self.members and self.inbox.empty():
+                self.closed = True
+                self.manager._on_room_empty(self)
+                return
+
+    def _handle(self, event: Event):
+        if isinstance(event, Broadcast):
+            self._broadcast(event)
+        elif isinstance(event, RoleBroadcast):
+            self._role_broadcast(event)
+        elif isinstance(event, Presence):
+            self._presence(event)
+        elif isinstance(event, Join):
+            self._join(event)
+        elif isinstance(event, Leave):
+            self._leave(event)
+
+    def _join(self, event: Join):
+        connection = event.connection
+        self.members[connection.websocket] = connection
+
+        # Greet before any later broadcast: state, then what a reconnecting client missed
+        missed = self.manager.history.replay(self.session_id, event.epoch, event.last_seq)
+        connection.enqueue(
+            Frame.of(
+                ConnectionStatusMessage(
+                    status="connected",
+                    sessionId=self.session_id,
+                    activeUsers=len(self.members),
+                    # Latest code and problem so the client does not wait for the next edit
+                    snapshot=(
+                        self.manager.documents.snapshot(self.session_id) if missed is None else None
+                    ),
+                    epoch=self.history.epoch,
+                    seq=self.history.seq,
+                    resumed=missed is not None,
+                )
+            )
+        )
+        for frame in missed or []:
+            connection.enqueue(frame)
+        if connection.user_role == DIAGNOSTICS_ROLE:
+            for message in self.manager.diagnostics.messages(self.session_id):
+                connection.enqueue(Frame.of(message))
+        event.done.set_result(True)
+
+    def _leave(self, event: Leave):
+        connection = self.members.pop(event.websocket, None)
+        if connection:
+            connection.stop()
+            for peer in self.members.values():
+                peer.clear_presence(connection.client_id)
+        event.done.set_result(connection is not None)
+
+    def _broadcast(self, event: Broadcast):
+        start = time.perf_counter()
+        # Encoded once; every recipient and worker gets the same text
+        frame = self.history.append(event.frame)
+        for websocket, connection in self.members.items():
+            if websocket is not event.exclude:
+                connection.enqueue(frame)
+
+        # Other workers forward it to their own sockets, in the same order
+        if event.publish:
+            self.manager.broker.publish(self.session_id, event.frame.text)
+        WS_BROADCAST_DURATION.observe(time.perf_counter() - start)
+
+    def _role_broadcast(self, event: RoleBroadcast):
+        for connection in self.members.values():
+            if connection.user_role == event.role:
+                connection.enqueue(event.frame)
+        if event.publish:
+            self.manager.broker.publish(self.session_id, event.frame.text)
+
+    def _presence(self, event: Presence):
+        client_id = event.frame.message.get("clientId")
+        for websocket, connection in self.members.items():
+            if websocket is not event.exclude:
+                connection.set_presence(client_id, event.frame)
+        if event.publish:
+            self.manager.broker.publish(self.session_id, event.frame.text)
+
+    def get_stats(self) -> dict:
+        """Load of this room"""
+        return {
+            "members": len(self.members),
+            "inbox": self.inbox.qsize(),
+            "max_inbox": self.max_inbox,
+            "events": self.events,
+            "busy_seconds": self.busy_seconds,
+        }
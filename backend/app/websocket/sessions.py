@@ -0,0 +1,149 @@
+"""
+Cached session checks for WebSocket connects
+
+Every connect must name a session that exists, has not ended and admits the
+requested role; connects without a role are refused. Lookups are cached per
+worker with a TTL and a size bound, and concurrent misses for one session share
+a single query, so a reconnect storm costs one query per session instead of
+one per socket. Refusals are cached like the rest: joining and ending a
+session update the entry on every worker through the broker, so a role the
+cache denies is not looked up again.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from app.database import AsyncSessionLocal
+from app.services import sessions as sessions_service
+
+SESSION_CACHE_TTL = float(os.getenv("WS_SESSION_CACHE_TTL_S", "30"))
+SESSION_CACHE_SIZE = int(os.getenv("WS_SESSION_CACHE_SIZE", "10000"))
+
+# Close code for refused connects (RFC 6455: "policy violation")
+SESSION_REJECTED_CLOSE_CODE = 1008
+
+# Roles that may connect in each session status
+ROLES_BY_STATUS = {
+    "waiting": frozenset({"interviewer"}),
+    "active": frozenset({"interviewer", "candidate"}),
+    "ended": frozenset(),
+}
+
+
+@dataclass(frozen=True)
+class SessionAccess:
+    """Status of a session and the roles it admits"""
+
+    status: str
+    roles: frozenset[str]
+
+    @classmethod
+    def of(cls, status: str) -> "SessionAccess":
+        return cls(status, ROLES_BY_STATUS.get(status, frozenset()))
+
+
+# Looks a session up in the database; None if it does not exist
+SessionLoader = Callable[[str], Awaitable[SessionAccess | None]]
+
+
+async def load_session_access(session_id: str) -> SessionAccess | None:
+    """Read a session's status from the database"""
+    async with AsyncSessionLocal() as db:
+        session = await sessions_service.get_session_by_id(db, session_id)
+    if session is None:
+        return None
+    status = session.status.value if hasattr(session.status, "value") else session.status
+    return SessionAccess.of(status)
+
+
+class SessionCache:
+    """TTL'd, size-bounded cache of session id -> SessionAccess"""
+
+    def __init__(
+        self,
+        load: SessionLoader = load_session_access,
+        ttl: float = SESSION_CACHE_TTL,
+        max_size: int = SESSION_CACHE_SIZE,
+    ):
+        self.load = load
+        self.ttl = ttl
+        self.max_size = max_size
+        # session_id -> (expiry, access), least recently used first
+        self._entries: OrderedDict[str, tuple[float, SessionAccess | None]] = OrderedDict()
+        self._loading: dict[str, asyncio.Task] = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    async def get(self, session_id: str) -> SessionAccess | None:
+        """Access of a session, from the cache unless expired"""
+        entry = self._entries.get(session_id)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+        # Concurrent connects to the same session wait for one query
+        task = self._loading.get(session_id)
+        if task is None:
+            self.misses += 1
+            task = self._loading[session_id] = asyncio.ensure_future(self._load(session_id))
+        return await asyncio.shield(task)
+
+    async def _load(self, session_id: str) -> SessionAccess | None:
+        try:
+            access = await self.load(session_id)
+            # Don't overwrite a status set while the query was running
+            if self._loading.get(session_id) is asyncio.current_task():
+                self._store(session_id, access)
+            return access
+        finally:
+            if self._loading.get(session_id) is asyncio.current_task():
+                del self._loading[session_id]
+
+    def _store(self, session_id: str, access: SessionAccess | None):
+        self._entries[session_id] = (time.monotonic() + self.ttl, access)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def set_status(self, session_id: str, status: str):
+        """Record a status change made on this or another worker"""
+        self._loading.pop(session_id, None)
+        self._store(session_id, SessionAccess.of(status))
+
+    def invalidate(self, session_id: str):
+        """Forget a session so the next connect queries it again"""
+        self._loading.pop(session_id, None)
+        self._entries.pop(session_id, None)
+
+    async def check(self, session_id: str, role: str | None) -> str | None:
+        """Reason to refuse a connect, or None if it is allowed"""
+        access = await self.get(session_id)
+        if access is None:
+            reason = "Session not found"
+        elif access.status == "ended":
+            reason = "Session has ended"
+        elif role is None:
+            reason = "A role is required to join a session"
+        elif role not in access.roles:
+            reason = f"Role {role} cannot join this session"
+        else:
+            return None
+        self.rejected += 1
+        return reason
+
+    def get_stats(self) -> dict:
+        """Cache size and hit counters for this worker"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,414 @@
+"""
+WebSocket load test for interview rooms
+
+Opens N sessions, each with an interviewer and a candidate socket. Candidates
+type (full-text code_update at a typing rate) and interviewers switch problems
+now and then. Reports fan-out latency percentiles, lost messages and server
+CPU time per worker.
+
+Usage (from backend/):
+    # Against an in-process uvicorn running app.main:app
+    python scripts/ws_load_test.py --sessions 500 --duration 30
+
+    # Spawn a local uvicorn with several workers
+    python scripts/ws_load_test.py --spawn-workers 4 --sessions 2000
+
+    # Against a running server; pass its master PID to report worker CPU
+    python scripts/ws_load_test.py --url ws://localhost:8000 --server-pid 1234
+
+Sessions are created and joined over the HTTP API first, so the server needs
+a database with seeded problems. Code updates may be coalesced by the server,
+so only missing problem_change messages count as dropped.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+import httpx
+from websockets.asyncio.client import connect
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROBLEM_IDS = [1, 2, 3]
+
+
+@dataclass
+class Results:
+    """Counters and latency samples collected by all clients"""
+
+    latencies_ms: list[float] = field(default_factory=list)
+    code_updates_sent: int = 0
+    code_updates_received: int = 0
+    problem_changes_sent: int = 0
+    problem_changes_received: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+    connect_failures: int = 0
+    disconnects: int = 0
+
+    def error(self, code: str):
+        self.errors[code] = self.errors.get(code, 0) + 1
+
+
+def percentile(samples: list[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def receive_loop(websocket, results: Results, problem_change: bool):
+    """Record latency of every relayed message a client receives"""
+    async for raw in websocket:
+        received_at = time.perf_counter_ns()
+        message = json.loads(raw)
+        message_type = message.get("type")
+
+        if message_type == "ping":
+            await websocket.send('{"type":"pong"}')
+            continue
+        if message_type == "error":
+            results.error(message.get("code") or "ERROR")
+            continue
+
+        sent_at = message.get("sentAt")
+        if sent_at is None:
+            continue
+        results.latencies_ms.append((received_at - sent_at) / 1e6)
+        if message_type == "code_update":
+            results.code_updates_received += 1
+        elif message_type == "problem_change" and problem_change:
+            results.problem_changes_received += 1
+
+
+async def create_session(http: httpx.AsyncClient, index: int) -> str:
+    """Create a session and join it as the candidate, as the web app does"""
+    response = await http.post(
+        "/api/sessions",
+        json={
+            "interviewerName": f"Interviewer {index}",
+            "difficulty": "junior",
+            "language": "python",
+            "numberOfProblems": 1,
+        },
+    )
+    response.raise_for_status()
+    session_id = response.json()["session"]["id"]
+    response = await http.post(
+        f"/api/sessions/{session_id}/join", json={"candidateName": "Candidate"}
+    )
+    response.raise_for_status()
+    return session_id
+
+
+async def run_room(
+    url: str, http: httpx.AsyncClient, index: int, args, results: Results, stop, gate
+):
+    """One interview: an interviewer watching and a candidate typing"""
+    try:
+        async with gate:
+            session_id = await create_session(http, index)
+            base = f"{url}/api/ws/{session_id}"
+            interviewer = await connect(f"{base}?user_name=Interviewer&user_role=interviewer")
+            candidate = await connect(f"{base}?user_name=Candidate&user_role=candidate")
+    except Exception:
+        results.connect_failures += 1
+        return
+
+    tasks = [
+        asyncio.create_task(receive_loop(interviewer, results, problem_change=False)),
+        asyncio.create_task(receive_loop(candidate, results, problem_change=True)),
+    ]
+    code = ""
+    problem = 0
+    next_problem_change = time.monotonic() + random.uniform(0, args.problem_interval)
+    # Spread the rooms over one typing period
+    await asyncio.sleep(random.uniform(0, 1 / args.typing_rate))
+
+    try:
+        while not stop.is_set():
+            code += random.choice("abcdefghij (),:\n")
+            await candidate.send(
+                json.dumps(
+                    {
+                        "type": "code_update",
+                        "problemId": PROBLEM_IDS[problem],
+                        "problemIndex": problem,
+                        "code": code[-args.code_size :],
+                        "sentAt": time.perf_counter_ns(),
+                    }
+                )
+            )
+            results.code_updates_sent += 1
+
+            if time.monotonic() >= next_problem_change:
+                problem = (problem + 1) % len(PROBLEM_IDS)
+                await interviewer.send(
+                    json.dumps(
+                        {
+                            "type": "problem_change",
+                            "problemId": PROBLEM_IDS[problem],
+                            "problemIndex": problem,
+                            "sentAt": time.perf_counter_ns(),
+                        }
+                    )
+                )
+                results.problem_changes_sent += 1
+                next_problem_change = time.monotonic() + args.problem_interval
+
+            await asyncio.sleep(1 / args.typing_rate)
+    except Exception:
+        results.disconnects += 1
+    finally:
+        # Let in-flight messages arrive before closing
+        await asyncio.sleep(1)
+        for task in tasks:
+            task.cancel()
+        await interviewer.close()
+        await candidate.close()
+
+
+def worker_pids(master_pid: int) -> list[int]:
+    """Direct children of a uvicorn master, or the process itself with one worker"""
+    children = []
+    for task in os.listdir(f"/proc/{master_pid}/task"):
+        try:
+            with open(f"/proc/{master_pid}/task/{task}/children") as f:
+                children.extend(int(pid) for pid in f.read().split())
+        except FileNotFoundError:
+            pass
+    return children or [master_pid]
+
+
+def cpu_seconds(pid: int) -> float:
+    """User plus system CPU time of a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class CpuMeter:
+    """CPU time used by server workers (processes or a thread) during the test"""
+
+    def __init__(self, pids: list[int] | None = None, thread_id: int | None = None):
+        self.pids = pids or []
+        self.thread_id = thread_id
+        self.start: dict[str, float] = {}
+
+    def sample(self) -> dict[str, float]:
+        samples = {}
+        for pid in self.pids:
+            try:
+                samples[f"pid {pid}"] = cpu_seconds(pid)
+            except FileNotFoundError:
+                pass
+        if self.thread_id is not None:
+            clock = time.pthread_getcpuclockid(self.thread_id)
+            samples["in-process"] = time.clock_gettime(clock)
+        return samples
+
+    def begin(self):
+        self.start = self.sample()
+
+    def end(self, elapsed: float) -> dict[str, float]:
+        """Percent of one core used per worker since begin()"""
+        return {
+            name: 100 * (value - self.start.get(name, 0)) / elapsed
+            for name, value in self.sample().items()
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def start_in_process_server(port: int) -> threading.Thread:
+    """Run app.main:app under uvicorn in a background thread with its own event loop"""
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, port=port, log_level="warning", ws_ping_interval=None)
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    wait_for_port(port)
+    return thread
+
+
+def start_uvicorn(port: int, workers: int) -> subprocess.Popen:
+    """Spawn a local uvicorn with several workers"""
+    env = dict(os.environ)
+    if workers > 1 and "WS_BROKER" not in env:
+        # Rooms span workers, so broadcasts must cross them
+        env["WS_BROKER"] = "unix"
+        env["WS_BROKER_UNIX_PATH"] = f"/tmp/ws-load-test-{port}.sock"
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+    )
+    wait_for_port(port)
+    # Workers bind after the master; give them a moment to come up
+    time.sleep(1)
+    return process
+
+
+def raise_open_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def report(results: Results, cpu: dict[str, float], args, elapsed: float) -> dict:
+    samples = results.latencies_ms
+    summary = {
+        "sessions": args.sessions,
+        "duration_s": round(elapsed, 1),
+        "messages_received": len(samples),
+        "latency_ms": {
+            "p50": round(percentile(samples, 50), 2),
+            "p95": round(percentile(samples, 95), 2),
+            "p99": round(percentile(samples, 99), 2),
+            "max": round(max(samples, default=0), 2),
+        },
+        "code_updates": {
+            "sent": results.code_updates_sent,
+            "received": results.code_updates_received,
+            "coalesced_or_dropped": results.code_updates_sent - results.code_updates_received,
+        },
+        "problem_changes": {
+            "sent": results.problem_changes_sent,
+            "received": results.problem_changes_received,
+            "dropped": results.problem_changes_sent - results.problem_changes_received,
+        },
+        "errors": results.errors,
+        "connect_failures": results.connect_failures,
+        "disconnects": results.disconnects,
+        "server_cpu_percent": {name: round(value, 1) for name, value in cpu.items()},
+    }
+
+    print(f"\nSessions: {args.sessions} ({2 * args.sessions} sockets), {elapsed:.1f}s")
+    print(
+        "Fan-out latency ms: p50 {p50}  p95 {p95}  p99 {p99}  max {max}".format(
+            **summary["latency_ms"]
+        )
+    )
+    print("Code updates: {sent} sent, {received} received".format(**summary["code_updates"]))
+    print(
+        "Problem changes: {sent} sent, {received} received, {dropped} dropped".format(
+            **summary["problem_changes"]
+        )
+    )
+    print(f"Errors: {results.errors or 'none'}")
+    print(f"Connect failures: {results.connect_failures}, disconnects: {results.disconnects}")
+    for name, value in summary["server_cpu_percent"].items():
+        print(f"Server CPU {name}: {value}% of a core")
+    return summary
+
+
+async def run(args, url: str, meter: CpuMeter) -> dict:
+    results = Results()
+    stop = asyncio.Event()
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    http = httpx.AsyncClient(base_url=url.replace("ws", "http", 1), timeout=30)
+
+    rooms = [
+        asyncio.create_task(run_room(url, http, i, args, results, stop, gate))
+        for i in range(args.sessions)
+    ]
+    # Measure the steady state, not the connection ramp
+    await asyncio.sleep(args.ramp)
+    meter.begin()
+    started = time.monotonic()
+    await asyncio.sleep(args.duration)
+    elapsed = time.monotonic() - started
+    cpu = meter.end(elapsed)
+
+    stop.set()
+    await asyncio.gather(*rooms, return_exceptions=True)
+    await http.aclose()
+    return report(results, cpu, args, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base ws:// URL of a running server")
+    target.add_argument("--spawn-workers", type=int, help="Start a local uvicorn with N workers")
+    parser.add_argument("--server-pid", type=int, help="Master PID of the server at --url")
+    parser.add_argument("--sessions", type=int, default=100, help="Interview rooms to open")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds to connect before measuring")
+    parser.add_argument("--typing-rate", type=float, default=5, help="code_update per second")
+    parser.add_argument("--problem-interval", type=float, default=20, help="Seconds per problem")
+    parser.add_argument("--code-size", type=int, default=2000, help="Max characters of code")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    process = None
+    if args.url:
+        url = args.url.rstrip("/")
+        meter = CpuMeter(worker_pids(args.server_pid) if args.server_pid else [])
+    elif args.spawn_workers:
+        port = free_port()
+        process = start_uvicorn(port, args.spawn_workers)
+        url = f"ws://127.0.0.1:{port}"
+        meter = CpuMeter(worker_pids(process.pid))
+    else:
+        port = free_port()
+        thread = start_in_process_server(port)
+        url = f"ws://127.0.0.1:{port}"
+        meter = CpuMeter(thread_id=thread.ident)
+
+    try:
+        summary = asyncio.run(run(args, url, meter))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
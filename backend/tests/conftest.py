@@ -14,6 +14,8 @@ from sqlalchemy.pool import NullPool
 from app.database import Base, get_db
 from app.main import app
 from app.models import Problem
+from app.websocket import manager
+from app.websocket.journal import Journal
 
 # Test database URL - get from environment or use default
 TEST_DATABASE_URL = os.getenv(
@@ -82,6 +84,24 @@ async def client(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def journal(monkeypatch) -> Journal:
+    """Event journal of the connection manager, with blocks kept in memory"""
+    blocks = []
+
+    async def save(new_blocks):
+        blocks.extend(new_blocks)
+
+    async def load(session_id):
+        for block in sorted(blocks, key=lambda block: block.started_at):
+            if block.session_id == session_id:
+                yield block
+
+    journal = Journal(save, load, interval=0)
+    monkeypatch.setattr(manager, "journal", journal)
+    return journal
+
+
 @pytest_asyncio.fixture
 async def sample_problems(db_session):
     """Get sample problems from database (seeded by migrations)"""
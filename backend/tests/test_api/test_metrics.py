@@ -0,0 +1,26 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_metrics_cover_routes_websockets_and_pool(client: AsyncClient):
+    """Test that /metrics reports request latency by router and the WebSocket gauges"""
+    response = await client.get("/api/problems")
+    assert response.status_code == 200
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/problems",'
+        'router="problems",status="200"}' in body
+    )
+    assert "ws_connections " in body
+    assert 'ws_outbound_messages_total{event="sent"}' in body
+    assert "db_pool_checkout_seconds_bucket" in body
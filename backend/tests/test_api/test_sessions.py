@@ -2,8 +2,14 @@
 Tests for sessions API endpoints
 """
 
+import json
+
 import pytest
 
+from app import execution
+from app.schemas import ResourceUsage
+from app.services import sessions as sessions_service
+
 
 @pytest.mark.asyncio
 async def test_create_session(client, sample_problems):
@@ -161,7 +167,7 @@ async def test_join_session_not_found(client):
 
 
 @pytest.mark.asyncio
-async def test_end_session(client, sample_problems):
+async def test_end_session(client, sample_problems, journal):
     """Test ending a session"""
     # Create a session
     create_response = await client.post(
@@ -193,3 +199,102 @@ async def test_end_session_not_found(client):
     """Test ending non-existent session"""
     response = await client.post("/api/sessions/nonexistent_id/end")
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_replay_session(client, sample_problems, journal):
+    """Test streaming the recorded events of a session"""
+    create_response = await client.post(
+        "/api/sessions",
+        json={
+            "interviewerName": "John Doe",
+            "difficulty": "junior",
+            "language": "python",
+            "numberOfProblems": 1,
+        },
+    )
+    session_id = create_response.json()["session"]["id"]
+
+    journal.record(session_id, {"type": "user_joined", "userName": "Jane", "role": "candidate"})
+    journal.record_code(session_id, 1, "x = 1")
+    journal.record_code(session_id, 1, "x = 10")
+    await client.post(f"/api/sessions/{session_id}/end")
+
+    response = await client.get(f"/api/sessions/{session_id}/replay?speed=max")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["type"] for event in events] == [
+        "user_joined",
+        "code_update",
+        "code_delta",
+        "session_ended",
+    ]
+    assert events[2]["ops"] == [{"start": 5, "end": 5, "text": "0"}]
+
+
+@pytest.mark.asyncio
+async def test_replay_session_not_found(client):
+    """Test replaying non-existent session"""
+    response = await client.get("/api/sessions/nonexistent_id/replay")
+    assert response.status_code == 404
+
+    response = await client.get("/api/sessions/nonexistent_id/replay?speed=2")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_session_runs(client, db_session, sample_problems):
+    """Test listing the resource usage of a session's runs"""
+    create_response = await client.post(
+        "/api/sessions",
+        json={
+            "interviewerName": "John Doe",
+            "difficulty": "junior",
+            "language": "python",
+            "numberOfProblems": 1,
+        },
+    )
+    session_id = create_response.json()["session"]["id"]
+
+    async def save(run):
+        await sessions_service.save_run(db_session, run)
+
+    runs = execution.RunLog(save)
+    await runs.record(
+        session_id,
+        1,
+        "run",
+        True,
+        ResourceUsage(
+            exitReason="completed",
+            wallMs=12.5,
+            cpuUserMs=10.0,
+            cpuSystemMs=2.0,
+            peakRssBytes=20 * 1024**2,
+        ),
+        queued_ms=0.5,
+    )
+    await runs.record(
+        session_id, 1, "profile", False, ResourceUsage(exitReason="timeout", wallMs=1000.0)
+    )
+    await db_session.commit()
+
+    response = await client.get(f"/api/sessions/{session_id}/runs")
+    assert response.status_code == 200
+    data = response.json()["runs"]
+    assert [(run["kind"], run["success"], run["usage"]["exitReason"]) for run in data] == [
+        ("run", True, "completed"),
+        ("profile", False, "timeout"),
+    ]
+    assert data[0]["queuedMs"] == 0.5
+    assert data[0]["usage"]["peakRssBytes"] == 20 * 1024**2
+    assert data[1]["usage"]["cpuUserMs"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_session_runs_not_found(client):
+    """Test listing runs of non-existent session"""
+    response = await client.get("/api/sessions/nonexistent_id/runs")
+    assert response.status_code == 404
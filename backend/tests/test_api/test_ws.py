@@ -0,0 +1,457 @@
+"""
+Tests for the session WebSocket endpoint
+"""
+
+import json
+import time
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from app import execution
+from app.main import app
+from app.websocket import manager
+from app.websocket.persistence import CodeWriteBehind
+from app.websocket.sessions import SessionAccess, SessionCache
+
+
+async def load_test_session(session_id: str) -> SessionAccess | None:
+    """Sessions named sess_ws_* are active, sess_ended_* ended, others unknown"""
+    if session_id.startswith("sess_ws_"):
+        return SessionAccess.of("active")
+    if session_id.startswith("sess_ended_"):
+        return SessionAccess.of("ended")
+    return None
+
+
+class SavedCode:
+    """In-memory stand-in for the session_code table"""
+
+    def __init__(self):
+        self.rows: dict[tuple[str, int], str] = {}
+
+    async def save(self, rows):
+        self.rows.update({(session_id, problem_id): code for session_id, problem_id, code in rows})
+
+    async def load(self, session_id):
+        return {pid: code for (sid, pid), code in self.rows.items() if sid == session_id}
+
+
+@pytest.fixture
+def saved_code(monkeypatch) -> SavedCode:
+    """Code saved by the write-behind buffer, kept in memory"""
+    saved = SavedCode()
+    monkeypatch.setattr(manager, "code_writer", CodeWriteBehind(saved.save, saved.load, interval=0))
+    return saved
+
+
+async def load_test_suite(problem_id: int) -> execution.TestSuite | None:
+    """Problem 1 adds two numbers"""
+    if problem_id != 1:
+        return None
+    cases = [{"input": [5, 3], "expected": 8}, {"input": [0, 0], "expected": 1}]
+    generator = "SIZES = [10, 20, 30]\n\n\ndef generate(n):\n    return [n, n]\n"
+    return execution.TestSuite("sum_two_numbers", cases, generator)
+
+
+@pytest.fixture
+def recorded_runs(monkeypatch) -> list[dict]:
+    """Runs recorded with their sessions, kept in memory"""
+    recorded: list[dict] = []
+
+    async def save(run):
+        recorded.append(run)
+
+    monkeypatch.setattr(execution, "runs", execution.RunLog(save))
+    return recorded
+
+
+@pytest.fixture
+def ws_client(monkeypatch, saved_code, journal, recorded_runs):
+    """Test client whose sockets share one event loop"""
+    monkeypatch.setattr(manager, "sessions", SessionCache(load_test_session))
+    monkeypatch.setattr(execution, "suites", execution.TestSuites(load_test_suite))
+    monkeypatch.setattr(execution, "cache", execution.ResultCache())
+    with TestClient(app) as client:
+        yield client
+
+
+def connect(client: TestClient, session_id: str, name: str, role: str):
+    """Open a session socket and consume the connection status"""
+    websocket = client.websocket_connect(f"/api/ws/{session_id}?user_name={name}&user_role={role}")
+    websocket.__enter__()
+    assert websocket.receive_json()["type"] == "connection_status"
+    return websocket
+
+
+def test_code_update_is_relayed_with_version(ws_client):
+    """Test that full-text updates carry a version and only their declared fields"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_full", "John Doe", "interviewer")
+    candidate = connect(client, "sess_ws_full", "Jane Smith", "candidate")
+    assert interviewer.receive_json()["type"] == "user_joined"
+
+    candidate.send_json(
+        {
+            "type": "code_update",
+            "problemId": 1,
+            "code": "x = 1",
+            "problemIndex": 0,
+            "sentAt": 12,
+            "script": "<img onerror=alert(1)>",
+        }
+    )
+
+    assert interviewer.receive_json() == {
+        "type": "code_update",
+        "problemId": 1,
+        "code": "x = 1",
+        "problemIndex": 0,
+        "sentAt": 12,
+        "version": 1,
+        "seq": 3,
+    }
+
+    candidate.__exit__(None, None, None)
+    interviewer.__exit__(None, None, None)
+
+
+def test_code_delta_round_trip(ws_client):
+    """Test that deltas are applied, acked and relayed, and stale ones resynced"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_delta", "John Doe", "interviewer")
+    candidate = connect(client, "sess_ws_delta", "Jane Smith", "candidate")
+    assert interviewer.receive_json()["type"] == "user_joined"
+
+    candidate.send_json({"type": "code_update", "problemId": 1, "code": "abc", "baseVersion": 0})
+    assert candidate.receive_json() == {"type": "code_ack", "problemId": 1, "version": 1}
+    interviewer.receive_json()
+
+    ops = [{"start": 3, "end": 3, "text": "d"}]
+    candidate.send_json({"type": "code_delta", "problemId": 1, "baseVersion": 1, "ops": ops})
+    assert candidate.receive_json() == {"type": "code_ack", "problemId": 1, "version": 2}
+
+    relayed = interviewer.receive_json()
+    assert relayed["type"] == "code_delta"
+    assert (relayed["baseVersion"], relayed["version"], relayed["ops"]) == (1, 2, ops)
+
+    # Edits against an old version get the full text back instead
+    candidate.send_json({"type": "code_delta", "problemId": 1, "baseVersion": 1, "ops": ops})
+    assert candidate.receive_json() == {
+        "type": "code_resync",
+        "problemId": 1,
+        "version": 2,
+        "code": "abcd",
+    }
+
+    candidate.__exit__(None, None, None)
+    interviewer.__exit__(None, None, None)
+
+
+def test_joining_client_gets_snapshot(ws_client):
+    """Test that a client joining mid-session receives the current state"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_snapshot", "John Doe", "interviewer")
+    interviewer.send_json({"type": "problem_change", "problemId": 2, "problemIndex": 1})
+
+    candidate = client.websocket_connect("/api/ws/sess_ws_snapshot?user_role=candidate")
+    candidate.__enter__()
+    status = candidate.receive_json()
+    assert status["snapshot"] == {
+        "activeProblemId": 2,
+        "activeProblemIndex": 1,
+        "documents": [],
+    }
+
+    candidate.send_json({"type": "code_update", "problemId": 2, "code": "y = 2"})
+    assert interviewer.receive_json()["type"] == "code_update"
+
+    late = client.websocket_connect("/api/ws/sess_ws_snapshot?user_role=candidate")
+    late.__enter__()
+    assert late.receive_json()["snapshot"]["documents"] == [
+        {"problemId": 2, "code": "y = 2", "version": 1, "stale": False}
+    ]
+
+    late.__exit__(None, None, None)
+    candidate.__exit__(None, None, None)
+    interviewer.__exit__(None, None, None)
+
+
+def test_reconnect_resumes_from_last_seq(ws_client):
+    """Test that a reconnecting client gets only the broadcasts it missed"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_resume", "John Doe", "interviewer")
+    candidate = client.websocket_connect("/api/ws/sess_ws_resume?user_role=candidate")
+    candidate.__enter__()
+    status = candidate.receive_json()
+
+    interviewer.send_json({"type": "problem_change", "problemId": 1, "problemIndex": 0})
+    last_seq = candidate.receive_json()["seq"]
+    candidate.__exit__(None, None, None)
+
+    # Broadcast while the candidate is away
+    interviewer.send_json({"type": "problem_change", "problemId": 2, "problemIndex": 1})
+
+    resumed = client.websocket_connect(
+        f"/api/ws/sess_ws_resume?user_role=candidate&epoch={status['epoch']}&last_seq={last_seq}"
+    )
+    resumed.__enter__()
+    status = resumed.receive_json()
+    assert status["resumed"] is True
+    assert status["snapshot"] is None
+    missed = resumed.receive_json()
+    assert (missed["problemId"], missed["seq"]) == (2, last_seq + 1)
+
+    # Unknown epoch falls back to a snapshot
+    fresh = client.websocket_connect(
+        "/api/ws/sess_ws_resume?user_role=candidate&epoch=gone&last_seq=1"
+    )
+    fresh.__enter__()
+    status = fresh.receive_json()
+    assert status["resumed"] is False
+    assert status["snapshot"]["activeProblemId"] == 2
+
+    fresh.__exit__(None, None, None)
+    resumed.__exit__(None, None, None)
+    interviewer.__exit__(None, None, None)
+
+
+def test_invalid_messages_get_errors(ws_client):
+    """Test that rejected frames are answered with an error and the socket stays open"""
+    websocket = connect(ws_client, "sess_ws_invalid", "John Doe", "interviewer")
+
+    websocket.send_text('{"type": "launch_rockets"}')
+    assert websocket.receive_json()["code"] == "UNKNOWN_MESSAGE_TYPE"
+
+    websocket.send_json({"type": "problem_change", "problemId": 1, "pad": "x" * 10_000})
+    assert websocket.receive_json()["code"] == "MESSAGE_TOO_LARGE"
+
+    websocket.send_json({"type": "pong"})
+    websocket.send_json({"type": "code_resync_request", "problemId": 3})
+    assert websocket.receive_json() == {
+        "type": "code_resync",
+        "problemId": 3,
+        "version": 0,
+        "code": None,
+    }
+
+    websocket.__exit__(None, None, None)
+
+
+def test_flooding_client_is_throttled_then_disconnected(ws_client):
+    """Test that over-limit messages get errors and persistent flooding closes the socket"""
+    websocket = connect(ws_client, "sess_ws_flood", "Jane Smith", "candidate")
+
+    codes = []
+    code = "import time\ntime.sleep(0.3)"
+    for _ in range(5):
+        websocket.send_json({"type": "run_code", "problemId": 1, "code": code})
+    for _ in range(4):
+        message = websocket.receive_json()
+        codes.append(message.get("code") if message["type"] == "error" else message["type"])
+
+    # Runs finish in the background, after the rejections; the third request
+    # replaced the second while the first was running
+    assert sorted(codes) == ["RATE_LIMITED"] * 2 + ["code_result"] * 2
+
+    for _ in range(20):
+        websocket.send_json({"type": "run_code", "problemId": 1, "code": "1"})
+    with pytest.raises(WebSocketDisconnect) as e:
+        while True:
+            websocket.receive_json()
+    assert e.value.code == 1008
+
+    websocket.__exit__(None, None, None)
+
+
+def test_rate_limit_charges_the_validated_type(ws_client):
+    """Test that a nested "type" key does not move a message to another budget"""
+    websocket = connect(ws_client, "sess_ws_nested", "Jane Smith", "candidate")
+
+    code = "import time\ntime.sleep(0.3)"
+    frame = json.dumps({"m": {"type": "pong"}, "type": "run_code", "problemId": 1, "code": code})
+    for _ in range(5):
+        websocket.send_text(frame)
+    codes = []
+    for _ in range(4):
+        message = websocket.receive_json()
+        codes.append(message.get("code") if message["type"] == "error" else message["type"])
+    assert sorted(codes) == ["RATE_LIMITED"] * 2 + ["code_result"] * 2
+
+    websocket.__exit__(None, None, None)
+
+
+def test_run_code_result_is_shared_with_the_session(ws_client, recorded_runs):
+    """Test that code runs on the server and both participants get the result"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_run", "John Doe", "interviewer")
+    candidate = connect(client, "sess_ws_run", "Jane Smith", "candidate")
+    assert interviewer.receive_json()["type"] == "user_joined"
+
+    code = "import time\nprint(sum([5, 3]))\ntime.sleep(0.3)\nprint('done')"
+    candidate.send_json({"type": "run_code", "problemId": 1, "code": code})
+
+    for websocket in (candidate, interviewer):
+        # Output arrives while the code runs, then the summary
+        chunks = [websocket.receive_json() for _ in range(2)]
+        assert [(chunk["type"], chunk["output"]) for chunk in chunks] == [
+            ("code_output", "8\n"),
+            ("code_output", "done\n"),
+        ]
+        result = websocket.receive_json()
+        assert result["type"] == "code_result"
+        assert (result["success"], result["output"], result["error"]) == (True, "8\ndone\n", None)
+        assert result["runMs"] >= 300
+        assert result["usage"]["exitReason"] == "completed"
+        assert result["usage"]["wallMs"] >= 300
+
+        assert not result["cached"]
+
+    # The same code again is answered from the cache, without usage of its own
+    candidate.send_json({"type": "run_code", "problemId": 1, "code": code})
+    for websocket in (candidate, interviewer):
+        result = websocket.receive_json()
+        assert (result["type"], result["output"]) == ("code_result", "8\ndone\n")
+        assert result["cached"] and result["usage"] is None
+
+    # Recorded once, whoever got the result
+    assert [(run["session_id"], run["kind"], run["exit_reason"]) for run in recorded_runs] == [
+        ("sess_ws_run", "run", "completed")
+    ]
+
+    interviewer.__exit__(None, None, None)
+    candidate.__exit__(None, None, None)
+
+
+def test_failed_run_still_ends_with_a_result(ws_client, monkeypatch):
+    """Test that a run the sandbox could not finish is shared as a failed result"""
+
+    class BrokenPool:
+        async def run(self, code, **kwargs):
+            raise RuntimeError("no sandbox")
+
+    monkeypatch.setattr(execution, "pool", BrokenPool())
+    candidate = connect(ws_client, "sess_ws_broken", "Jane Smith", "candidate")
+
+    candidate.send_json({"type": "run_code", "problemId": 1, "code": "print(1)"})
+    result = candidate.receive_json()
+    assert result["type"] == "code_result"
+    assert (result["success"], result["error"]) == (False, "Run failed on the server")
+
+    candidate.__exit__(None, None, None)
+
+
+def test_test_case_results_stream_before_the_summary(ws_client):
+    """Test that each test case result is shared as it finishes, then the summary"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_tests", "John Doe", "interviewer")
+    candidate = connect(client, "sess_ws_tests", "Jane Smith", "candidate")
+    assert interviewer.receive_json()["type"] == "user_joined"
+
+    code = "def sum_two_numbers(a, b):\n    return a + b"
+    candidate.send_json({"type": "run_code", "problemId": 1, "code": code, "runTests": True})
+
+    for websocket in (candidate, interviewer):
+        cases = [websocket.receive_json() for _ in range(2)]
+        assert [case["type"] for case in cases] == ["test_case_result"] * 2
+        assert [(case["index"], case["passed"], case["actual"]) for case in cases] == [
+            (0, True, "8"),
+            (1, False, "0"),
+        ]
+        result = websocket.receive_json()
+        assert (result["type"], result["success"]) == ("code_result", False)
+        assert result["testResults"] == [
+            {key: value for key, value in case.items() if key not in ("type", "problemId", "seq")}
+            for case in cases
+        ]
+
+    interviewer.__exit__(None, None, None)
+    candidate.__exit__(None, None, None)
+
+
+def test_profile_goes_to_the_interviewer_only(ws_client):
+    """Test that interviewers can profile code and candidates cannot"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_profile", "John Doe", "interviewer")
+    candidate = connect(client, "sess_ws_profile", "Jane Smith", "candidate")
+    assert interviewer.receive_json()["type"] == "user_joined"
+
+    code = "def sum_two_numbers(a, b):\n    return a + b"
+    candidate.send_json({"type": "profile_code", "problemId": 1, "code": code})
+    assert candidate.receive_json()["code"] == "FORBIDDEN"
+
+    interviewer.send_json({"type": "profile_code", "problemId": 2, "code": code})
+    assert interviewer.receive_json()["code"] == "PROFILE_UNAVAILABLE"
+
+    interviewer.send_json({"type": "profile_code", "problemId": 1, "code": code})
+    result = interviewer.receive_json()
+    assert (result["type"], result["success"]) == ("profile_result", True)
+    assert [point["size"] for point in result["points"]] == [10, 20, 30]
+    assert result["timeComplexity"] == "O(1)"
+
+    interviewer.__exit__(None, None, None)
+    candidate.__exit__(None, None, None)
+
+
+def test_presence_is_tagged_with_sender(ws_client):
+    """Test that presence is relayed with the sender's identity and without a seq"""
+    client = ws_client
+    interviewer = connect(client, "sess_ws_presence", "John Doe", "interviewer")
+    candidate = connect(client, "sess_ws_presence", "Jane Smith", "candidate")
+    assert interviewer.receive_json()["type"] == "user_joined"
+
+    selection = {"start": {"line": 1, "column": 1}, "end": {"line": 2, "column": 4}}
+    candidate.send_json(
+        {
+            "type": "presence",
+            "problemId": 1,
+            "cursor": {"line": 2, "column": 4},
+            "selections": [selection],
+            "userName": "Someone Else",
+        }
+    )
+
+    relayed = interviewer.receive_json()
+    assert relayed["type"] == "presence"
+    assert (relayed["userName"], relayed["role"]) == ("Jane Smith", "candidate")
+    assert relayed["cursor"] == {"line": 2, "column": 4}
+    assert relayed["selections"] == [selection]
+    assert relayed["clientId"] and "seq" not in relayed
+
+    candidate.__exit__(None, None, None)
+    interviewer.__exit__(None, None, None)
+
+
+@pytest.mark.parametrize("session_id", ["sess_missing", "sess_ended_1"])
+def test_connect_to_unknown_or_ended_session_is_refused(ws_client, session_id):
+    """Test that connects are refused before joining a room"""
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        connect(ws_client, session_id, "John Doe", "interviewer")
+
+    assert exc_info.value.code == 1008
+    assert manager.get_session_connection_count(session_id) == 0
+
+
+def test_code_is_saved_and_restored(ws_client, saved_code):
+    """Test that code outlives the room and seeds the next one"""
+    client = ws_client
+    candidate = connect(client, "sess_ws_saved", "Jane Smith", "candidate")
+    candidate.send_json({"type": "code_update", "problemId": 1, "code": "x = 1", "baseVersion": 0})
+    assert candidate.receive_json()["type"] == "code_ack"
+    candidate.__exit__(None, None, None)
+    while "sess_ws_saved" in manager.rooms:
+        time.sleep(0.01)
+    assert manager.documents.get("sess_ws_saved", 1) is None
+
+    # Written by the end of session or shutdown flush; flushed here directly
+    client.portal.call(manager.code_writer.flush)
+    assert saved_code.rows == {("sess_ws_saved", 1): "x = 1"}
+
+    interviewer = client.websocket_connect("/api/ws/sess_ws_saved?user_role=interviewer")
+    interviewer.__enter__()
+    status = interviewer.receive_json()
+    assert status["snapshot"]["documents"] == [
+        {"problemId": 1, "code": "x = 1", "version": 1, "stale": False}
+    ]
+    interviewer.__exit__(None, None, None)
@@ -0,0 +1,75 @@
+"""
+Tests for the execution result cache
+"""
+
+from app.execution import ResultCache, SandboxFailure
+from app.schemas.execution import ExecutionResult
+
+CODE = "def f(x):\n    return x * 2  # double\n\nprint(f(4))\n"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def result(output: str = "8\n", error: str | None = None) -> ExecutionResult:
+    return ExecutionResult(success=error is None, output=output, error=error)
+
+
+def test_reformatted_code_hits_and_moved_lines_miss():
+    """Test that comments and spacing are ignored but line numbers are not"""
+    cache = ResultCache()
+    cache.put(cache.key(1, "v1", CODE), result())
+
+    reformatted = "def f( x ):\n    return x*2\n\nprint(f(4))  # eight\n"
+    assert cache.get(cache.key(1, "v1", reformatted)) == result()
+    assert cache.get(cache.key(1, "v1", CODE)) == result()
+
+    assert cache.get(cache.key(1, "v1", "\n" + CODE)) is None
+    assert cache.get(cache.key(2, "v1", CODE)) is None
+    assert cache.get(cache.key(1, "v2", CODE)) is None
+    assert cache.get_stats()["hit_rate"] == 0.4
+
+
+def test_entries_expire_and_are_evicted():
+    """Test TTL expiry, LRU eviction and the byte budget"""
+    clock = FakeClock()
+    cache = ResultCache(max_entries=2, max_bytes=4096, ttl=60, clock=clock)
+    a, b, c = (cache.key(1, "", f"print({n})") for n in range(3))
+
+    cache.put(a, result())
+    cache.put(b, result())
+    cache.get(a)
+    cache.put(c, result())
+    assert cache.get(b) is None
+    assert cache.get(a) is not None
+
+    clock.now = 61
+    assert cache.get(a) is None
+    assert cache.get(c) is None
+
+    cache.put(a, result("x" * 5000))
+    assert cache.get(a) is None
+    cache.put(a, result("x" * 3000))
+    cache.put(b, result("x" * 1000))
+    assert cache.get(a) is None
+    assert cache.get_stats()["bytes"] <= 4096
+
+
+def test_failures_that_do_not_depend_on_the_code_are_not_cached():
+    """Test that sandbox failures and syntax errors are not remembered"""
+    cache = ResultCache()
+    key = cache.key(1, "", "while True: pass")
+
+    cache.put(key, SandboxFailure(success=False, output="", error="Timed out after 5s"))
+    assert cache.get(key) is None
+
+    cache.put(key, result("", '  File "<solution>", line 1\nSyntaxError: invalid syntax\n'))
+    assert cache.get(key) is None
+
+    cache.put(key, result("", "Traceback (most recent call last):\nValueError: bad\n"))
+    assert cache.get(key) is not None
@@ -0,0 +1,32 @@
+"""
+Tests for growth class estimation
+"""
+
+import math
+
+from app.execution.complexity import estimate
+
+SIZES = [64, 128, 256, 512, 1024, 2048, 4096]
+
+
+def test_estimate_picks_the_growth_class():
+    """Test that noisy measurements are matched to the class they grow like"""
+    noise = [1.1, 0.9, 1.05, 0.95, 1.0, 1.08, 0.93]
+    shapes = {
+        "O(1)": lambda n: 5.0,
+        "O(n)": lambda n: 0.01 * n,
+        "O(n log n)": lambda n: 0.01 * n * math.log(n),
+        "O(n^2)": lambda n: 1e-4 * n * n,
+    }
+    for expected, shape in shapes.items():
+        points = [(n, shape(n) * k) for n, k in zip(SIZES, noise, strict=True)]
+        assert estimate(points) == expected
+
+    exponential = [(n, 2.0**n * 1e-6) for n in range(10, 25, 2)]
+    assert estimate(exponential) == "O(2^n)"
+
+
+def test_estimate_needs_enough_sizes():
+    """Test that two sizes are not enough to fit a class"""
+    assert estimate([(10, 1.0), (20, 2.0)]) is None
+    assert estimate([(10, 1.0), (10, 1.1), (20, 2.0)]) is None
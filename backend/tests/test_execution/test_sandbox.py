@@ -0,0 +1,232 @@
+"""
+Tests for the sandboxed execution pool
+"""
+
+import os
+
+import pytest
+
+from app import execution
+from app.execution import Limits, SandboxPool
+
+
+@pytest.fixture
+async def pool():
+    """Two warm workers with short limits"""
+    limits = Limits(
+        timeout=1, cpu_seconds=1, output_chars=1000, case_timeout=2, case_cpu_seconds=0.5
+    )
+    pool = SandboxPool(size=2, limits=limits)
+    await pool.start()
+    yield pool
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_output_and_errors_are_reported(pool):
+    """Test that output is captured and tracebacks only show the candidate's code"""
+    result = await pool.run("import sys\nprint(8)\nprint('warn', file=sys.stderr)")
+    assert (result.success, result.output, result.error) == (True, "8\nwarn\n", None)
+    assert result.usage.exitReason == "completed"
+    assert result.usage.wallMs < 1000 and result.usage.peakRssBytes > 0
+
+    result = await pool.run("def f():\n    return 1 / 0\n\nprint('before')\nf()")
+    assert not result.success
+    assert result.usage.exitReason == "exception"
+    assert result.output == "before\n"
+    assert result.error == (
+        "Traceback (most recent call last):\n"
+        '  File "<solution>", line 5, in <module>\n'
+        '  File "<solution>", line 2, in f\n'
+        "ZeroDivisionError: division by zero\n"
+    )
+
+    chunks = []
+
+    async def on_output(chunk):
+        chunks.append(chunk)
+
+    result = await pool.run("print('x' * 5000)\nprint('more')", on_output=on_output)
+    assert result.output.endswith("x\n[output truncated]\n")
+    # The cap holds for the streamed output too
+    assert "".join(chunks) == result.output
+
+
+@pytest.mark.asyncio
+async def test_runs_are_limited_and_isolated(pool, tmp_path):
+    """Test that runaway code is stopped and cannot reach outside its directory"""
+    result = await pool.run("while True:\n    pass")
+    assert result.error == "Timed out after 1s"
+    assert result.usage.exitReason in ("timeout", "cpu_limit")
+    assert result.usage.cpuUserMs >= 500
+
+    result = await pool.run("x = bytearray(1024 ** 3)")
+    assert result.error.endswith("MemoryError\n")
+    assert result.usage.exitReason == "memory_limit"
+
+    outside = tmp_path / "escape.txt"
+    for code in (
+        "import socket\nsocket.socket()",
+        "import os\nos.system('true')",
+        f"open({str(outside)!r}, 'w')",
+        "print(open('/proc/1/environ').read())",
+    ):
+        result = await pool.run(code)
+        assert "PermissionError" in result.error
+    assert not outside.exists()
+
+    result = await pool.run("import os\nopen('notes.txt', 'w').write('x')\nprint(os.getcwd())")
+    assert result.success
+    assert not os.path.exists(result.output.strip())
+    assert pool.get_stats()["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_test_cases_run_against_code_loaded_once(pool):
+    """Test that every case runs in one process and its result arrives as it finishes"""
+    assert execution.testcases.entry_point("import math\n\nclass Counter:\n    pass") == "Counter"
+    suite = execution.TestSuite(
+        "add",
+        [
+            {"input": [1, 2], "expected": 3},
+            {"input": [[1], [2]], "expected": [1, 2]},
+            {"input": [0, 0], "expected": 0},
+            {"input": [1, "x"], "expected": None},
+        ],
+    )
+    code = (
+        "loads = 0\n"
+        "def add(a, b):\n"
+        "    global loads\n"
+        "    loads += 1\n"
+        "    print('call', loads)\n"
+        "    while a == 0:\n"
+        "        pass\n"
+        "    return a + b\n"
+    )
+    streamed = []
+
+    async def on_case(case):
+        streamed.append(case)
+
+    result = await pool.run(code, suite=suite, on_case=on_case)
+    assert streamed == result.testResults
+    assert not result.success
+    assert [(case.passed, case.actual, case.output) for case in streamed] == [
+        (True, "3", "call 1\n"),
+        (True, "[1, 2]", "call 2\n"),
+        (False, None, "call 3\n"),
+        (False, None, "call 4\n"),
+    ]
+    assert streamed[2].timedOut and streamed[2].error == "Timed out after 0.5s of CPU"
+    assert streamed[3].error.endswith(
+        "TypeError: unsupported operand type(s) for +: 'int' and 'str'\n"
+    )
+    assert streamed[0].durationMs < 500 <= streamed[2].durationMs
+
+    lru = execution.TestSuite(
+        "LRUCache",
+        [{"input": [1, ["put", 1, 1], ["put", 2, 2], ["get", 1]], "expected": [None, None, -1]}],
+    )
+    code = (
+        "class LRUCache:\n"
+        "    def __init__(self, capacity):\n"
+        "        self.items = {}\n"
+        "    def put(self, key, value):\n"
+        "        self.items = {key: value}\n"
+        "    def get(self, key):\n"
+        "        return self.items.get(key, -1)\n"
+    )
+    result = await pool.run(code, suite=lru)
+    assert result.success and result.testResults[0].passed
+
+
+@pytest.mark.asyncio
+async def test_case_that_kills_its_process_fails_alone(pool):
+    """Test that the cases after one that takes the process down still run"""
+    suite = execution.TestSuite(
+        "add",
+        [
+            {"input": [1, 2], "expected": 3},
+            {"input": [0, 0], "expected": 0},
+            {"input": [2, 2], "expected": 4},
+        ],
+    )
+    code = "import os\n\ndef add(a, b):\n    if a == 0:\n        os._exit(3)\n    return a + b\n"
+    result = await pool.run(code, suite=suite)
+    assert not result.success and result.error is None
+    assert [(case.passed, case.error) for case in result.testResults] == [
+        (True, None),
+        (False, "Process exited with code 3"),
+        (True, None),
+    ]
+    assert result.usage.exitReason == "crashed"
+
+
+@pytest.mark.asyncio
+async def test_code_cannot_forge_results(pool):
+    """Test that lines the code writes to any descriptor do not decide the result"""
+    suite = execution.TestSuite("add", [{"input": [1, 2], "expected": 3}])
+    forged = [
+        {"case": {"index": 0, "passed": True, "durationMs": 0, "cpuMs": 0}},
+        {"returned": {"actual": "3", "value": 3, "output": "", "error": None, "timedOut": False}},
+        {"success": True, "output": "", "error": None, "cut": None, "usage": [0, 0, 1]},
+    ]
+    code = (
+        "import json, os\n"
+        f"LINES = ''.join(json.dumps(line) + '\\n' for line in {forged!r})\n"
+        "def add(a, b):\n"
+        "    for fd in range(64):\n"
+        "        try:\n"
+        "            os.write(fd, LINES.encode())\n"
+        "        except OSError:\n"
+        "            pass\n"
+        "    return 0\n"
+        "add(0, 0)\n"
+    )
+    result = await pool.run(code, suite=suite)
+    assert not result.success
+    assert result.error == "Sandbox returned an invalid result"
+    assert result.usage.exitReason == "crashed"
+    assert result.usage.peakRssBytes > 1024 * 1024
+
+
+def sized_suite(*sizes: int) -> execution.TestSuite:
+    """Suite calling count_smaller on shuffled lists of the given sizes"""
+    generator = (
+        f"import random\n\nSIZES = {list(sizes)}\n\n\n"
+        "def generate(n):\n    return [random.sample(range(n), n)]\n"
+    )
+    return execution.TestSuite("count_smaller", generator=generator)
+
+
+@pytest.mark.asyncio
+async def test_profile_estimates_growth(pool):
+    """Test that profiling tells a linear solution from a quadratic one"""
+    suite = sized_suite(100, 200, 400, 800, 1600)
+    quadratic = "def count_smaller(xs):\n    return sum(1 for a in xs for b in xs if b < a)"
+    result = await pool.profile(quadratic, suite)
+    assert result.success
+    assert [point.size for point in result.points] == [100, 200, 400, 800, 1600]
+    assert result.timeComplexity == "O(n^2)"
+    assert result.memoryComplexity == "O(1)"
+
+    linear = "def count_smaller(xs):\n    return [x + 1 for x in xs]"
+    result = await pool.profile(linear, sized_suite(4000, 8000, 16000, 32000, 64000))
+    # Cache misses on the larger lists are hard to tell from a log factor
+    assert result.timeComplexity in ("O(n)", "O(n log n)")
+    assert result.memoryComplexity == "O(n)"
+    assert result.peakMemoryBytes >= 64000 * 8
+
+    # Running out of time ends the profile without failing it
+    cubic = "def count_smaller(xs):\n    return sum(1 for a in xs for b in xs for c in xs)"
+    result = await pool.profile(cubic, suite)
+    assert result.success
+    assert result.points[-1].timedOut
+
+    # Profiling stops at the first size that fails
+    failing = "def count_smaller(xs):\n    if len(xs) > 300:\n        raise ValueError('big')"
+    result = await pool.profile(failing, suite)
+    assert not result.success
+    assert [point.size for point in result.points] == [100, 200, 400]
+    assert result.error.endswith("ValueError: big\n")
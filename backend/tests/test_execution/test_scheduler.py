@@ -0,0 +1,66 @@
+"""
+Tests for the fair run scheduler
+"""
+
+import asyncio
+
+import pytest
+
+from app.execution import Scheduler
+
+
+class Recorder:
+    """Work that records which runs executed, in order"""
+
+    def __init__(self):
+        self.ran: list[str] = []
+
+    def work(self, name: str, fail: bool = False):
+        async def run(job):
+            await asyncio.sleep(0.01)
+            self.ran.append(name)
+            if fail:
+                raise RuntimeError(name)
+
+        return run
+
+
+async def drain(scheduler: Scheduler):
+    while scheduler.running:
+        await asyncio.gather(*scheduler.running.values())
+
+
+@pytest.mark.asyncio
+async def test_sessions_take_turns_and_interviewers_go_first():
+    """Test round-robin order, coalescing within a session and interviewer priority"""
+    scheduler = Scheduler(limit=1)
+    recorder = Recorder()
+
+    scheduler.submit("a", "candidate-a", "candidate", recorder.work("a1"))
+    scheduler.submit("a", "candidate-a", "candidate", recorder.work("a2"))
+    scheduler.submit("a", "candidate-a", "candidate", recorder.work("a3"))
+    scheduler.submit("b", "candidate-b", "candidate", recorder.work("b1"))
+    scheduler.submit("c", "interviewer-c", "interviewer", recorder.work("c1"))
+    assert scheduler.get_stats()["waiting"] == 3
+
+    await drain(scheduler)
+    assert recorder.ran == ["a1", "c1", "b1", "a3"]
+    assert scheduler.get_stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_runs_are_dropped_with_their_socket():
+    """Test that a disconnect drops queued runs and a failed run frees its slot"""
+    scheduler = Scheduler(limit=1)
+    recorder = Recorder()
+
+    first = scheduler.submit("a", "socket-a", "candidate", recorder.work("a1", fail=True))
+    scheduler.submit("b", "socket-b", "candidate", recorder.work("b1"))
+    waiting = scheduler.submit("c", "socket-c", "candidate", recorder.work("c1"))
+    assert scheduler.cancel("socket-b") == 1
+
+    await drain(scheduler)
+    assert recorder.ran == ["a1", "c1"]
+    assert first.waited < 0.01 <= waiting.waited
+    stats = scheduler.get_stats()
+    assert (stats["failed"], stats["completed"], stats["cancelled"]) == (1, 1, 1)
@@ -2,6 +2,8 @@
 Tests for sessions service
 """
 
+from datetime import UTC, datetime, timedelta
+
 import pytest
 
 from app.services import sessions as sessions_service
@@ -171,3 +173,47 @@ async def test_get_session_problems(db_session, sample_problems):
 
     assert len(problems) == 1
     assert all(hasattr(p, "title") for p in problems)
+
+
+@pytest.mark.asyncio
+async def test_save_session_code_upserts(db_session, sample_problems):
+    """Test that saved code is inserted, then replaced by later saves"""
+    session, _ = await sessions_service.create_session(
+        db_session, "John Doe", "junior", "python", 1
+    )
+
+    await sessions_service.save_session_code(
+        db_session, [(session.id, 1, "a"), (session.id, 2, "b")]
+    )
+    await sessions_service.save_session_code(db_session, [(session.id, 1, "a = 1")])
+
+    saved = await sessions_service.get_session_code(db_session, session.id)
+    assert saved == {1: "a = 1", 2: "b"}
+
+
+@pytest.mark.asyncio
+async def test_get_event_blocks_pages_by_start_time(db_session, sample_problems):
+    """Test that event blocks are read in start order, one page after another"""
+    session, _ = await sessions_service.create_session(
+        db_session, "John Doe", "junior", "python", 1
+    )
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    await sessions_service.save_event_blocks(
+        db_session,
+        [
+            {
+                "session_id": session.id,
+                "started_at": start + timedelta(minutes=minute),
+                "ended_at": start + timedelta(minutes=minute + 1),
+                "event_count": 1,
+                "data": bytes([minute]),
+            }
+            for minute in (2, 0, 1)
+        ],
+    )
+
+    first = await sessions_service.get_event_blocks(db_session, session.id, limit=2)
+    after = (first[-1].started_at, first[-1].id)
+    rest = await sessions_service.get_event_blocks(db_session, session.id, after, limit=2)
+
+    assert [block.data for block in first + rest] == [b"\x00", b"\x01", b"\x02"]
@@ -0,0 +1,48 @@
+"""
+Fixtures for WebSocket layer tests
+"""
+
+import asyncio
+import json
+
+import pytest
+
+
+class FakeWebSocket:
+    """In-memory stand-in for a Starlette WebSocket"""
+
+    def __init__(self):
+        self.accepted = False
+        self.closed = False
+        self.sent: list[dict] = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+    async def send_json(self, message: dict):
+        self.sent.append(message)
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+
+@pytest.fixture
+def make_websocket():
+    """Factory for fake WebSocket connections"""
+    return FakeWebSocket
+
+
+@pytest.fixture
+def join():
+    """Connects a fake socket to a manager and consumes the connection status"""
+
+    async def join(manager, websocket: FakeWebSocket, session_id: str, *args):
+        await manager.connect(websocket, session_id, *args)
+        while not websocket.sent:
+            await asyncio.sleep(0)
+        assert websocket.sent.pop(0)["type"] == "connection_status"
+
+    return join
@@ -0,0 +1,71 @@
+"""
+Tests for coalescing of bursty code updates
+"""
+
+import asyncio
+
+import pytest
+
+from app.websocket import ConnectionManager, Frame
+from app.websocket.coalescer import Coalescer
+
+
+def code_update(code: str, version: int) -> dict:
+    return {"type": "code_update", "problemId": 1, "code": code, "version": version}
+
+
+@pytest.mark.asyncio
+async def test_latest_code_update_wins(make_websocket, join):
+    """Test that a burst of full-text updates is flushed once"""
+    manager = ConnectionManager()
+    manager.coalescer.interval = 0.02
+    interviewer = make_websocket()
+    await join(manager, interviewer, "sess_1")
+
+    for i in range(1, 11):
+        await manager.broadcast_code_change(code_update("x" * i, i), "sess_1", 1)
+    await asyncio.sleep(0.05)
+
+    assert interviewer.sent == [{**code_update("x" * 10, 10), "seq": 1}]
+    assert manager.coalescer.get_stats()["merged"] == 9
+
+
+@pytest.mark.asyncio
+async def test_consecutive_deltas_are_concatenated():
+    """Test that deltas from one sender are merged into one edit list"""
+    sent = []
+
+    async def send(frame, session_id, exclude):
+        sent.append(frame.message)
+
+    coalescer = Coalescer(send, interval=60)
+    for version in (1, 2, 3):
+        delta = {
+            "type": "code_delta",
+            "problemId": 1,
+            "baseVersion": version - 1,
+            "version": version,
+            "ops": [{"start": version - 1, "end": version - 1, "text": str(version)}],
+        }
+        await coalescer.submit(Frame.of(delta), "sess_1", 1)
+
+    await coalescer.flush("sess_1")
+
+    assert len(sent) == 1
+    assert (sent[0]["baseVersion"], sent[0]["version"]) == (0, 3)
+    assert [op["text"] for op in sent[0]["ops"]] == ["1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_other_events_are_not_reordered(make_websocket, join):
+    """Test that a problem change flushes pending code updates first"""
+    manager = ConnectionManager()
+    manager.coalescer.interval = 60
+    candidate = make_websocket()
+    await join(manager, candidate, "sess_1")
+
+    await manager.broadcast_code_change(code_update("a", 1), "sess_1", 1)
+    await manager.broadcast_to_session({"type": "problem_change", "problemId": 2}, "sess_1")
+    await asyncio.sleep(0.01)
+
+    assert [message["type"] for message in candidate.sent] == ["code_update", "problem_change"]
@@ -0,0 +1,171 @@
+"""
+Tests for per-connection outbound queues
+"""
+
+import asyncio
+
+import pytest
+
+from app.websocket import ConnectionManager, Frame, QueuePolicy
+from app.websocket.connection import Connection, QueueStats
+
+
+class SlowWebSocket:
+    """WebSocket whose sends block until released"""
+
+    def __init__(self):
+        self.sent: list[dict] = []
+        self.closed_with: int | None = None
+        self.release = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    async def send_text(self, text: str):
+        await self.release.wait()
+        self.sent.append(Frame(text).message)
+
+
+def code_update(problem_id: int, code: str) -> dict:
+    return {"type": "code_update", "problemId": problem_id, "code": code}
+
+
+def queued(connection: Connection) -> list[dict]:
+    return [frame.message for frame in connection.queue]
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_does_not_block_others(make_websocket, join):
+    """Test that a broadcast completes while one recipient is stuck"""
+    manager = ConnectionManager()
+    slow, fast = SlowWebSocket(), make_websocket()
+    await manager.connect(slow, "sess_1")
+    await join(manager, fast, "sess_1")
+
+    await asyncio.wait_for(manager.broadcast_to_session(code_update(1, "a"), "sess_1"), 0.1)
+    await asyncio.sleep(0.01)
+
+    assert fast.sent == [{**code_update(1, "a"), "seq": 1}]
+    assert slow.sent == []
+    # The connection status is in flight, the update waits behind it
+    assert manager.get_queue_stats()["queue_depth"] == 1
+
+    slow.release.set()
+    await asyncio.sleep(0.01)
+    assert slow.sent[0]["type"] == "connection_status"
+    assert slow.sent[1:] == [{**code_update(1, "a"), "seq": 1}]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy():
+    """Test that a full queue drops the oldest message"""
+    stats = QueueStats()
+    websocket = SlowWebSocket()
+    connection = Connection(websocket, "sess_1", stats, max_queue=2, policy=QueuePolicy.DROP_OLDEST)
+
+    for message in ({"n": 1}, {"n": 2}, {"n": 3}):
+        connection.enqueue(Frame.of(message))
+
+    assert queued(connection) == [{"n": 2}, {"n": 3}]
+    assert stats.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_resyncs_instead_of_dropping_sequenced_frames(make_websocket, join):
+    """Test that a client whose queue overflowed resumes with every broadcast it missed"""
+    manager = ConnectionManager()
+    slow, peer = SlowWebSocket(), make_websocket()
+    await manager.connect(slow, "sess_1")
+    await join(manager, peer, "sess_1")
+    connection = manager.connections[slow]
+    connection.max_queue = 2
+
+    updates = [code_update(1, "a"), code_update(2, "b"), {"type": "problem_change", "problemId": 2}]
+    for message in updates:
+        await manager.broadcast_to_session(message, "sess_1")
+    await asyncio.sleep(0.01)
+
+    # The third update did not fit: the connection is closed rather than left with a gap
+    assert connection.closed
+    assert slow.closed_with == 1013
+    assert manager.get_queue_stats()["dropped"] == 0
+    slow.release.set()
+    await asyncio.sleep(0.01)
+    status = slow.sent[0]
+    assert slow.sent[1:] == []
+    await manager.disconnect(slow, "sess_1")
+
+    resumed = make_websocket()
+    await manager.connect(resumed, "sess_1", None, None, status["epoch"], status["seq"])
+    await asyncio.sleep(0.01)
+    assert resumed.sent[0]["resumed"]
+    assert resumed.sent[1:] == [
+        {**message, "seq": seq} for seq, message in enumerate(updates, start=1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_policy_keeps_latest_code():
+    """Test that a full queue replaces an older update for the same problem"""
+    stats = QueueStats()
+    connection = Connection(
+        SlowWebSocket(), "sess_1", stats, max_queue=2, policy=QueuePolicy.COALESCE
+    )
+
+    connection.enqueue(Frame.of(code_update(1, "a")))
+    connection.enqueue(Frame.of({"type": "problem_change", "problemId": 2}))
+    connection.enqueue(Frame.of(code_update(1, "ab")))
+
+    assert queued(connection) == [
+        {"type": "problem_change", "problemId": 2},
+        code_update(1, "ab"),
+    ]
+    assert stats.coalesced == 1
+    assert stats.dropped == 0
+
+    # Nothing supersedes a run result: the slow consumer is closed instead
+    connection.enqueue(Frame.of({"type": "code_result", "success": True}))
+    await asyncio.sleep(0)
+    assert connection.closed
+    assert connection.websocket.closed_with == 1013
+    assert stats.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_slow_consumer():
+    """Test that a full queue closes the connection"""
+    stats = QueueStats()
+    websocket = SlowWebSocket()
+    connection = Connection(websocket, "sess_1", stats, max_queue=1, policy=QueuePolicy.DISCONNECT)
+
+    connection.enqueue(Frame.of({"n": 1}))
+    connection.enqueue(Frame.of({"n": 2}))
+    await asyncio.sleep(0)
+
+    assert connection.closed
+    assert websocket.closed_with == 1013
+    assert stats.slow_consumer_disconnects == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_send_removes_connection():
+    """Test that a broken socket is removed from its room"""
+
+    class BrokenWebSocket:
+        async def accept(self):
+            pass
+
+        async def send_text(self, text):
+            raise RuntimeError("connection reset")
+
+    manager = ConnectionManager()
+    await manager.connect(BrokenWebSocket(), "sess_1")
+
+    await manager.broadcast_to_session({"type": "code_update"}, "sess_1")
+    await asyncio.sleep(0.01)
+
+    assert manager.get_session_connection_count("sess_1") == 0
+    assert manager.get_queue_stats()["send_failures"] == 1
@@ -0,0 +1,121 @@
+"""
+Tests for live syntax and lint diagnostics
+"""
+
+import asyncio
+
+import pytest
+
+from app.websocket import ConnectionManager
+from app.websocket.diagnostics import DiagnosticsStage, diagnose
+
+
+def summary(code: str) -> list[tuple[int, int, str]]:
+    return [(d.line, d.column, d.code) for d in diagnose(code)]
+
+
+def test_syntax_errors_and_lint_warnings():
+    """Test that syntax errors are reported alone and clean code has no warnings"""
+    assert summary("def f(:\n    pass") == [(1, 7, "syntax-error")]
+    # Found by the compiler, not the parser
+    assert summary("x = 1\nreturn x") == [(2, 1, "syntax-error")]
+
+    code = (
+        "import os\n"
+        "import sys\n"
+        "\n"
+        "def total(xs):\n"
+        "    for x in xs:\n"
+        "        continue\n"
+        "        print(x)\n"
+        "    return sum(xs) + reslt\n"
+        "\n"
+        "print(total(sys.argv))\n"
+    )
+    assert summary(code) == [
+        (1, 1, "unused-import"),
+        (7, 9, "unreachable-code"),
+        (8, 22, "undefined-name"),
+    ]
+
+    clean = (
+        "from collections import Counter\n"
+        "\n"
+        "class Solution:\n"
+        "    def count(self, words):\n"
+        "        try:\n"
+        "            return Counter(w for w in words)\n"
+        "        except TypeError as error:\n"
+        "            raise ValueError(words) from error\n"
+    )
+    assert diagnose(clean) == []
+    # Anything may come from a star import
+    assert diagnose("from math import *\nprint(sqrt(2))") == []
+
+
+class Sent:
+    """Diagnostics sent by a stage, kept in memory"""
+
+    def __init__(self):
+        self.calls: list[tuple[str, int, list[str]]] = []
+
+    async def __call__(self, session_id, problem_id, diagnostics):
+        self.calls.append((session_id, problem_id, [d.code for d in diagnostics]))
+
+
+@pytest.mark.asyncio
+async def test_stage_checks_settled_code_and_sends_changes():
+    """Test that a burst of edits is checked once and only changes are sent"""
+    sent = Sent()
+    stage = DiagnosticsStage(sent, delay=0.02)
+
+    for code in ("pri", "print(", "print(x"):
+        stage.submit("sess_1", 1, code)
+    await asyncio.sleep(0.1)
+    assert sent.calls == [("sess_1", 1, ["syntax-error"])]
+    assert stage.get_stats()["checked"] == 1
+
+    # A different error counts as a change; the same one does not
+    stage.submit("sess_1", 1, "print(x)")
+    await asyncio.sleep(0.1)
+    stage.submit("sess_1", 1, "print(x)\n")
+    await asyncio.sleep(0.1)
+    stage.submit("sess_1", 1, "x = 1\nprint(x)")
+    await asyncio.sleep(0.1)
+    assert sent.calls[1:] == [("sess_1", 1, ["undefined-name"]), ("sess_1", 1, [])]
+
+    # Clean code was never sent for problem 2, so there is nothing to clear
+    stage.submit("sess_1", 2, "x = 1\nprint(x)")
+    await asyncio.sleep(0.1)
+    assert len(sent.calls) == 3
+    assert stage.get_stats()["cache_hits"] == 1
+
+    stage.submit("sess_1", 1, "print(")
+    stage.drop_session("sess_1")
+    await asyncio.sleep(0.1)
+    assert len(sent.calls) == 3
+    await stage.stop()
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_go_to_interviewers(make_websocket, join):
+    """Test that diagnostics reach interviewers only, including ones joining later"""
+    manager = ConnectionManager()
+    manager.diagnostics.delay = 0.01
+    interviewer, candidate = make_websocket(), make_websocket()
+    await join(manager, interviewer, "sess_1", "John Doe", "interviewer")
+    await join(manager, candidate, "sess_1", "Jane Smith", "candidate")
+    interviewer.sent.clear()
+
+    manager.record_code("sess_1", 1, "print(reslt)")
+    await asyncio.sleep(0.1)
+    assert [m["type"] for m in interviewer.sent] == ["diagnostics"]
+    assert interviewer.sent[0]["diagnostics"][0]["message"] == "Undefined name 'reslt'"
+    assert "seq" not in interviewer.sent[0]
+    assert [m["type"] for m in candidate.sent] == []
+
+    late = make_websocket()
+    await manager.connect(late, "sess_1", "Jim Roe", "interviewer")
+    await asyncio.sleep(0.01)
+    assert [m["type"] for m in late.sent] == ["connection_status", "diagnostics"]
+    await manager.diagnostics.stop()
@@ -0,0 +1,102 @@
+"""
+Tests for typed message dispatch
+"""
+
+import pytest
+
+from app.schemas.websocket import CodeUpdateMessage, PongMessage, ProblemChangeMessage
+from app.websocket.dispatch import Dispatcher, MessageRejected
+
+
+async def dispatch(dispatcher: Dispatcher, data: str | bytes):
+    message, route = dispatcher.parse(data)
+    await route.handler(None, message, data)
+
+
+def make_dispatcher(handled: list) -> Dispatcher:
+    dispatcher = Dispatcher(default_max_bytes=64)
+
+    @dispatcher.register(CodeUpdateMessage, max_bytes=1024)
+    async def on_code_update(connection, message, data):
+        handled.append(message)
+
+    @dispatcher.register(ProblemChangeMessage)
+    async def on_problem_change(connection, message, data):
+        handled.append(message)
+
+    return dispatcher
+
+
+@pytest.mark.asyncio
+async def test_dispatch_validates_by_type():
+    """Test that frames are validated into their model and routed"""
+    handled = []
+    dispatcher = make_dispatcher(handled)
+
+    await dispatch(dispatcher, '{"type":"problem_change","problemId":2,"problemIndex":1}')
+    await dispatch(dispatcher, b'{"type":"code_update","problemId":2,"code":"x = 1"}')
+
+    assert handled == [
+        ProblemChangeMessage(problemId=2, problemIndex=1),
+        CodeUpdateMessage(problemId=2, code="x = 1"),
+    ]
+
+
+def test_invalid_and_unknown_messages_are_rejected():
+    """Test the error codes for malformed, invalid and unknown frames"""
+    dispatcher = make_dispatcher([])
+
+    cases = {
+        "not json": "INVALID_MESSAGE",
+        '{"type":"problem_change"}': "INVALID_MESSAGE",
+        '{"type":"launch_rockets"}': "UNKNOWN_MESSAGE_TYPE",
+        '{"problemId":1}': "UNKNOWN_MESSAGE_TYPE",
+    }
+    for data, code in cases.items():
+        with pytest.raises(MessageRejected) as e:
+            dispatcher.parse(data)
+        assert e.value.code == code
+
+
+def test_oversized_frames_are_rejected_per_type():
+    """Test that each type has its own size cap, checked before parsing"""
+    dispatcher = make_dispatcher([])
+    code = "x" * 200
+
+    message, route = dispatcher.parse(f'{{"type":"code_update","problemId":1,"code":"{code}"}}')
+    assert message.code == code
+
+    with pytest.raises(MessageRejected) as e:
+        dispatcher.parse(f'{{"type":"problem_change","problemId":1,"pad":"{code}"}}')
+    assert e.value.code == "MESSAGE_TOO_LARGE"
+
+    # A nested "type" cannot borrow a larger cap
+    with pytest.raises(MessageRejected) as e:
+        dispatcher.parse(
+            f'{{"x":{{"type":"code_update"}},"type":"problem_change","problemId":1,"pad":"{code}"}}'
+        )
+    assert e.value.code == "MESSAGE_TOO_LARGE"
+
+    with pytest.raises(MessageRejected) as e:
+        dispatcher.parse("x" * 2000)
+    assert e.value.code == "MESSAGE_TOO_LARGE"
+
+    # Caps count encoded bytes, not characters
+    with pytest.raises(MessageRejected) as e:
+        dispatcher.parse(f'{{"type":"code_update","problemId":1,"code":"{"é" * 600}"}}')
+    assert e.value.code == "MESSAGE_TOO_LARGE"
+
+
+@pytest.mark.asyncio
+async def test_new_types_can_be_registered():
+    """Test that registering a type extends the union without other changes"""
+    handled = []
+    dispatcher = make_dispatcher(handled)
+    dispatcher.parse('{"type":"problem_change","problemId":1}')
+
+    @dispatcher.register(PongMessage)
+    async def on_pong(connection, message, data):
+        handled.append(message)
+
+    await dispatch(dispatcher, '{"type":"pong"}')
+    assert handled == [PongMessage()]
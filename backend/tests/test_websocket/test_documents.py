@@ -0,0 +1,125 @@
+"""
+Tests for versioned code documents
+"""
+
+import pytest
+
+from app.websocket.documents import Document, DocumentStore, VersionConflict
+
+
+def test_apply_insert_and_delete():
+    """Test applying range edits in order"""
+    document = Document("def f():\n    pass\n")
+
+    text = document.apply(
+        [
+            {"start": 13, "end": 17, "text": "return 1"},
+            {"start": 0, "end": 0, "text": "# solution\n"},
+        ]
+    )
+
+    assert text == "# solution\ndef f():\n    return 1\n"
+
+
+def test_apply_rejects_out_of_range_edit():
+    """Test that an edit past the end of the document is rejected"""
+    document = Document("abc")
+
+    with pytest.raises(ValueError):
+        document.apply([{"start": 2, "end": 10, "text": ""}])
+
+    assert document.text == "abc"
+
+
+def test_delta_requires_matching_version():
+    """Test that edits against a stale version raise a conflict"""
+    store = DocumentStore()
+    store.replace("sess_1", 1, "abc")
+
+    document = store.apply_delta("sess_1", 1, 1, [{"start": 3, "end": 3, "text": "d"}])
+    assert (document.text, document.version) == ("abcd", 2)
+
+    with pytest.raises(VersionConflict):
+        store.apply_delta("sess_1", 1, 1, [{"start": 0, "end": 0, "text": "x"}])
+
+    with pytest.raises(VersionConflict):
+        store.apply_delta("sess_1", 2, 0, [])
+
+
+def test_remote_delta_with_gap_marks_copy_stale():
+    """Test that a worker keeps its last text, marked stale, when a remote delta skips versions"""
+    store = DocumentStore()
+    store.replace("sess_1", 1, "abc", version=3)
+
+    store.apply_remote(
+        "sess_1",
+        {"type": "code_delta", "problemId": 1, "baseVersion": 3, "version": 4, "ops": []},
+    )
+    assert store.get("sess_1", 1).version == 4
+
+    store.apply_remote(
+        "sess_1",
+        {"type": "code_delta", "problemId": 1, "baseVersion": 7, "version": 8, "ops": []},
+    )
+    document = store.get("sess_1", 1)
+    assert (document.text, document.version, document.stale) == ("abc", 4, True)
+    assert store.snapshot("sess_1")["documents"] == [
+        {"problemId": 1, "code": "abc", "version": 4, "stale": True}
+    ]
+
+    # Local edits wait for a full text
+    with pytest.raises(VersionConflict):
+        store.apply_delta("sess_1", 1, 4, [])
+    store.apply_remote(
+        "sess_1", {"type": "code_update", "problemId": 1, "code": "xyz", "version": 9}
+    )
+    assert not store.get("sess_1", 1).stale
+
+
+def test_document_over_size_cap_is_not_stored():
+    """Test that oversized code is relayed untracked instead of stored"""
+    store = DocumentStore(max_document_chars=5)
+
+    assert store.replace("sess_1", 1, "abc") is not None
+    assert store.replace("sess_1", 1, "abcdefgh") is None
+    assert store.get("sess_1", 1) is None
+    assert store.total_size == 0
+
+
+def test_least_recently_edited_session_is_evicted():
+    """Test that the worker-wide cap evicts the oldest session first"""
+    store = DocumentStore(max_total_chars=10)
+    store.replace("sess_1", 1, "aaaa")
+    store.replace("sess_2", 1, "bbbb")
+    store.replace("sess_1", 1, "aaaaa")
+
+    store.replace("sess_3", 1, "cccc")
+
+    assert store.get("sess_2", 1) is None
+    assert store.get("sess_1", 1).text == "aaaaa"
+    assert store.total_size == 9
+    assert store.evicted_sessions == 1
+
+
+def test_snapshot_keeps_active_problem():
+    """Test that the snapshot carries the active problem and every document"""
+    store = DocumentStore(max_documents_per_session=2)
+    assert store.snapshot("sess_1") is None
+
+    store.set_active_problem("sess_1", 1, 0)
+    store.replace("sess_1", 1, "one")
+    store.replace("sess_1", 2, "two")
+    store.replace("sess_1", 3, "three")
+
+    assert store.snapshot("sess_1") == {
+        "activeProblemId": 1,
+        "activeProblemIndex": 0,
+        "documents": [
+            {"problemId": 1, "code": "one", "version": 1, "stale": False},
+            {"problemId": 3, "code": "three", "version": 1, "stale": False},
+        ],
+    }
+
+    store.drop_session("sess_1")
+    assert store.snapshot("sess_1") is None
+    assert store.total_size == 0
@@ -0,0 +1,62 @@
+"""
+Tests for encode-once broadcast frames
+"""
+
+import asyncio
+
+import pytest
+
+from app.schemas.websocket import UserJoinedMessage
+from app.websocket import ConnectionManager, Frame, frames
+
+
+@pytest.mark.asyncio
+async def test_broadcast_encodes_once(make_websocket, monkeypatch, join):
+    """Test that a broadcast is serialized once for all recipients"""
+    calls = []
+    original = frames.encode
+
+    def counting_encode(message):
+        calls.append(message)
+        return original(message)
+
+    monkeypatch.setattr(frames, "encode", counting_encode)
+
+    manager = ConnectionManager()
+    sockets = [make_websocket() for _ in range(5)]
+    for websocket in sockets:
+        await join(manager, websocket, "sess_1")
+
+    message = {"type": "code_update", "problemId": 1, "code": "print('hi')\n" * 100}
+    await manager.broadcast_to_session(message, "sess_1")
+    await asyncio.sleep(0.01)
+
+    assert len(calls) == 1
+    assert all(websocket.sent == [{**message, "seq": 1}] for websocket in sockets)
+
+
+@pytest.mark.asyncio
+async def test_pydantic_messages_use_frames(make_websocket, join):
+    """Test that pydantic messages are serialized without model_dump"""
+    manager = ConnectionManager()
+    websocket = make_websocket()
+    await join(manager, websocket, "sess_1")
+
+    await manager.broadcast_to_session(
+        UserJoinedMessage(userName="Jane Smith", role="candidate"), "sess_1"
+    )
+    await asyncio.sleep(0.01)
+
+    assert websocket.sent == [
+        {"type": "user_joined", "userName": "Jane Smith", "role": "candidate", "seq": 1}
+    ]
+
+
+def test_stdlib_fallback_encoder(monkeypatch):
+    """Test encoding without orjson installed"""
+    monkeypatch.setattr(frames, "orjson", None)
+
+    frame = Frame.of({"type": "code_update", "code": "café"})
+
+    assert frame.text == '{"type":"code_update","code":"café"}'
+    assert Frame(frame.text).message == {"type": "code_update", "code": "café"}
@@ -0,0 +1,49 @@
+"""
+Tests for heartbeats and idle connection reaping
+"""
+
+import asyncio
+
+import pytest
+
+from app.websocket import ConnectionManager
+
+
+@pytest.mark.asyncio
+async def test_silent_connection_is_reaped(make_websocket, join):
+    """Test that a silent socket is closed, removed and announced as left"""
+    manager = ConnectionManager()
+    interviewer, candidate = make_websocket(), make_websocket()
+    await join(manager, interviewer, "sess_1", "John Doe", "interviewer")
+    await join(manager, candidate, "sess_1", "Jane Smith", "candidate")
+
+    # The candidate's network dropped a while ago
+    manager.connections[candidate].last_seen -= manager.heartbeat.timeout + 1
+    await manager.heartbeat.sweep()
+    await asyncio.sleep(0.01)
+
+    assert candidate.closed
+    assert manager.get_session_connection_count("sess_1") == 1
+    assert [message["type"] for message in interviewer.sent] == ["ping", "user_left"]
+    assert interviewer.sent[1]["userName"] == "Jane Smith"
+    assert manager.heartbeat.get_stats() == {"live": 1, "reaped": 1, "pings_sent": 1}
+
+    # Removing it again (e.g. when the endpoint notices) is a no-op
+    assert await manager.disconnect(candidate, "sess_1") is False
+
+
+@pytest.mark.asyncio
+async def test_activity_keeps_connection(make_websocket, join):
+    """Test that a client that answers pings is kept"""
+    manager = ConnectionManager()
+    manager.heartbeat.timeout = 0.01
+    websocket = make_websocket()
+    await join(manager, websocket, "sess_1")
+
+    await asyncio.sleep(0.02)
+    manager.touch(websocket)
+    await manager.heartbeat.sweep()
+    await asyncio.sleep(0.01)
+
+    assert not websocket.closed
+    assert websocket.sent == [{"type": "ping"}]
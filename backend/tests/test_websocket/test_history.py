@@ -0,0 +1,42 @@
+"""
+Tests for sequenced broadcast history
+"""
+
+from app.websocket.frames import Frame
+from app.websocket.history import History, RoomHistory
+
+
+def test_frames_are_numbered_in_order():
+    """Test that every frame gets the next sequence number"""
+    room = RoomHistory()
+
+    first = room.append(Frame.of({"type": "user_joined"}))
+    second = room.append(Frame.of({"type": "problem_change", "problemId": 2}))
+
+    assert first.message["seq"] == 1
+    assert second.message == {"type": "problem_change", "problemId": 2, "seq": 2}
+    assert [frame.message["seq"] for frame in room.since(0)] == [1, 2]
+    assert room.since(2) == []
+
+
+def test_evicted_tail_needs_snapshot():
+    """Test that a resume fails once missed frames fell out of the buffer"""
+    room = RoomHistory(size=3)
+    for i in range(5):
+        room.append(Frame.of({"type": "code_update", "code": str(i)}))
+
+    assert [frame.message["code"] for frame in room.since(2)] == ["2", "3", "4"]
+    assert room.since(1) is None
+    assert room.since(9) is None
+
+
+def test_replay_requires_same_epoch():
+    """Test that a client from an earlier incarnation of the room gets a snapshot"""
+    history = History()
+    room = history.room("sess_1")
+    room.append(Frame.of({"type": "user_left"}))
+
+    assert history.replay("sess_1", None, None) is None
+    assert history.replay("sess_1", "stale", 0) is None
+    assert len(history.replay("sess_1", room.epoch, 0)) == 1
+    assert (history.resumed, history.resume_misses) == (1, 1)
@@ -0,0 +1,107 @@
+"""
+Tests for the session event journal
+"""
+
+import time
+
+import pytest
+
+from app.websocket.journal import Journal, splice
+
+
+class FakeStore:
+    """Keeps written blocks in memory, loaded by start time"""
+
+    def __init__(self):
+        self.blocks = []
+
+    async def save(self, blocks):
+        self.blocks.extend(blocks)
+
+    async def load(self, session_id):
+        for block in sorted(self.blocks, key=lambda block: block.started_at):
+            if block.session_id == session_id:
+                yield block
+
+
+class FakeClock:
+    """Time that only moves when told to"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def apply(code: str, ops: list[dict]) -> str:
+    for op in ops:
+        code = code[: op["start"]] + op["text"] + code[op["end"] :]
+    return code
+
+
+def test_splice_finds_the_changed_range():
+    """Test that an edit is reduced to the one range it replaced"""
+    assert splice("def f():\n    pass", "def f():\n    return 1") == (13, 17, "return 1")
+    assert splice("aaa", "aaaa") == (3, 3, "a")
+    assert splice("abc", "ac") == (1, 2, "")
+
+
+@pytest.mark.asyncio
+async def test_typing_is_stored_compactly_and_replayed_exactly():
+    """Test that an hour of keystrokes takes a fraction of the raw frames and replays intact"""
+    store, clock = FakeStore(), FakeClock()
+    journal = Journal(store.save, store.load, interval=0, max_block_events=500, clock=clock)
+
+    journal.record("sess_1", {"type": "user_joined", "userName": "Jane", "role": "candidate"})
+    code = "def solve(numbers):\n" + "    # TODO\n" * 100
+    raw_frames = 0
+    for i in range(3600):
+        position = 20 + (i * 7) % (len(code) - 20)
+        code = code[:position] + "xy"[i % 2] + code[position:]
+        journal.record_code("sess_1", 1, code)
+        raw_frames += len(code) + 60
+        clock.now += 1
+    journal.record("sess_1", {"type": "session_ended", "sessionId": "sess_1"})
+    await journal.flush("sess_1")
+
+    assert len(store.blocks) == 8
+    assert journal.bytes_written * 50 < raw_frames
+
+    replayed = code_now = None
+    async for event in journal.replay("sess_1", speed=None):
+        replayed = event
+        if event["type"] == "code_update":
+            code_now = event["code"]
+        elif event["type"] == "code_delta":
+            code_now = apply(code_now, event["ops"])
+    assert code_now == code
+    assert replayed["type"] == "session_ended"
+    assert replayed["offset"] == 3600
+
+
+@pytest.mark.asyncio
+async def test_replay_merges_workers_and_keeps_pace():
+    """Test that blocks from two workers interleave by time and gaps are scaled by speed"""
+    store, clock = FakeStore(), FakeClock()
+    interviewer_worker = Journal(store.save, store.load, interval=0, clock=clock)
+    candidate_worker = Journal(store.save, store.load, interval=0, clock=clock)
+
+    interviewer_worker.record("sess_1", {"type": "problem_change", "problemId": 1})
+    clock.now += 0.2
+    candidate_worker.record_code("sess_1", 1, "x = 1")
+    clock.now += 0.2
+    interviewer_worker.record("sess_1", {"type": "problem_change", "problemId": 2})
+    await interviewer_worker.flush()
+    await candidate_worker.flush()
+
+    start = time.perf_counter()
+    events = [event async for event in candidate_worker.replay("sess_1", speed=4)]
+    elapsed = time.perf_counter() - start
+
+    assert [(e["type"], e["offset"]) for e in events] == [
+        ("problem_change", 0),
+        ("code_update", 0.2),
+        ("problem_change", 0.4),
+    ]
+    assert 0.09 < elapsed < 0.3
@@ -0,0 +1,67 @@
+"""
+Tests for write-behind persistence of live code
+"""
+
+import pytest
+
+from app.websocket.persistence import CodeWriteBehind
+
+
+class FakeStore:
+    """Records saved batches; fails while ``failing`` is set"""
+
+    def __init__(self):
+        self.batches: list[list] = []
+        self.failing = False
+
+    async def save(self, rows):
+        if self.failing:
+            raise ConnectionError("database is down")
+        self.batches.append(sorted(rows))
+
+    async def load(self, session_id):
+        return {}
+
+
+@pytest.mark.asyncio
+async def test_edits_are_flushed_in_one_batch():
+    """Test that only the latest code per problem is written, in one upsert"""
+    store = FakeStore()
+    writer = CodeWriteBehind(store.save, store.load, interval=0)
+
+    for code in ("a", "ab", "abc"):
+        writer.mark("sess_1", 1, code)
+    writer.mark("sess_1", 2, "x")
+    writer.mark("sess_2", 1, "y")
+
+    await writer.flush("sess_2")
+    await writer.flush()
+    await writer.flush()
+
+    assert store.batches == [[("sess_2", 1, "y")], [("sess_1", 1, "abc"), ("sess_1", 2, "x")]]
+    assert writer.get_stats() == {
+        "dirty": 0,
+        "marked": 5,
+        "flushes": 2,
+        "rows_written": 3,
+        "failures": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_retried_without_losing_newer_edits():
+    """Test that a failed batch is kept, unless newer code replaced it meanwhile"""
+    store = FakeStore()
+    writer = CodeWriteBehind(store.save, store.load, interval=0)
+    writer.mark("sess_1", 1, "old")
+    writer.mark("sess_1", 2, "kept")
+
+    store.failing = True
+    await writer.flush()
+    writer.mark("sess_1", 1, "new")
+
+    store.failing = False
+    await writer.stop()
+
+    assert store.batches == [[("sess_1", 1, "new"), ("sess_1", 2, "kept")]]
+    assert writer.failures == 1
@@ -0,0 +1,71 @@
+"""
+Tests for throttled cursor and selection presence
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.websocket import Connection, ConnectionManager, Frame, QueueStats
+
+
+def presence(line: int) -> dict:
+    return {"type": "presence", "problemId": 1, "cursor": {"line": line, "column": 1}}
+
+
+@pytest.mark.asyncio
+async def test_presence_is_throttled_to_latest(make_websocket, join):
+    """Test that a burst of cursor moves is relayed as the first and the latest"""
+    manager = ConnectionManager()
+    manager.presence.interval = 0.05
+    interviewer, candidate = make_websocket(), make_websocket()
+    await join(manager, interviewer, "sess_1", "John Doe", "interviewer")
+    await join(manager, candidate, "sess_1", "Jane Smith", "candidate")
+
+    for line in (1, 2, 3):
+        manager.broadcast_presence(presence(line), candidate)
+    await asyncio.sleep(0.01)
+    assert [m["cursor"]["line"] for m in interviewer.sent] == [1]
+
+    await asyncio.sleep(0.06)
+    assert [m["cursor"]["line"] for m in interviewer.sent] == [1, 3]
+    # Never sent back to the sender and not part of the sequenced history
+    assert candidate.sent == []
+    assert "seq" not in interviewer.sent[0]
+    assert manager.get_queue_stats()["presence_throttled"] == 1
+
+
+class SlowWebSocket:
+    """Socket whose sends block until released"""
+
+    def __init__(self):
+        self.sent: list[str] = []
+        self.release = asyncio.Event()
+
+    async def send_text(self, text: str):
+        await self.release.wait()
+        self.sent.append(text)
+
+
+@pytest.mark.asyncio
+async def test_presence_skips_queue_and_drops_stale():
+    """Test that a slow socket gets only the latest presence, before queued updates"""
+    websocket, stats = SlowWebSocket(), QueueStats()
+    connection = Connection(websocket, "sess_1", stats)
+    connection.start()
+
+    # The writer is stuck sending the first update
+    connection.enqueue(Frame.of({"type": "code_update", "n": 1}))
+    await asyncio.sleep(0)
+    connection.enqueue(Frame.of({"type": "code_update", "n": 2}))
+    connection.set_presence("abc", Frame.of({"type": "presence", "n": 1}))
+    connection.set_presence("abc", Frame.of({"type": "presence", "n": 2}))
+
+    websocket.release.set()
+    connection.stop()
+    await connection.wait_stopped(timeout=1)
+
+    sent = [(m["type"], m["n"]) for m in map(json.loads, websocket.sent)]
+    assert sent == [("code_update", 1), ("presence", 2), ("code_update", 2)]
+    assert stats.presence_superseded == 1
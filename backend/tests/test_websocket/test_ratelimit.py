@@ -0,0 +1,61 @@
+"""
+Tests for inbound rate limiting
+"""
+
+import pytest
+
+from app.websocket.ratelimit import Budget, RateLimited, RateLimiter, TokenBucket
+
+
+def test_token_bucket_refills_over_time():
+    """Test that a bucket allows a burst, then its sustained rate"""
+    bucket = TokenBucket(Budget(rate=2, burst=3))
+    start = bucket.updated
+
+    assert [bucket.take(start) for _ in range(4)] == [True, True, True, False]
+    assert bucket.take(start + 0.5)
+    assert not bucket.take(start + 0.5)
+
+
+def test_budgets_are_per_connection_and_type():
+    """Test that one client's flood does not use another client's budget"""
+    limiter = RateLimiter(connection_budgets={"run_code": Budget(rate=0.001, burst=2)})
+
+    for _ in range(2):
+        limiter.check("tab_1", "sess_1", "run_code")
+    with pytest.raises(RateLimited) as e:
+        limiter.check("tab_1", "sess_1", "run_code")
+    assert e.value.code == "RATE_LIMITED"
+    assert not e.value.disconnect
+
+    # Other types and other connections are unaffected
+    limiter.check("tab_1", "sess_1", "code_update")
+    limiter.check("tab_2", "sess_1", "run_code")
+    assert limiter.get_stats()["throttled_by_type"] == {"run_code": 1}
+
+
+def test_session_budget_is_shared():
+    """Test that connections of one session share the session budget"""
+    limiter = RateLimiter(session_budgets={"code_update": Budget(rate=0.001, burst=3)})
+
+    for client in ("tab_1", "tab_2", "tab_3"):
+        limiter.check(client, "sess_1", "code_update")
+    with pytest.raises(RateLimited):
+        limiter.check("tab_4", "sess_1", "code_update")
+    limiter.check("tab_4", "sess_2", "code_update")
+
+
+def test_repeated_flooding_disconnects():
+    """Test that a client that keeps flooding runs out of strikes"""
+    limiter = RateLimiter(connection_budgets={"pong": Budget(rate=0.001, burst=1)})
+    limiter.check("tab_1", "sess_1", "pong")
+
+    outcomes = []
+    for _ in range(20):
+        try:
+            limiter.check("tab_1", "sess_1", "pong")
+        except RateLimited as e:
+            outcomes.append(e.disconnect)
+
+    assert outcomes.index(True) == 10
+    assert limiter.get_stats()["disconnects"] > 0
@@ -0,0 +1,68 @@
+"""
+Tests for session rooms run as actors
+"""
+
+import asyncio
+
+import pytest
+
+from app.websocket import ConnectionManager, Frame
+from app.websocket.room import Broadcast
+
+
+@pytest.mark.asyncio
+async def test_events_are_applied_in_posting_order(make_websocket, join):
+    """Test that concurrent joins, leaves and broadcasts are ordered by the room"""
+    manager = ConnectionManager()
+    interviewer, candidate, late = make_websocket(), make_websocket(), make_websocket()
+    await join(manager, interviewer, "sess_1")
+    await join(manager, candidate, "sess_1")
+
+    # Posted together: the late joiner only sees what comes after its join
+    await asyncio.gather(
+        manager.broadcast_to_session({"type": "problem_change", "problemId": 1}, "sess_1"),
+        manager.disconnect(candidate, "sess_1"),
+        manager.connect(late, "sess_1"),
+        manager.broadcast_to_session({"type": "problem_change", "problemId": 2}, "sess_1"),
+    )
+    await asyncio.sleep(0.01)
+
+    assert [m["problemId"] for m in interviewer.sent] == [1, 2]
+    assert [m["problemId"] for m in candidate.sent] == [1]
+    status, *rest = late.sent
+    assert (status["type"], status["seq"], status["activeUsers"]) == ("connection_status", 1, 2)
+    assert rest == [{"type": "problem_change", "problemId": 2, "seq": 2}]
+
+    stats = manager.get_room_stats()
+    assert stats["rooms"] == 1
+    assert stats["busiest"]["sess_1"]["events"] == 6
+
+
+@pytest.mark.asyncio
+async def test_empty_room_closes_and_frees_state(make_websocket, join):
+    """Test that the last leave closes the room and a new connect starts over"""
+    manager = ConnectionManager()
+    websocket = make_websocket()
+    await join(manager, websocket, "sess_1")
+    room = manager.rooms["sess_1"]
+    manager.documents.replace("sess_1", 1, "x = 1")
+
+    assert await manager.disconnect(websocket, "sess_1") is True
+    await asyncio.sleep(0)
+
+    assert room.closed
+    assert "sess_1" not in manager.rooms
+    assert manager.documents.get("sess_1", 1) is None
+    # Late events are refused instead of being lost in a dead inbox
+    assert await room.post(Broadcast(Frame.of({"type": "problem_change"}))) is False
+
+    # Broadcasts without local sockets still reach other workers
+    published = []
+    manager.broker.publish = lambda session_id, text: published.append(session_id)
+    await manager.broadcast_to_session({"type": "problem_change"}, "sess_1")
+    assert published == ["sess_1"]
+
+    other = make_websocket()
+    await join(manager, other, "sess_1")
+    assert manager.rooms["sess_1"] is not room
+    assert manager.rooms["sess_1"].history.epoch != room.history.epoch
@@ -0,0 +1,78 @@
+"""
+Tests for the session cache checked on WebSocket connects
+"""
+
+import asyncio
+
+import pytest
+
+from app.websocket.sessions import SessionAccess, SessionCache
+
+
+class FakeLoader:
+    """Session statuses by id, counting lookups"""
+
+    def __init__(self, statuses: dict[str, str]):
+        self.statuses = statuses
+        self.calls = 0
+
+    async def __call__(self, session_id: str) -> SessionAccess | None:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        status = self.statuses.get(session_id)
+        return SessionAccess.of(status) if status else None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_connects_share_one_lookup():
+    """Test that a reconnect storm on one session costs a single query"""
+    load = FakeLoader({"sess_1": "active"})
+    cache = SessionCache(load)
+
+    reasons = await asyncio.gather(*(cache.check("sess_1", "candidate") for _ in range(50)))
+    assert reasons == [None] * 50
+    assert await cache.check("sess_1", "interviewer") is None
+    assert load.calls == 1
+
+    # Unknown sessions are cached too
+    assert await cache.check("sess_2", "interviewer") == "Session not found"
+    assert await cache.check("sess_2", "interviewer") == "Session not found"
+    assert load.calls == 2
+    assert cache.get_stats() == {"size": 2, "hits": 2, "misses": 2, "rejected": 2}
+
+
+@pytest.mark.asyncio
+async def test_status_changes_and_expiry():
+    """Test that roles follow the status and stale entries are reloaded"""
+    load = FakeLoader({"sess_1": "waiting"})
+    cache = SessionCache(load, ttl=0.05)
+
+    assert await cache.check("sess_1", "interviewer") is None
+
+    # Refusals come from the cache too, with or without a role
+    denied = "Role candidate cannot join this session"
+    assert await cache.check("sess_1", "candidate") == denied
+    assert await cache.check("sess_1", "candidate") == denied
+    assert await cache.check("sess_1", None) == "A role is required to join a session"
+    assert load.calls == 1
+
+    # Joining and ending are pushed to the cache without a query
+    cache.set_status("sess_1", "active")
+    assert await cache.check("sess_1", "candidate") is None
+    cache.set_status("sess_1", "ended")
+    assert await cache.check("sess_1", "interviewer") == "Session has ended"
+    assert load.calls == 1
+
+    await asyncio.sleep(0.06)
+    assert await cache.check("sess_1", "interviewer") is None
+    assert load.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded():
+    """Test that the least recently used sessions are evicted"""
+    cache = SessionCache(FakeLoader({}), max_size=2)
+    for session_id in ("sess_1", "sess_2", "sess_3"):
+        await cache.get(session_id)
+
+    assert list(cache._entries) == ["sess_2", "sess_3"]
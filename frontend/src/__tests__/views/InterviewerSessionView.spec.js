@@ -0,0 +1,117 @@
+import { describe, it, expect, beforeEach, vi } from 'vitest'
+import { mount, flushPromises } from '@vue/test-utils'
+import { createPinia, setActivePinia } from 'pinia'
+import InterviewerSessionView from '../../views/InterviewerSessionView.vue'
+import { createRouter, createMemoryHistory } from 'vue-router'
+import { useSessionStore } from '../../stores/session'
+import * as apiModule from '../../services/api'
+import { wsService } from '../../services/websocket'
+
+const createMockRouter = () => {
+  return createRouter({
+    history: createMemoryHistory(),
+    routes: [
+      { path: '/', component: { template: '<div>Home</div>' } },
+      { path: '/session/:id/interviewer', component: InterviewerSessionView }
+    ]
+  })
+}
+
+// Mock API
+vi.mock('../../services/api', () => ({
+  api: {
+    sessions: {
+      getById: vi.fn(),
+      end: vi.fn()
+    }
+  }
+}))
+
+// Mock WebSocket service, keeping the registered handlers
+vi.mock('../../services/websocket', () => {
+  const handlers = {}
+  return {
+    wsService: {
+      handlers,
+      connect: vi.fn(),
+      disconnect: vi.fn(),
+      on: vi.fn((type, handler) => {
+        handlers[type] = handler
+      }),
+      sendProblemChange: vi.fn(),
+      sendProfileCode: vi.fn()
+    }
+  }
+})
+
+describe('InterviewerSessionView', () => {
+  let router
+  let store
+
+  beforeEach(async () => {
+    setActivePinia(createPinia())
+    router = createMockRouter()
+    store = useSessionStore()
+    localStorage.clear()
+    vi.clearAllMocks()
+
+    apiModule.api.sessions.getById.mockResolvedValue({
+      session: {
+        id: 'test-session-id',
+        status: 'active',
+        problems: [
+          { id: 7, title: 'Two Sum', description: 'Add them' },
+          { id: 8, title: 'Reverse', description: 'Reverse it' }
+        ]
+      }
+    })
+
+    router.push('/session/test-session-id/interviewer')
+    await router.isReady()
+  })
+
+  const mountComponent = async () => {
+    const wrapper = mount(InterviewerSessionView, {
+      global: {
+        plugins: [router]
+      }
+    })
+    await flushPromises()
+    return wrapper
+  }
+
+  describe('Reconnecting', () => {
+    it('should show the first problem code before any problem change', async () => {
+      await mountComponent()
+
+      wsService.handlers.connection_status({
+        type: 'connection_status',
+        snapshot: {
+          activeProblemId: null,
+          activeProblemIndex: null,
+          documents: [{ problemId: 7, code: 'def two_sum(): pass', version: 3 }]
+        }
+      })
+
+      expect(store.candidateCode).toBe('def two_sum(): pass')
+    })
+
+    it('should show the active problem code after a problem change', async () => {
+      await mountComponent()
+
+      wsService.handlers.connection_status({
+        type: 'connection_status',
+        snapshot: {
+          activeProblemId: 8,
+          activeProblemIndex: 1,
+          documents: [
+            { problemId: 7, code: 'old', version: 1 },
+            { problemId: 8, code: 'new', version: 2 }
+          ]
+        }
+      })
+
+      expect(store.candidateCode).toBe('new')
+    })
+  })
+})
@@ -52,6 +52,11 @@ export const api = {
       const response = await apiClient.post(`/api/sessions/${sessionId}/end`)
       return response.data
     },
+
+    getRuns: async (sessionId) => {
+      const response = await apiClient.get(`/api/sessions/${sessionId}/runs`)
+      return response.data
+    },
   },
 
   problems: {
@@ -0,0 +1,35 @@
+// Text shown for server-side runs, shared by the candidate and interviewer views
+
+export function formatTestCase(testCase) {
+  const mark = testCase.passed ? '✓' : '✗'
+  const detail = testCase.error
+    ? testCase.error.trim().split('\n').pop()
+    : `returned ${testCase.actual}`
+  return `${mark} Test ${testCase.index + 1}: ${detail} (${testCase.durationMs.toFixed(1)} ms)`
+}
+
+export function formatExecutionResult(message) {
+  const parts = [message.output, message.error]
+  if (message.testResults) {
+    const passed = message.testResults.filter((testCase) => testCase.passed).length
+    parts.push(
+      [
+        ...message.testResults.map(formatTestCase),
+        `${passed} of ${message.testResults.length} tests passed`,
+      ].join('\n')
+    )
+  }
+  return parts.filter(Boolean).join('\n')
+}
+
+export function formatDuration(ms) {
+  if (ms == null) return '—'
+  return ms < 1 ? `${(ms * 1000).toFixed(0)} µs` : `${ms.toFixed(1)} ms`
+}
+
+export function formatBytes(bytes) {
+  if (bytes == null) return '—'
+  if (bytes < 1024) return `${bytes} B`
+  if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`
+  return `${(bytes / 1024 / 1024).toFixed(1)} MB`
+}
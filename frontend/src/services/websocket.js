@@ -13,6 +13,9 @@ export class WebSocketService {
     this.reconnectDelay = 1000
     this.messageHandlers = new Map()
     this.isIntentionalClose = false
+    // Room epoch and last broadcast sequence number seen, to resume after a reconnect
+    this.epoch = null
+    this.lastSeq = null
   }
 
   connect(sessionId, userName, userRole) {
@@ -21,10 +24,18 @@ export class WebSocketService {
       return
     }
 
+    if (this.sessionId !== sessionId) {
+      this.epoch = null
+      this.lastSeq = null
+    }
     this.sessionId = sessionId
     this.isIntentionalClose = false
 
-    const wsUrl = `${WS_BASE_URL}/api/ws/${sessionId}?user_name=${encodeURIComponent(userName)}&user_role=${userRole}`
+    let wsUrl = `${WS_BASE_URL}/api/ws/${sessionId}?user_name=${encodeURIComponent(userName)}&user_role=${userRole}`
+    if (this.epoch !== null && this.lastSeq !== null) {
+      // Ask only for what was broadcast while we were away
+      wsUrl += `&epoch=${this.epoch}&last_seq=${this.lastSeq}`
+    }
 
     console.log('Connecting to WebSocket:', wsUrl)
 
@@ -42,6 +53,19 @@ export class WebSocketService {
         console.log('WebSocket message received:', message)
 
         const type = message.type
+        if (type === 'ping') {
+          // Server heartbeat: answer so the connection is not reaped as idle
+          this.send({ type: 'pong' })
+          return
+        }
+
+        if (type === 'connection_status') {
+          this.epoch = message.epoch ?? null
+          this.lastSeq = message.seq ?? null
+        } else if (typeof message.seq === 'number') {
+          this.lastSeq = message.seq
+        }
+
         if (this.messageHandlers.has(type)) {
           this.messageHandlers.get(type)(message)
         }
@@ -87,6 +111,8 @@ export class WebSocketService {
       this.ws = null
     }
     this.sessionId = null
+    this.epoch = null
+    this.lastSeq = null
     this.messageHandlers.clear()
   }
 
@@ -107,6 +133,38 @@ export class WebSocketService {
     })
   }
 
+  // Cursor and selections; the server relays at most one per client per interval
+  sendPresence(problemId, cursor, selections = []) {
+    this.send({
+      type: 'presence',
+      problemId,
+      cursor,
+      selections,
+    })
+  }
+
+  // Executed on the server; everyone in the session gets code_output chunks
+  // while it runs, a test_case_result for each test case when runTests is set,
+  // then the code_result
+  sendRunCode(code, problemId, runTests = false) {
+    this.send({
+      type: 'run_code',
+      code,
+      problemId,
+      runTests,
+    })
+  }
+
+  // Interviewer only: times the code on growing inputs from the problem's
+  // generator; the profile_result goes back to this client alone
+  sendProfileCode(code, problemId) {
+    this.send({
+      type: 'profile_code',
+      code,
+      problemId,
+    })
+  }
+
   sendProblemChange(problemIndex, problemId) {
     this.send({
       type: 'problem_change',